@@ -1,6 +1,6 @@
 """Modelos Pydantic para validación de requests/responses."""
 from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import Optional, Dict, List
+from typing import Any, Optional, Dict, List, TypedDict
 from datetime import datetime
 import re
 
@@ -1158,6 +1158,17 @@ class PortfolioAssetMapping(BaseModel):
     impact_description: Optional[str] = Field(None, description="Descripción del impacto esperado")
 
 
+class NormalizedNewsItem(TypedDict, total=False):
+    """
+    Noticia tal como circula dentro del motor de escenarios tras ScenarioEngineService._normalize_news:
+    'id' siempre presente y standardized_data siempre dict plano (nunca modelo Pydantic).
+    """
+    id: Any
+    title: str
+    body: str
+    standardized_data: Dict[str, Any]
+
+
 class DriverScenarioResponse(BaseModel):
     """Respuesta completa para un driver con sus escenarios."""
     driver: str = Field(..., description="Nombre del driver temático")
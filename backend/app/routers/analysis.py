@@ -12,9 +12,7 @@ from app.models import (
     PortfolioAnalysisRequest, PortfolioAnalysisResponse,
     StandardizedNewsData
 )
-from app.services.openai_service import OpenAIService
 from app.services.news_scoring_service import NewsScoringService
-from app.services.portfolio_analysis_service import PortfolioAnalysisService
 from app.models import NewsItemResponse, PortfolioItemResponse
 from app.routers.news import build_news_item_response
 
@@ -66,6 +64,8 @@ async def generate_analysis(
         
         # Generar análisis con OpenAI (incluyendo cartera)
         logger.info(f"Generando análisis para {len(news_responses)} noticias y {len(portfolio_responses)} items de cartera")
+        from app.services.openai_service import OpenAIService
+        
         openai_service = OpenAIService()
         analysis_result = openai_service.generate_analysis(news_responses, portfolio_responses if portfolio_responses else None)
         
@@ -175,6 +175,8 @@ async def analyze_portfolio(
         
         # Generar análisis usando el servicio
         logger.info(f"Generando análisis de cartera para {len(standardized_news_list)} noticias estandarizadas")
+        from app.services.portfolio_analysis_service import PortfolioAnalysisService
+        
         analysis_service = PortfolioAnalysisService()
         analysis_response = analysis_service.analyze_portfolio(
             standardized_news_list,
@@ -23,7 +23,6 @@ from app.database import TradingRecommendation as TradingRecommendationDB
 from app.services.trading_recommendations_service import TradingRecommendationsService
 from app.services.recommendation_audit_service import RecommendationAuditService
 from app.services.risk_service import RiskService
-from app.services.portfolio_insights_service import PortfolioInsightsService
 from app.services.portfolio_ranking_service import PortfolioRankingService
 from app.services.price_data_service import PriceDataService
 from sqlalchemy import and_, or_, desc, asc
@@ -152,6 +151,8 @@ async def get_professional_insights(
         recent_news_count = db.query(NewsItem).filter(NewsItem.created_at >= recent_cutoff).count()
         
         # Generar insights profesionales
+        from app.services.portfolio_insights_service import PortfolioInsightsService
+        
         insights_service = PortfolioInsightsService()
         insights = insights_service.generate_professional_insights(
             portfolio_items=portfolio_items,
@@ -4,8 +4,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc
 import logging
 import json
+import asyncio
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 from app.database import get_db, NewsItem, PortfolioItem
 from app.models import (
@@ -160,28 +160,27 @@ async def generate_scenarios(
         scenario_service = ScenarioEngineService()
         
         try:
-            # Ejecutar con timeout usando ThreadPoolExecutor
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(
-                    scenario_service.generate_scenarios,
-                    standardized_news_list,
-                    portfolio_items if portfolio_items else None,
-                    scenario_request.max_drivers,
-                    scenario_request.include_portfolio_mapping
+            # Ejecutar con timeout sobre el event loop (el motor es async)
+            try:
+                response = await asyncio.wait_for(
+                    scenario_service.generate_scenarios_async(
+                        standardized_news_list,
+                        portfolio_items if portfolio_items else None,
+                        scenario_request.max_drivers,
+                        scenario_request.include_portfolio_mapping
+                    ),
+                    timeout=timeout
+                )
+                return response
+            except asyncio.TimeoutError:
+                logger.warning(f"Timeout ({timeout}s) excedido en generación de escenarios")
+                # Intentar obtener resultados parciales si hay algún driver procesado
+                # (esto requeriría modificar el servicio para exponer estado parcial)
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail=f"La generación de escenarios excedió el tiempo límite ({timeout}s). "
+                           "Intenta con menos drivers o noticias."
                 )
-                
-                try:
-                    response = future.result(timeout=timeout)
-                    return response
-                except FutureTimeoutError:
-                    logger.warning(f"Timeout ({timeout}s) excedido en generación de escenarios")
-                    # Intentar obtener resultados parciales si hay algún driver procesado
-                    # (esto requeriría modificar el servicio para exponer estado parcial)
-                    raise HTTPException(
-                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                        detail=f"La generación de escenarios excedió el tiempo límite ({timeout}s). "
-                               "Intenta con menos drivers o noticias."
-                    )
         
         except HTTPException:
             raise
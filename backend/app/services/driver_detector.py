@@ -48,17 +48,18 @@ class DriverDetector:
         
         logger.info(f"Detectando drivers: {len(news_items)} noticias, máximo {max_drivers} drivers")
         
-        # Analizar todas las noticias
+        # Analizar todas las noticias en lote
+        texts = [item.get("body") or item.get("text") or item.get("title", "") for item in news_items]
+        items_with_text = [(item, text) for item, text in zip(news_items, texts) if text]
+        titled_texts = [(text, item.get("title")) for item, text in items_with_text]
+        analyses = self.nlp_service.analyze_news_batch([(text, None) for _, text in items_with_text])
+        sentiment_results = self.sentiment_service.classify_batch(titled_texts)
+        sector_results = self.sector_service.classify_batch(titled_texts)
+        
         news_analyses = []
-        for item in news_items:
-            text = item.get("body") or item.get("text") or item.get("title", "")
-            if not text:
-                continue
-            
-            analysis = self.nlp_service.analyze_news(text)
-            sentiment_result = self.sentiment_service.analyze_sentiment(text, item.get("title"))
-            sector_result = self.sector_service.classify_sector(text, item.get("title"))
-            
+        for (item, text), analysis, sentiment_result, sector_result in zip(
+            items_with_text, analyses, sentiment_results, sector_results
+        ):
             news_analyses.append({
                 "id": item.get("id"),
                 "title": item.get("title", ""),
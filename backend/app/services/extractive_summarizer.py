@@ -1,9 +1,18 @@
 """Servicio de resumen extractivo basado en reglas (sin LLM)."""
+import hashlib
 import logging
 import re
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional
 from app.services.local_nlp import get_local_nlp_service
 
+try:
+    from app.config import EXTRACTIVE_SUMMARY_CACHE_SIZE
+except ImportError:
+    # Resúmenes por noticia que se reutilizan entre refrescos (las noticias recientes se repiten)
+    EXTRACTIVE_SUMMARY_CACHE_SIZE = 512
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,6 +22,9 @@ class ExtractiveSummarizer:
     def __init__(self):
         """Inicializa el servicio de NLP local."""
         self.nlp_service = get_local_nlp_service()
+        # LRU (digest de título y texto, max_sentences, max_chars) -> resumen
+        self._summary_cache: "OrderedDict[Tuple[bytes, int, Optional[int]], str]" = OrderedDict()
+        self._summary_cache_lock = threading.Lock()
         logger.info("ExtractiveSummarizer inicializado (sin LLM)")
     
     def summarize_news(
@@ -37,6 +49,42 @@ class ExtractiveSummarizer:
         if not text or not text.strip():
             return ""
         
+        # El resumen depende solo del contenido y de los límites: una noticia ya resumida
+        # (p.ej. en un refresco anterior) se reutiliza; si se edita, cambia el digest
+        key = self._summary_key(text, title, max_sentences, max_chars)
+        with self._summary_cache_lock:
+            summary = self._summary_cache.get(key)
+            if summary is not None:
+                self._summary_cache.move_to_end(key)
+                return summary
+        
+        summary = self._summarize(text, title, max_sentences, max_chars)
+        
+        with self._summary_cache_lock:
+            self._summary_cache[key] = summary
+            if len(self._summary_cache) > EXTRACTIVE_SUMMARY_CACHE_SIZE:
+                self._summary_cache.popitem(last=False)
+        return summary
+    
+    @staticmethod
+    def _summary_key(
+        text: str,
+        title: Optional[str],
+        max_sentences: int,
+        max_chars: Optional[int]
+    ) -> Tuple[bytes, int, Optional[int]]:
+        """Clave del caché de resúmenes: digest de título y texto más los límites."""
+        content = f"{title or ''}\x00{text}".encode("utf-8", "surrogatepass")
+        return (hashlib.blake2b(content, digest_size=16).digest(), max_sentences, max_chars)
+    
+    def _summarize(
+        self,
+        text: str,
+        title: Optional[str],
+        max_sentences: int,
+        max_chars: Optional[int]
+    ) -> str:
+        """Selecciona las frases más informativas del texto (ver summarize_news)."""
         # Combinar título y texto para análisis
         full_text = f"{title} {text}" if title else text
         
@@ -112,6 +160,9 @@ class ExtractiveSummarizer:
         """
         Genera resúmenes extractivos para un lote de noticias.
         
+        Para analizar varios lotes en una sola pasada de spaCy, llamar antes a prepare_batch
+        con todas las noticias.
+        
         Args:
             news_items: Lista de diccionarios con 'title' y 'body' (o 'text')
             max_sentences_per_news: Máximo de frases por noticia
@@ -166,6 +217,34 @@ class ExtractiveSummarizer:
         
         return summaries
     
+    def prepare_batch(
+        self,
+        news_items: List[Dict],
+        max_sentences: int = 3,
+        max_chars: Optional[int] = None
+    ):
+        """
+        Analiza de una vez (nlp.pipe) las noticias que se van a resumir; summarize_news
+        reutiliza luego esos análisis desde el caché del NLP local.
+        
+        Las noticias cuyo resumen (con estos límites) ya está en el caché de resúmenes se
+        omiten: no van a necesitar el análisis.
+        
+        Args:
+            news_items: Lista de diccionarios con 'title' y 'body' (o 'text')
+            max_sentences: Límite de frases con el que se van a resumir
+            max_chars: Límite de caracteres con el que se van a resumir
+        """
+        pending = []
+        with self._summary_cache_lock:
+            for item in news_items:
+                text = item.get("body") or item.get("text") or ""
+                title = item.get("title")
+                if text.strip() and self._summary_key(text, title, max_sentences, max_chars) not in self._summary_cache:
+                    pending.append((text, title))
+        if pending:
+            self.nlp_service.analyze_news_batch(pending)
+    
     def _split_sentences(self, text: str) -> List[str]:
         """Divide el texto en oraciones."""
         # Patrón para dividir oraciones (considera . ! ? seguidos de espacio o fin de línea)
@@ -0,0 +1,67 @@
+"""Caché exacto de respuestas de LLM para evitar re-llamadas con el mismo prompt."""
+import logging
+import hashlib
+from typing import Optional
+from app.services.prompt_cache_service import PromptCacheService, CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Caché de respuestas crudas de chat completions.
+
+    La clave es un sha256 de (tag, versión de plantilla, modelo, temperatura, system, prompt),
+    por lo que cualquier cambio en el prompt o en los parámetros del modelo produce un miss.
+    El almacenamiento y la expiración se delegan en PromptCacheService.
+    """
+
+    def __init__(self, ttl: int = None):
+        self._store = PromptCacheService()
+        self.ttl = ttl or CACHE_TTL["scenarios"]
+
+    @staticmethod
+    def make_key(
+        tag: str,
+        model: str,
+        temperature: float,
+        system_content: str,
+        user_content: str,
+        template_version: str = "1"
+    ) -> str:
+        """Genera la clave determinística para un prompt."""
+        raw = "\x1f".join([tag, template_version, model, str(temperature), system_content, user_content])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, tag: str, key: str) -> Optional[str]:
+        """Obtiene el texto de respuesta cacheado o None si no existe/expiró."""
+        response_text = self._store.get(f"llm_{tag}", {"key": key}, cache_ttl=self.ttl)
+        if response_text is not None:
+            logger.info(f"Cache hit de respuesta LLM ({tag}): {key[:12]}")
+        return response_text
+
+    def set(self, tag: str, key: str, response_text: str, token_count: int = None):
+        """Almacena el texto de respuesta para la clave dada."""
+        self._store.set(
+            f"llm_{tag}",
+            {"key": key},
+            response_text,
+            token_count=token_count,
+            cache_ttl=self.ttl
+        )
+
+    def get_stats(self) -> dict:
+        """Estadísticas del caché subyacente."""
+        return self._store.get_stats()
+
+
+# Instancia global compartida por los servicios de escenarios
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """Obtiene la instancia global del caché de respuestas LLM."""
+    global _llm_response_cache
+    if _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache()
+    return _llm_response_cache
@@ -1,6 +1,6 @@
 """Extractor de entidades usando spaCy."""
 import logging
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from app.services.local_nlp.nlp_processor import get_nlp_processor
 
 logger = logging.getLogger(__name__)
@@ -13,13 +13,19 @@ class EntityExtractor:
         """Inicializa el extractor."""
         self.nlp_processor = get_nlp_processor()
     
-    def extract_entities(self, text: str, language: Optional[str] = None) -> Dict[str, List[str]]:
+    def extract_entities(
+        self,
+        text: str,
+        language: Optional[str] = None,
+        doc: Optional[Any] = None
+    ) -> Dict[str, List[str]]:
         """
         Extrae entidades nombradas de un texto.
         
         Args:
             text: Texto a analizar
             language: Idioma del texto
+            doc: Documento de spaCy ya procesado para text (evita volver a procesarlo)
         
         Returns:
             Diccionario con tipos de entidades y sus valores
@@ -33,7 +39,8 @@ class EntityExtractor:
                 "DATE": []
             }
         
-        doc = self.nlp_processor.process_text(text, language)
+        if doc is None:
+            doc = self.nlp_processor.process_text(text, language)
         
         entities = {
             "ORG": [],      # Organizaciones
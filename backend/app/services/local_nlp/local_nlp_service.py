@@ -1,11 +1,20 @@
 """Servicio unificado de NLP local que combina todas las funcionalidades."""
+import copy
 import logging
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from app.services.local_nlp.nlp_processor import get_nlp_processor
 from app.services.local_nlp.sentiment_analyzer import SentimentAnalyzer
 from app.services.local_nlp.sector_classifier import SectorClassifier
 from app.services.local_nlp.entity_extractor import EntityExtractor
 
+try:
+    from app.config import NLP_ANALYSIS_CACHE_SIZE
+except ImportError:
+    # Análisis recientes que se reutilizan (p.ej. sentimiento y sector pedidos sobre el mismo texto)
+    NLP_ANALYSIS_CACHE_SIZE = 256
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +28,9 @@ class LocalNLPService:
         self.sentiment_analyzer = SentimentAnalyzer()
         self.sector_classifier = SectorClassifier()
         self.entity_extractor = EntityExtractor()
+        # LRU (texto, idioma pedido) -> análisis
+        self._analysis_cache: "OrderedDict[Tuple[str, Optional[str]], Dict]" = OrderedDict()
+        self._analysis_cache_lock = threading.Lock()
         logger.info("Servicio de NLP local inicializado correctamente")
     
     def analyze_news(self, text: str, title: Optional[str] = None, language: Optional[str] = None) -> Dict:
@@ -49,39 +61,97 @@ class LocalNLPService:
                 "language": "es|en"
             }
         """
-        # Combinar título y texto
-        full_text = f"{title} {text}" if title else text
+        return self.analyze_news_batch([(text, title)], language=language)[0]
+    
+    def analyze_news_batch(
+        self,
+        items: List[Tuple[str, Optional[str]]],
+        language: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Analiza varias noticias de una vez: los textos pasan por spaCy en lotes (nlp.pipe) y
+        cada documento se procesa una sola vez para sentimiento, sectores, entidades y keywords.
         
-        if not full_text:
-            return {
-                "sentiment": {"positive": 0.0, "negative": 0.0, "neutral": 1.0},
-                "sentiment_label": "neutral",
-                "sectors": [],
-                "primary_sector": None,
-                "entities": {"ORG": [], "PERSON": [], "GPE": [], "MONEY": [], "DATE": []},
-                "tickers": [],
-                "keywords": [],
-                "language": "es"
-            }
+        Args:
+            items: Lista de tuplas (texto, título opcional)
+            language: Idioma de todos los textos. Si es None, se detecta por texto
+        
+        Returns:
+            Lista de análisis (ver analyze_news), en el mismo orden que items
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+        # Textos sin análisis en caché -> posiciones donde aparecen (un texto repetido se analiza una vez)
+        pending: Dict[str, List[int]] = {}
+        for i, (text, title) in enumerate(items):
+            full_text = f"{title} {text}" if title else text
+            if not full_text:
+                results[i] = self._empty_analysis()
+                continue
+            cached = self._get_cached_analysis(full_text, language)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(full_text, []).append(i)
         
-        # Detectar idioma si no se proporciona
-        if language is None:
-            language = self.nlp_processor.detect_language(full_text)
+        texts = list(pending)
+        languages = [language or self.nlp_processor.detect_language(text) for text in texts]
+        docs = self.nlp_processor.process_texts(texts, languages)
+        for text, doc_language, doc in zip(texts, languages, docs):
+            analysis = self._analyze_doc(text, doc_language, doc)
+            self._cache_analysis(text, language, analysis)
+            for i in pending[text]:
+                results[i] = copy.deepcopy(analysis)
+        return results
+    
+    def _get_cached_analysis(self, full_text: str, language: Optional[str]) -> Optional[Dict]:
+        """Copia del análisis cacheado para el texto, o None si no está."""
+        key = (full_text, language)
+        with self._analysis_cache_lock:
+            analysis = self._analysis_cache.get(key)
+            if analysis is None:
+                return None
+            self._analysis_cache.move_to_end(key)
+        return copy.deepcopy(analysis)
+    
+    def _cache_analysis(self, full_text: str, language: Optional[str], analysis: Dict):
+        """Guarda el análisis en el LRU, descartando el más antiguo si se excede el tamaño."""
+        with self._analysis_cache_lock:
+            self._analysis_cache[(full_text, language)] = analysis
+            if len(self._analysis_cache) > NLP_ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+    
+    @staticmethod
+    def _empty_analysis() -> Dict:
+        """Análisis de un texto vacío."""
+        return {
+            "sentiment": {"positive": 0.0, "negative": 0.0, "neutral": 1.0},
+            "sentiment_label": "neutral",
+            "sectors": [],
+            "primary_sector": None,
+            "entities": {"ORG": [], "PERSON": [], "GPE": [], "MONEY": [], "DATE": []},
+            "tickers": [],
+            "keywords": [],
+            "language": "es"
+        }
+    
+    def _analyze_doc(self, full_text: str, language: str, doc) -> Dict:
+        """Análisis completo de un texto a partir de su documento de spaCy ya procesado."""
+        lemmas = self.nlp_processor.lemmas_from_doc(doc)
         
         # Análisis de sentimiento
-        sentiment_scores = self.sentiment_analyzer.analyze_sentiment(full_text, language)
-        sentiment_label = self.sentiment_analyzer.get_sentiment_label(full_text, language)
+        sentiment_scores = self.sentiment_analyzer.analyze_sentiment(full_text, language, lemmas=lemmas)
+        sentiment_label = self.sentiment_analyzer.label_from_scores(sentiment_scores)
         
-        # Clasificación de sectores
-        sectors = self.sector_classifier.classify_sectors(full_text, language)
-        primary_sector = self.sector_classifier.get_primary_sector(full_text, language)
+        # Clasificación de sectores (el principal es el primero del ranking)
+        sectors = self.sector_classifier.classify_sectors(full_text, language, lemmas=lemmas)
+        primary_sector = sectors[0]["sector"] if sectors else None
         
         # Extracción de entidades
-        entities = self.entity_extractor.extract_entities(full_text, language)
+        entities = self.entity_extractor.extract_entities(full_text, language, doc=doc)
         tickers = self.entity_extractor.extract_tickers(full_text)
         
         # Extracción de keywords
-        keywords = self.nlp_processor.extract_keywords(full_text, language)
+        keywords = self.nlp_processor.keywords_from_doc(doc)
         
         return {
             "sentiment": sentiment_scores,
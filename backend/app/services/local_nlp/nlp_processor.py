@@ -94,6 +94,25 @@ class NLPProcessor:
         nlp = self.nlp_en if language == "en" else self.nlp_es
         return nlp(text)
     
+    def process_texts(self, texts: List[str], languages: List[str]) -> List[spacy.tokens.Doc]:
+        """
+        Procesa varios textos con nlp.pipe (un lote por idioma), conservando el orden.
+        
+        Args:
+            texts: Textos a procesar (no vacíos)
+            languages: Idioma de cada texto ('es' o 'en')
+        
+        Returns:
+            Documentos procesados de spaCy, en el mismo orden que texts
+        """
+        docs: List[Optional[spacy.tokens.Doc]] = [None] * len(texts)
+        english = [i for i, language in enumerate(languages) if language == "en"]
+        spanish = [i for i, language in enumerate(languages) if language != "en"]
+        for nlp, indexes in ((self.nlp_es, spanish), (self.nlp_en, english)):
+            for i, doc in zip(indexes, nlp.pipe(texts[i] for i in indexes)):
+                docs[i] = doc
+        return docs
+    
     def normalize_text(self, text: str) -> str:
         """
         Normaliza un texto: lowercase, elimina espacios extra, etc.
@@ -130,9 +149,12 @@ class NLPProcessor:
         Returns:
             Lista de lemas
         """
-        doc = self.process_text(text, language)
-        lemmas = [token.lemma_.lower() for token in doc if not token.is_stop and not token.is_punct and token.is_alpha]
-        return lemmas
+        return self.lemmas_from_doc(self.process_text(text, language))
+    
+    @staticmethod
+    def lemmas_from_doc(doc: spacy.tokens.Doc) -> List[str]:
+        """Lemas de un documento ya procesado (sin stop words ni puntuación, solo alfabéticos)."""
+        return [token.lemma_.lower() for token in doc if not token.is_stop and not token.is_punct and token.is_alpha]
     
     def extract_keywords(self, text: str, language: Optional[str] = None, max_keywords: int = 10) -> List[str]:
         """
@@ -146,8 +168,11 @@ class NLPProcessor:
         Returns:
             Lista de palabras clave
         """
-        doc = self.process_text(text, language)
-        
+        return self.keywords_from_doc(self.process_text(text, language), max_keywords)
+    
+    @staticmethod
+    def keywords_from_doc(doc: spacy.tokens.Doc, max_keywords: int = 10) -> List[str]:
+        """Palabras clave de un documento ya procesado (ver extract_keywords)."""
         # Filtrar: no stop words, no puntuación, solo alfanuméricos, longitud mínima
         keywords = [
             token.lemma_.lower() 
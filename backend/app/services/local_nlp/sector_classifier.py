@@ -34,7 +34,13 @@ class SectorClassifier:
             logger.error(f"Error cargando diccionario de sectores: {e}")
             self.sectors_dict = {"version": "1.0.0", "sectors": {}}
     
-    def classify_sectors(self, text: str, language: Optional[str] = None, top_n: int = 3) -> List[Dict[str, float]]:
+    def classify_sectors(
+        self,
+        text: str,
+        language: Optional[str] = None,
+        top_n: int = 3,
+        lemmas: Optional[List[str]] = None
+    ) -> List[Dict[str, float]]:
         """
         Clasifica el texto en sectores.
         
@@ -42,6 +48,7 @@ class SectorClassifier:
             text: Texto a clasificar
             language: Idioma del texto
             top_n: Número de sectores principales a retornar
+            lemmas: Lemas del texto ya calculados (evita volver a procesarlo con spaCy)
         
         Returns:
             Lista de diccionarios con sector y score: [{"sector": "tecnología", "score": 0.85}, ...]
@@ -54,7 +61,8 @@ class SectorClassifier:
         
         # Normalizar y lematizar
         normalized_text = self.nlp_processor.normalize_text(text)
-        lemmas = self.nlp_processor.lemmatize(text, language)
+        if lemmas is None:
+            lemmas = self.nlp_processor.lemmatize(text, language)
         lemma_text = " " + " ".join(lemmas) + " "
         
         sector_scores = {}
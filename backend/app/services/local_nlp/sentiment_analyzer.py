@@ -2,7 +2,7 @@
 import logging
 import json
 import os
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 from app.services.local_nlp.nlp_processor import get_nlp_processor
 
@@ -46,13 +46,19 @@ class SentimentAnalyzer:
                 "neutral": {"es": [], "en": []}
             }
     
-    def analyze_sentiment(self, text: str, language: Optional[str] = None) -> Dict[str, float]:
+    def analyze_sentiment(
+        self,
+        text: str,
+        language: Optional[str] = None,
+        lemmas: Optional[List[str]] = None
+    ) -> Dict[str, float]:
         """
         Analiza el sentimiento de un texto.
         
         Args:
             text: Texto a analizar
             language: Idioma del texto ('es' o 'en'). Si es None, se detecta automáticamente
+            lemmas: Lemas del texto ya calculados (evita volver a procesarlo con spaCy)
         
         Returns:
             Diccionario con scores de sentimiento: {"positive": 0.0-1.0, "negative": 0.0-1.0, "neutral": 0.0-1.0}
@@ -67,7 +73,8 @@ class SentimentAnalyzer:
         normalized_text = self.nlp_processor.normalize_text(text)
         
         # Obtener lemas para mejor matching
-        lemmas = self.nlp_processor.lemmatize(text, language)
+        if lemmas is None:
+            lemmas = self.nlp_processor.lemmatize(text, language)
         lemma_text = " " + " ".join(lemmas) + " "
         
         # Obtener diccionarios para el idioma
@@ -122,8 +129,10 @@ class SentimentAnalyzer:
         Returns:
             Etiqueta: "positive", "negative", o "neutral"
         """
-        scores = self.analyze_sentiment(text, language)
-        
-        # Retornar el sentimiento con mayor score
+        return self.label_from_scores(self.analyze_sentiment(text, language))
+    
+    @staticmethod
+    def label_from_scores(scores: Dict[str, float]) -> str:
+        """Etiqueta del sentimiento con mayor score (a igualdad, el primero del dict)."""
         max_sentiment = max(scores.items(), key=lambda x: x[1])
         return max_sentiment[0]
@@ -0,0 +1,276 @@
+"""Clientes de OpenAI compartidos para reutilizar el pool de conexiones HTTP entre servicios."""
+import asyncio
+import logging
+import random
+import threading
+import weakref
+from typing import Optional
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+from app.config import OPENAI_API_KEY
+
+try:
+    from app.config import OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS
+except ImportError:
+    # Límites del pool HTTP compartido (acotan también la concurrencia efectiva contra la API)
+    OPENAI_MAX_CONNECTIONS = 64
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = 32
+
+try:
+    from app.config import OPENAI_MAX_RETRIES, OPENAI_MAX_CONCURRENT_REQUESTS
+except ImportError:
+    # Reintentos ante 429/5xx/errores de red y tope de requests simultáneos por event loop
+    OPENAI_MAX_RETRIES = 6
+    OPENAI_MAX_CONCURRENT_REQUESTS = 8
+
+try:
+    from app.config import OPENAI_REQUEST_TIMEOUT
+except ImportError:
+    # Timeout por request (segundos); el default del SDK (600s) deja colgado a un driver mucho tiempo
+    OPENAI_REQUEST_TIMEOUT = 90.0
+
+# Backoff exponencial con jitter (segundos)
+RETRY_INITIAL_WAIT = 1.0
+RETRY_MAX_WAIT = 30.0
+# Éxitos consecutivos necesarios para volver a subir el límite de concurrencia en 1
+CONCURRENCY_GROW_AFTER = 10
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # incluye APITimeoutError
+    openai.InternalServerError
+)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+# Las conexiones de httpx.AsyncClient y el limitador quedan ligados al event loop que los usó,
+# así que se mantiene uno de cada uno por loop. En FastAPI hay un solo loop; las fachadas
+# síncronas corren con run_sync, que cierra el cliente y descarta ambos al terminar (el loop no
+# se libera solo: el limitador y las conexiones lo referencian)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AdaptiveConcurrencyLimiter]" = weakref.WeakKeyDictionary()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Semáforo de límite variable para requests a OpenAI.
+    
+    Ante un 429 el límite se reduce a la mitad (mínimo 1) y vuelve a crecer de a uno tras
+    CONCURRENCY_GROW_AFTER éxitos consecutivos, acercándose al techo real de la API.
+    Vive en un único event loop, por lo que no necesita locks adicionales.
+    """
+    
+    def __init__(self, max_limit: int, grow_after: int = CONCURRENCY_GROW_AFTER):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.grow_after = grow_after
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+    
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+    
+    async def release(self):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+    
+    async def __aenter__(self):
+        await self.acquire()
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+    
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.grow_after and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+    
+    def on_rate_limit(self):
+        self._successes = 0
+        if self.limit > 1:
+            self.limit = max(1, self.limit // 2)
+            logger.warning(f"Rate limit de OpenAI: concurrencia reducida a {self.limit}")
+
+
+class LimitedStream:
+    """
+    Respuesta en streaming que retiene su lugar en el limitador hasta consumirse.
+    
+    El request de un stream termina recién con el último chunk: recién entonces se libera el
+    lugar y se registra el éxito. Un 429 a mitad del stream también reduce la concurrencia.
+    """
+    
+    def __init__(self, stream, limiter: AdaptiveConcurrencyLimiter):
+        self._stream = stream
+        self._limiter = limiter
+        self._released = False
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except openai.RateLimitError as e:
+            if getattr(e, "code", None) != "insufficient_quota":
+                self._limiter.on_rate_limit()
+            raise
+        else:
+            self._limiter.on_success()
+        finally:
+            await self._release()
+    
+    async def close(self):
+        """Cierra el stream sin consumirlo y libera su lugar en el limitador."""
+        try:
+            await self._stream.close()
+        finally:
+            await self._release()
+    
+    async def _release(self):
+        if not self._released:
+            self._released = True
+            await self._limiter.release()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
+    )
+
+
+def get_client() -> OpenAI:
+    """Obtiene el cliente síncrono compartido de OpenAI."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key=OPENAI_API_KEY,
+                    http_client=httpx.Client(limits=_limits()),
+                    timeout=OPENAI_REQUEST_TIMEOUT
+                )
+                logger.info("Cliente OpenAI compartido inicializado")
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Obtiene el cliente asíncrono compartido de OpenAI para el event loop actual."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        # max_retries=0: los reintentos los gestiona create_chat_completion junto con el limitador
+        client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=httpx.AsyncClient(limits=_limits()),
+            timeout=OPENAI_REQUEST_TIMEOUT,
+            max_retries=0
+        )
+        _async_clients[loop] = client
+        logger.debug("Cliente AsyncOpenAI compartido inicializado para el event loop actual")
+    return client
+
+
+def _get_limiter() -> AdaptiveConcurrencyLimiter:
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = AdaptiveConcurrencyLimiter(OPENAI_MAX_CONCURRENT_REQUESTS)
+        _limiters[loop] = limiter
+    return limiter
+
+
+def run_sync(coro):
+    """
+    Ejecuta coro en un event loop nuevo, para las fachadas síncronas de los servicios.
+    
+    Al terminar cierra el cliente asíncrono del loop y descarta su limitador; si no, cada
+    llamada dejaría vivos el loop cerrado, el limitador y un cliente con conexiones abiertas.
+    """
+    return asyncio.run(_run_and_release(coro))
+
+
+async def _run_and_release(coro):
+    try:
+        return await coro
+    finally:
+        loop = asyncio.get_running_loop()
+        _limiters.pop(loop, None)
+        client = _async_clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+
+
+async def _create_with_retries(create, kwargs: dict):
+    limiter = _get_limiter()
+    for attempt in range(1, OPENAI_MAX_RETRIES + 1):
+        try:
+            await limiter.acquire()
+            try:
+                response = await create(**kwargs)
+            except BaseException:
+                await limiter.release()
+                raise
+            if kwargs.get("stream"):
+                # El lugar se libera (y el éxito se registra) al terminar de consumir el stream
+                return LimitedStream(response, limiter)
+            await limiter.release()
+            limiter.on_success()
+            return response
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, openai.RateLimitError):
+                if getattr(e, "code", None) == "insufficient_quota":
+                    raise
+                limiter.on_rate_limit()
+            if attempt == OPENAI_MAX_RETRIES:
+                raise
+            delay = min(RETRY_MAX_WAIT, RETRY_INITIAL_WAIT * 2 ** (attempt - 1))
+            delay += random.uniform(0, RETRY_INITIAL_WAIT)
+            logger.warning(
+                f"Error transitorio de OpenAI ({type(e).__name__}), "
+                f"reintento {attempt}/{OPENAI_MAX_RETRIES - 1} en {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+
+async def create_chat_completion(client: AsyncOpenAI, **kwargs):
+    """
+    Ejecuta client.chat.completions.create con concurrencia adaptativa y reintentos.
+    
+    Reintenta 429, 5xx y errores de red/timeout con backoff exponencial y jitter; los 429
+    además reducen la concurrencia permitida. Una cuota agotada no se reintenta.
+    """
+    return await _create_with_retries(client.chat.completions.create, kwargs)
+
+
+def openai_error_message(error: Exception, default_prefix: str) -> str:
+    """
+    Mensaje para el usuario según la clase del error de OpenAI (ya agotados los reintentos).
+    
+    Una cuota agotada también llega como RateLimitError, pero con code "insufficient_quota".
+    """
+    if isinstance(error, openai.AuthenticationError):
+        return "Error de autenticación con OpenAI. Verifica tu API key en app/config.py"
+    if isinstance(error, openai.RateLimitError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return "Cuota de OpenAI agotada. Verifica tu cuenta."
+        return "Límite de tasa excedido. Por favor, intenta más tarde."
+    return f"{default_prefix}: {error}"
+
+
+async def create_embeddings(client: AsyncOpenAI, **kwargs):
+    """Ejecuta client.embeddings.create con la misma concurrencia y reintentos que los chats."""
+    return await _create_with_retries(client.embeddings.create, kwargs)
@@ -4,6 +4,19 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, timezone
 import hashlib
 import json
+from functools import lru_cache
+from app.services.response_schemas import OPENAI_STRUCTURED_OUTPUTS
+
+try:
+    import tiktoken
+except ImportError:
+    # Sin tiktoken los tokens se estiman con la aproximación de ~4 caracteres por token
+    tiktoken = None
+
+try:
+    from app.config import OPENAI_MODEL
+except ImportError:
+    OPENAI_MODEL = "gpt-4o-mini"  # Modelo cuyo tokenizer se usa para contar tokens
 
 logger = logging.getLogger(__name__)
 
@@ -43,10 +56,155 @@ LENGTH_LIMITS = {
     "price_points": 50,  # Máximo de puntos de precio
     "signals": 10,     # Máximo de señales
     "technical_indicators": 5,  # Máximo de indicadores a mencionar
-    "total_prompt_chars": 8000  # Límite total de caracteres en prompt
+    "total_prompt_chars": 8000,  # Límite total de caracteres en prompt
+    "total_prompt_tokens": 4000  # Límite total de tokens en prompt (exactos si hay tiktoken)
+}
+
+try:
+    from app.config import PROMPT_SUMMARY_MAX_CHARS
+except ImportError:
+    # Máximo de caracteres del resumen de cada noticia en el prompt de drivers
+    PROMPT_SUMMARY_MAX_CHARS = 400
+
+# Máximo de caracteres del resumen de cada noticia en el prompt de escenarios
+SCENARIO_PROMPT_SUMMARY_MAX_CHARS = 300
+
+# Mínimo de caracteres por noticia al recortar un prompt para que entre en el presupuesto
+MIN_NEWS_ITEM_CHARS = 25
+
+# Clave de la lista de noticias en los datos variables de cada plantilla
+_NEWS_LIST_KEYS = {
+    "situation_summary": "news_items",
+    "scenario_generation": "related_news_items",
 }
 
 
+def truncate_at_word(text: str, max_chars: int) -> str:
+    """Trunca text a max_chars sin cortar la última palabra (si hay espacio donde cortar)."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    head, sep, _ = cut.rpartition(" ")
+    return head if sep and head else cut
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """
+    Encoding de tiktoken para el modelo (uno por modelo), o None si tiktoken no está instalado
+    o no se pudo cargar el encoding.
+    
+    tiktoken descarga el archivo BPE la primera vez; si falla (p.ej. sin red) se cachea None y
+    se usa la aproximación por caracteres, en lugar de reintentar la descarga en cada prompt.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Modelo que tiktoken no conoce: usar el encoding de la familia gpt-4o
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"No se pudo cargar el encoding de tiktoken para '{model}', estimando tokens por caracteres: {e}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _news_summary_fragment(summary: str, sentiment: str, tickers: tuple, categories: tuple) -> str:
+    """
+    Serializa el resumen de una noticia para el prompt de escenarios (JSON compacto, claves
+    ordenadas, sin campos vacíos). Memoizado: una noticia compartida por varios drivers se
+    serializa una vez.
+    """
+    fields = {"categories": list(categories), "sentiment": sentiment, "summary": summary, "tickers": list(tickers)}
+    return json.dumps(
+        {key: value for key, value in fields.items() if value},
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+
+
+# Parte fija del prompt de generación de escenarios (instrucciones y esquema); se arma una sola
+# vez y cada driver solo le agrega sus datos al final
+SCENARIO_TASK_INSTRUCTIONS = """Genera tres escenarios para el driver temático del mercado indicado al final, basándote en sus noticias relacionadas.
+
+Genera tres tipos de escenarios:
+
+1. BASE (escenario base): El escenario más probable basado en las noticias actuales
+2. RISK (escenario de riesgo): Un escenario negativo que podría materializarse
+3. OPPORTUNITY (escenario de oportunidad): Un escenario positivo que podría materializarse
+
+Para cada escenario, proporciona:
+- title: Título conciso del escenario
+- description: Descripción detallada (2-3 párrafos)
+- assumptions: Lista de supuestos clave (mínimo 2, máximo 5)
+- risks: Lista de riesgos asociados (mínimo 1, máximo 3)
+- invalidators: Lista de condiciones que invalidarían el escenario (mínimo 1, máximo 3)
+- confidence: Nivel de confianza (0.0-1.0)
+- timeframe: Horizonte temporal estimado (ej: "3-6 meses", "1-2 semanas")
+- market_impact: Impacto esperado en el mercado (1-2 oraciones breves)
+- suggested_actions: Lista de acciones sugeridas (2-3 items)
+- triggers: Lista de eventos o condiciones trigger a monitorear (2-3 items)
+
+"""
+
+# Ejemplo de estructura: solo hace falta sin Structured Outputs (con json_schema estricto la
+# estructura la impone la API y el ejemplo serían tokens de entrada de más)
+_SCENARIO_PROMPT_EXAMPLE = """IMPORTANTE: Responde ÚNICAMENTE en formato JSON válido con esta estructura exacta:
+{
+    "base": {
+        "title": "Título del escenario base",
+        "description": "Descripción detallada...",
+        "assumptions": [
+            {"description": "Supuesto 1", "probability": 0.7, "timeframe": "3 meses"}
+        ],
+        "risks": [
+            {"description": "Riesgo 1", "severity": "medium", "mitigation": "Estrategia de mitigación"}
+        ],
+        "invalidators": [
+            {"condition": "Condición que invalida", "description": "Por qué invalida"}
+        ],
+        "confidence": 0.75,
+        "timeframe": "3-6 meses",
+        "market_impact": "Impacto esperado en el mercado...",
+        "suggested_actions": ["Acción 1", "Acción 2"],
+        "triggers": ["Evento 1", "Evento 2"]
+    },
+    "risk": {
+        "title": "Título del escenario de riesgo",
+        "description": "Descripción detallada...",
+        "assumptions": [...],
+        "risks": [...],
+        "invalidators": [...],
+        "confidence": 0.65,
+        "timeframe": "1-3 meses",
+        "market_impact": "Impacto esperado en el mercado...",
+        "suggested_actions": ["Acción 1", "Acción 2"],
+        "triggers": ["Evento 1", "Evento 2"]
+    },
+    "opportunity": {
+        "title": "Título del escenario de oportunidad",
+        "description": "Descripción detallada...",
+        "assumptions": [...],
+        "risks": [...],
+        "invalidators": [...],
+        "confidence": 0.60,
+        "timeframe": "6-12 meses",
+        "market_impact": "Impacto esperado en el mercado...",
+        "suggested_actions": ["Acción 1", "Acción 2"],
+        "triggers": ["Evento 1", "Evento 2"]
+    }
+}
+
+"""
+
+_SCENARIO_PROMPT_HEAD = SCENARIO_TASK_INSTRUCTIONS + (
+    "Responde con un objeto JSON con las claves base, risk y opportunity.\n\n"
+    if OPENAI_STRUCTURED_OUTPUTS else _SCENARIO_PROMPT_EXAMPLE
+)
+
+
 class PromptTemplateService:
     """Servicio para gestionar plantillas de prompts y optimizar tokens."""
     
@@ -157,7 +315,8 @@ class PromptTemplateService:
     def estimate_tokens(self, text: str) -> int:
         """
         Estima el número de tokens en un texto.
-        Aproximación: 1 token ≈ 4 caracteres (para español/inglés mixto).
+        Con tiktoken cuenta los tokens exactos del tokenizer del modelo; si no está instalado
+        usa la aproximación 1 token ≈ 4 caracteres (para español/inglés mixto).
         
         Args:
             text: Texto a estimar
@@ -165,23 +324,35 @@ class PromptTemplateService:
         Returns:
             Estimación de tokens
         """
-        return len(text) // 4
+        encoding = _get_encoding(OPENAI_MODEL)
+        if encoding is None:
+            return len(text) // 4
+        return len(encoding.encode(text, disallowed_special=()))
     
-    def validate_prompt_length(self, prompt: str, max_chars: int = None) -> tuple[bool, int, int]:
+    def validate_prompt_length(
+        self,
+        prompt: str,
+        max_chars: int = None,
+        max_tokens: int = None
+    ) -> tuple[bool, int, int]:
         """
-        Valida la longitud de un prompt.
+        Valida la longitud de un prompt (caracteres y tokens).
         
         Args:
             prompt: Prompt a validar
             max_chars: Máximo de caracteres permitidos
+            max_tokens: Máximo de tokens permitidos
         
         Returns:
             Tuple (is_valid, char_count, estimated_tokens)
         """
         max_chars = max_chars or self.length_limits["total_prompt_chars"]
+        max_tokens = max_tokens or self.length_limits["total_prompt_tokens"]
         char_count = len(prompt)
         estimated_tokens = self.estimate_tokens(prompt)
-        is_valid = char_count <= max_chars
+        # Además del límite de caracteres, un presupuesto de tokens: con tiktoken el conteo es
+        # exacto y frena prompts densos (números, tickers) que entran en caracteres pero no en tokens
+        is_valid = char_count <= max_chars and estimated_tokens <= max_tokens
         
         return (is_valid, char_count, estimated_tokens)
     
@@ -189,7 +360,8 @@ class PromptTemplateService:
         self,
         template_type: str,
         variable_data: Dict,
-        max_total_chars: int = None
+        max_total_chars: int = None,
+        max_input_tokens: int = None
     ) -> Dict[str, Any]:
         """
         Construye un prompt optimizado usando plantillas.
@@ -198,6 +370,7 @@ class PromptTemplateService:
             template_type: Tipo de plantilla (situation_summary, scenario_generation, etc.)
             variable_data: Datos variables a insertar
             max_total_chars: Máximo total de caracteres
+            max_input_tokens: Máximo de tokens de entrada (default: LENGTH_LIMITS["total_prompt_tokens"])
         
         Returns:
             Dict con prompt, metadata y validación
@@ -215,18 +388,25 @@ class PromptTemplateService:
         
         # Validar longitud
         full_prompt = system_context + "\n\n" + user_prompt
-        is_valid, char_count, estimated_tokens = self.validate_prompt_length(full_prompt, max_total_chars)
+        is_valid, char_count, estimated_tokens = self.validate_prompt_length(
+            full_prompt, max_total_chars, max_input_tokens
+        )
         
         if not is_valid:
             logger.warning(
                 f"Prompt excede límite: {char_count} chars, {estimated_tokens} tokens estimados. "
                 f"Truncando datos variables..."
             )
-            # Aplicar truncamiento más agresivo
-            truncated_data = self._apply_aggressive_truncation(template_type, variable_data)
-            user_prompt = self._build_user_prompt(template_type, truncated_data)
-            full_prompt = system_context + "\n\n" + user_prompt
-            is_valid, char_count, estimated_tokens = self.validate_prompt_length(full_prompt, max_total_chars)
+            truncated_data, user_prompt, full_prompt, is_valid, char_count, estimated_tokens = (
+                self._ensure_within_budget(
+                    template_type, system_context, variable_data, max_total_chars, max_input_tokens
+                )
+            )
+            if not is_valid:
+                logger.warning(
+                    f"Prompt sigue excediendo el límite tras truncar: {char_count} chars, "
+                    f"{estimated_tokens} tokens estimados"
+                )
         
         return {
             "system_content": system_context,
@@ -238,6 +418,43 @@ class PromptTemplateService:
             "truncated_data": truncated_data
         }
     
+    def _ensure_within_budget(
+        self,
+        template_type: str,
+        system_context: str,
+        variable_data: Dict,
+        max_chars: int = None,
+        max_tokens: int = None
+    ) -> tuple[Dict, str, str, bool, int, int]:
+        """
+        Recorta los datos variables hasta que el prompt entre en el presupuesto.
+        
+        Parte del truncamiento agresivo y, mientras el prompt siga excedido, reduce a la mitad
+        los caracteres por noticia y lo reconstruye (hasta MIN_NEWS_ITEM_CHARS). Así un lote que
+        no entra se detecta antes de enviarlo, en lugar de gastar una llamada que falla.
+        
+        Returns:
+            Tuple (truncated_data, user_prompt, full_prompt, is_valid, char_count, estimated_tokens)
+        """
+        news_key = _NEWS_LIST_KEYS.get(template_type)
+        max_chars_per_item = self.length_limits["news_item"] // 2
+        truncated_data = self._apply_aggressive_truncation(template_type, variable_data)
+        
+        while True:
+            user_prompt = self._build_user_prompt(template_type, truncated_data)
+            full_prompt = system_context + "\n\n" + user_prompt
+            is_valid, char_count, estimated_tokens = self.validate_prompt_length(
+                full_prompt, max_chars, max_tokens
+            )
+            max_chars_per_item //= 2
+            if is_valid or news_key not in truncated_data or max_chars_per_item < MIN_NEWS_ITEM_CHARS:
+                return truncated_data, user_prompt, full_prompt, is_valid, char_count, estimated_tokens
+            
+            truncated_data = truncated_data.copy()
+            truncated_data[news_key] = [
+                self.truncate_news_item(news, max_chars_per_item) for news in truncated_data[news_key]
+            ]
+    
     def _truncate_variable_data(self, template_type: str, variable_data: Dict) -> Dict:
         """Trunca datos variables según el tipo de plantilla."""
         truncated = variable_data.copy()
@@ -327,13 +544,19 @@ Resumen (2-4 párrafos máximo, enfocado en puntos clave):"""
     
     def _build_scenario_generation_prompt(self, data: Dict) -> str:
         """Construye prompt para generación de escenarios."""
+        # Instrucciones y esquema invariantes (constante de módulo) primero, datos del driver al
+        # final: así todas las llamadas comparten el prefijo y OpenAI reutiliza su caché de prefijos
+        return _SCENARIO_PROMPT_HEAD + self.build_scenario_data_section(data)
+    
+    def build_scenario_data_section(self, data: Dict) -> str:
+        """Parte variable del prompt de escenarios: driver, descripción y noticias relacionadas."""
         driver = data.get("driver", {})
         related_news = data.get("related_news_items", [])
         
         driver_name = driver.get("driver", "Unknown")
         driver_description = driver.get("description", "")
         
-        news_summaries = []
+        fragments = []
         for news in related_news:
             standardized = news.get("standardized_data") or {}
             if isinstance(standardized, dict):
@@ -347,84 +570,19 @@ Resumen (2-4 párrafos máximo, enfocado en puntos clave):"""
                 tickers = []
                 categories = []
             
-            news_summaries.append({
-                "summary": summary[:300],
-                "sentiment": sentiment,
-                "tickers": tickers,
-                "categories": categories
-            })
-        
-        return f"""Genera tres escenarios para el siguiente driver temático del mercado:
-
-DRIVER: {driver_name}
-DESCRIPCIÓN: {driver_description}
-
-NOTICIAS RELACIONADAS:
-{json.dumps(news_summaries, indent=2, ensure_ascii=False)}
-
-Genera tres tipos de escenarios:
-
-1. BASE (escenario base): El escenario más probable basado en las noticias actuales
-2. RISK (escenario de riesgo): Un escenario negativo que podría materializarse
-3. OPPORTUNITY (escenario de oportunidad): Un escenario positivo que podría materializarse
-
-Para cada escenario, proporciona:
-- title: Título conciso del escenario
-- description: Descripción detallada (2-3 párrafos)
-- assumptions: Lista de supuestos clave (mínimo 2, máximo 5)
-- risks: Lista de riesgos asociados (mínimo 1, máximo 3)
-- invalidators: Lista de condiciones que invalidarían el escenario (mínimo 1, máximo 3)
-- confidence: Nivel de confianza (0.0-1.0)
-- timeframe: Horizonte temporal estimado (ej: "3-6 meses", "1-2 semanas")
-- market_impact: Impacto esperado en el mercado (1-2 oraciones breves)
-- suggested_actions: Lista de acciones sugeridas (2-3 items)
-- triggers: Lista de eventos o condiciones trigger a monitorear (2-3 items)
-
-IMPORTANTE: Responde ÚNICAMENTE en formato JSON válido con esta estructura exacta:
-{{
-    "base": {{
-        "title": "Título del escenario base",
-        "description": "Descripción detallada...",
-        "assumptions": [
-            {{"description": "Supuesto 1", "probability": 0.7, "timeframe": "3 meses"}}
-        ],
-        "risks": [
-            {{"description": "Riesgo 1", "severity": "medium", "mitigation": "Estrategia de mitigación"}}
-        ],
-        "invalidators": [
-            {{"condition": "Condición que invalida", "description": "Por qué invalida"}}
-        ],
-        "confidence": 0.75,
-        "timeframe": "3-6 meses",
-        "market_impact": "Impacto esperado en el mercado...",
-        "suggested_actions": ["Acción 1", "Acción 2"],
-        "triggers": ["Evento 1", "Evento 2"]
-    }},
-    "risk": {{
-        "title": "Título del escenario de riesgo",
-        "description": "Descripción detallada...",
-        "assumptions": [...],
-        "risks": [...],
-        "invalidators": [...],
-        "confidence": 0.65,
-        "timeframe": "1-3 meses",
-        "market_impact": "Impacto esperado en el mercado...",
-        "suggested_actions": ["Acción 1", "Acción 2"],
-        "triggers": ["Evento 1", "Evento 2"]
-    }},
-    "opportunity": {{
-        "title": "Título del escenario de oportunidad",
-        "description": "Descripción detallada...",
-        "assumptions": [...],
-        "risks": [...],
-        "invalidators": [...],
-        "confidence": 0.60,
-        "timeframe": "6-12 meses",
-        "market_impact": "Impacto esperado en el mercado...",
-        "suggested_actions": ["Acción 1", "Acción 2"],
-        "triggers": ["Evento 1", "Evento 2"]
-    }}
-}}"""
+            fragments.append(_news_summary_fragment(
+                truncate_at_word(summary, SCENARIO_PROMPT_SUMMARY_MAX_CHARS),
+                sentiment,
+                tuple(tickers),
+                tuple(categories)
+            ))
+        news_json = "[" + ",".join(fragments) + "]"
+        
+        return "".join((
+            "DRIVER: ", driver_name,
+            "\nDESCRIPCIÓN: ", driver_description,
+            "\n\nNOTICIAS RELACIONADAS:\n", news_json
+        ))
     
     def _build_technical_analysis_prompt(self, data: Dict) -> str:
         """Construye prompt para análisis técnico."""
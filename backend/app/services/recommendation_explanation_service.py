@@ -1,6 +1,6 @@
 """Servicio para generar explicaciones profesionales de recomendaciones."""
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from app.config import (
     TRADING_RULES_DEFAULT_PRICE_THRESHOLD_PCT,
     TRADING_RULES_DEFAULT_VOLUME_MULTIPLIER
@@ -35,27 +35,16 @@ class RecommendationExplanationService:
         Returns:
             str: Explicación profesional
         """
-        explanation_parts = []
+        parts: List[str] = []
         
         # Explicación base según acción
-        action_explanation = self._get_action_explanation(action, asset_name)
-        explanation_parts.append(action_explanation)
-        
-        # Explicación de la condición
-        condition_explanation = self._explain_condition(
-            condition,
-            threshold_data,
-            inputs,
-            sector
-        )
-        explanation_parts.append(condition_explanation)
-        
-        # Explicación de variables clave
-        variables_explanation = self._explain_key_variables(inputs, threshold_data)
-        if variables_explanation:
-            explanation_parts.append(variables_explanation)
-        
-        return " ".join(explanation_parts)
+        parts.append(self._get_action_explanation(action, asset_name))
+        
+        # Explicación de la condición y variables clave (se agregan sobre la misma lista)
+        self._explain_condition(condition, threshold_data, inputs, parts, sector)
+        self._explain_key_variables(inputs, threshold_data, parts)
+        
+        return " ".join(parts)
     
     def _get_action_explanation(self, action: str, asset_name: str) -> str:
         """Genera explicación base de la acción."""
@@ -74,10 +63,11 @@ class RecommendationExplanationService:
         condition: str,
         threshold_data: Dict,
         inputs: Dict,
+        parts: List[str],
         sector: Optional[str] = None
-    ) -> str:
-        """Explica por qué la condición/umbral es relevante."""
-        explanations = []
+    ) -> None:
+        """Agrega a `parts` por qué la condición/umbral es relevante."""
+        explanations_start = len(parts)
         
         # Explicar umbrales de precio
         if threshold_data and threshold_data.get("type") in ["price_below_threshold", "price_above_threshold"]:
@@ -86,17 +76,17 @@ class RecommendationExplanationService:
             
             if current_change is not None:
                 if threshold_data["type"] == "price_below_threshold":
-                    explanations.append(
+                    parts.append(
                         f"El precio ha caído {abs(current_change):.2f}%, superando el umbral de {threshold_value}% "
                         f"considerado significativo para movimientos de corrección."
                     )
                 else:
-                    explanations.append(
+                    parts.append(
                         f"El precio ha subido {current_change:.2f}%, superando el umbral de {threshold_value}% "
                         f"que indica momentum positivo."
                     )
             else:
-                explanations.append(
+                parts.append(
                     f"El umbral de {threshold_value}% de variación de precio es relevante porque "
                     f"representa un movimiento significativo que puede indicar cambio de tendencia."
                 )
@@ -107,12 +97,12 @@ class RecommendationExplanationService:
             current_ratio = threshold_data.get("current_volume_ratio")
             
             if current_ratio is not None:
-                explanations.append(
+                parts.append(
                     f"El volumen actual es {current_ratio:.2f}x el promedio, superando el umbral de {threshold_value}x. "
                     f"Esto indica interés institucional o cambio en la dinámica de trading."
                 )
             else:
-                explanations.append(
+                parts.append(
                     f"Un volumen {threshold_value}x superior al promedio indica alta participación del mercado "
                     f"y puede confirmar la validez del movimiento de precio."
                 )
@@ -121,12 +111,12 @@ class RecommendationExplanationService:
         sentiment = inputs.get("sentiment")
         if sentiment:
             if sentiment == "negative":
-                explanations.append(
+                parts.append(
                     "El sentimiento negativo de las noticias sugiere que pueden persistir presiones a la baja, "
                     "haciendo relevante considerar medidas defensivas."
                 )
             elif sentiment == "positive":
-                explanations.append(
+                parts.append(
                     "El sentimiento positivo de las noticias indica que pueden continuar las condiciones favorables, "
                     "apoyando decisiones de aumento de exposición."
                 )
@@ -135,21 +125,19 @@ class RecommendationExplanationService:
         if sector:
             relevance = inputs.get("relevance")
             if relevance == "high":
-                explanations.append(
+                parts.append(
                     f"La alta relevancia de las noticias para el sector {sector} sugiere que el impacto "
                     f"puede extenderse a múltiples activos del sector."
                 )
         
         # Explicación genérica si no hay detalles específicos
-        if not explanations:
-            explanations.append(
+        if len(parts) == explanations_start:
+            parts.append(
                 "La condición se basa en el análisis combinado de múltiples factores de mercado y noticias."
             )
-        
-        return " ".join(explanations)
     
-    def _explain_key_variables(self, inputs: Dict, threshold_data: Dict) -> Optional[str]:
-        """Explica las variables clave consideradas."""
+    def _explain_key_variables(self, inputs: Dict, threshold_data: Dict, parts: List[str]) -> None:
+        """Agrega a `parts` las variables clave consideradas."""
         variables = []
         
         # Sentimiento
@@ -183,9 +171,7 @@ class RecommendationExplanationService:
             variables.append(f"urgencia {urgency}")
         
         if variables:
-            return f"Variables consideradas: {', '.join(variables)}."
-        
-        return None
+            parts.append(f"Variables consideradas: {', '.join(variables)}.")
 
 
 
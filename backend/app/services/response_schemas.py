@@ -0,0 +1,224 @@
+"""Esquemas de respuesta (Structured Outputs) para las llamadas de escenarios a OpenAI."""
+import copy
+import json
+import logging
+import re
+from typing import Dict, Any, List, Tuple
+from app.models import PortfolioAssetMapping, Scenario
+
+try:
+    from app.config import OPENAI_STRUCTURED_OUTPUTS
+except ImportError:
+    # Usar json_schema estricto; desactivar para modelos que solo soportan json_object
+    OPENAI_STRUCTURED_OUTPUTS = True
+
+logger = logging.getLogger(__name__)
+
+# Claves de JSON Schema que el modo estricto de OpenAI no acepta (Pydantic las genera)
+_UNSUPPORTED_KEYS = {"default", "title", "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum"}
+
+JSON_OBJECT_FORMAT = {"type": "json_object"}
+
+
+def to_strict_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Adapta un JSON Schema (p.ej. de model_json_schema()) al modo estricto de OpenAI:
+    todos los objetos cierran additionalProperties y listan todas sus propiedades como
+    requeridas (los campos opcionales ya son nullables vía anyOf).
+    """
+    schema = copy.deepcopy(schema)
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key in _UNSUPPORTED_KEYS & node.keys():
+                # 'title' puede ser también el nombre de una propiedad: solo se quita si es keyword
+                if key == "title" and isinstance(node.get("title"), dict):
+                    continue
+                del node[key]
+            if node.get("type") == "object" and "properties" in node:
+                node["additionalProperties"] = False
+                node["required"] = list(node["properties"].keys())
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(schema)
+    return schema
+
+
+def _build_scenarios_schema() -> Dict[str, Any]:
+    scenario_schema = Scenario.model_json_schema()
+    defs = scenario_schema.pop("$defs", {})
+    # scenario_type lo asigna _validate_and_structure_scenarios a partir de la clave
+    scenario_schema["properties"].pop("scenario_type", None)
+    return to_strict_schema({
+        "type": "object",
+        "properties": {
+            "base": scenario_schema,
+            "risk": scenario_schema,
+            "opportunity": scenario_schema
+        },
+        "$defs": defs
+    })
+
+
+DRIVERS_SCHEMA = to_strict_schema({
+    "type": "object",
+    "properties": {
+        "drivers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "driver": {"type": "string"},
+                    "description": {"type": "string"},
+                    "related_news_ids": {"type": "array", "items": {"type": "integer"}}
+                }
+            }
+        }
+    }
+})
+
+CLUSTER_NAMES_SCHEMA = to_strict_schema({
+    "type": "object",
+    "properties": {
+        "clusters": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "cluster_id": {"type": "integer"},
+                    "driver": {"type": "string"},
+                    "description": {"type": "string"}
+                }
+            }
+        }
+    }
+})
+
+SCENARIOS_SCHEMA = _build_scenarios_schema()
+
+MAPPINGS_SCHEMA = to_strict_schema({
+    "type": "object",
+    "properties": {
+        "mappings": {"type": "array", "items": PortfolioAssetMapping.model_json_schema()}
+    }
+})
+
+
+def _build_scenarios_with_mappings_schema() -> Dict[str, Any]:
+    # Escenarios y mapeos en un solo objeto; las $defs de Scenario quedan en la raíz
+    scenarios_schema = {key: value for key, value in SCENARIOS_SCHEMA.items() if key != "$defs"}
+    return {
+        "type": "object",
+        "properties": {
+            "scenarios": scenarios_schema,
+            "mappings": MAPPINGS_SCHEMA["properties"]["mappings"]
+        },
+        "required": ["scenarios", "mappings"],
+        "additionalProperties": False,
+        "$defs": SCENARIOS_SCHEMA.get("$defs", {})
+    }
+
+
+SCENARIOS_WITH_MAPPINGS_SCHEMA = _build_scenarios_with_mappings_schema()
+
+
+def response_format_for(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """response_format a enviar: json_schema estricto o json_object si está desactivado."""
+    if not OPENAI_STRUCTURED_OUTPUTS:
+        return JSON_OBJECT_FORMAT
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": True}
+    }
+
+
+DRIVERS_RESPONSE_FORMAT = response_format_for("scenario_drivers", DRIVERS_SCHEMA)
+CLUSTER_NAMES_RESPONSE_FORMAT = response_format_for("driver_cluster_names", CLUSTER_NAMES_SCHEMA)
+SCENARIOS_RESPONSE_FORMAT = response_format_for("driver_scenarios", SCENARIOS_SCHEMA)
+MAPPINGS_RESPONSE_FORMAT = response_format_for("portfolio_mappings", MAPPINGS_SCHEMA)
+SCENARIOS_WITH_MAPPINGS_RESPONSE_FORMAT = response_format_for(
+    "driver_scenarios_with_mappings", SCENARIOS_WITH_MAPPINGS_SCHEMA
+)
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_json_response(response_text: str) -> Dict:
+    """
+    Parsea la respuesta JSON del modelo.
+
+    Con Structured Outputs json.loads basta; para modelos sin modo estricto tolera bloques
+    ```json``` y texto alrededor del objeto. Si no hay JSON recuperable, propaga
+    json.JSONDecodeError como antes.
+    """
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        text = _CODE_FENCE.sub("", response_text.strip())
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        logger.warning("Respuesta JSON no estricta, recuperando el objeto embebido")
+        return json.loads(text[start:end + 1])
+
+
+class TopLevelObjectScanner:
+    """
+    Escáner incremental para un objeto JSON que llega en fragmentos (streaming).
+
+    Cada vez que se cierra un valor objeto de primer nivel (p.ej. "base": {...}) lo devuelve
+    ya parseado junto con su clave, sin esperar al resto de la respuesta. Con depth=3 devuelve
+    en cambio los objetos de un array de primer nivel (p.ej. cada elemento de "drivers": [...]),
+    cada uno con la clave del array.
+    """
+
+    def __init__(self, depth: int = 2):
+        self._object_depth = depth
+        self._text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start = None
+        self._last_key = None
+        self._value_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Agrega un fragmento y devuelve los pares (clave, objeto) completados en él."""
+        start = len(self._text)
+        self._text += chunk
+        text = self._text
+        completed = []
+        for i in range(start, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        self._last_key = json.loads(text[self._key_start:i + 1])
+                        self._key_start = None
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = i
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == self._object_depth and char == "{":
+                    self._value_start = i
+            elif char in "}]":
+                if self._depth == self._object_depth and self._value_start is not None:
+                    try:
+                        completed.append((self._last_key, json.loads(text[self._value_start:i + 1])))
+                    except json.JSONDecodeError:
+                        pass
+                    self._value_start = None
+                self._depth -= 1
+        return completed
@@ -1,25 +1,64 @@
 """Servicio para cálculo de métricas de riesgo y concentración."""
+import json
 import logging
-from typing import Dict, List, Tuple
+import math
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 from app.models import PortfolioItemResponse
-from collections import defaultdict
+from app.services.prompt_cache_service import PromptCacheService, CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
 # Volatilidades estimadas anuales por tipo de activo (en %)
-ASSET_VOLATILITY = {
+# Las claves se internan para que las búsquedas con tipos internados comparen por identidad
+ASSET_VOLATILITY = {sys.intern(asset_type): vol for asset_type, vol in {
     "acciones": 20.0,  # 20% anual típico para acciones
     "bonos": 5.0,      # 5% anual típico para bonos
     "etf": 15.0,       # 15% anual típico para ETF
     "fondos": 12.0,    # 12% anual típico para fondos
     "divisas": 10.0,   # 10% anual típico para divisas
     "otros": 15.0      # 15% anual por defecto
-}
+}.items()}
 
 # Z-score para diferentes niveles de confianza (para VaR)
 VAR_Z_SCORE_95 = 1.645  # 95% de confianza
 VAR_Z_SCORE_99 = 2.326  # 99% de confianza
 
+# Factores de escala temporal (square root of time rule): sqrt(N_días / 365)
+SQRT_30D = math.sqrt(30 / 365)
+SQRT_90D = math.sqrt(90 / 365)
+
+# Caché compartido del dashboard (RiskService se instancia en cada request)
+_dashboard_cache = PromptCacheService()
+
+
+def _is_market_hours(now: Optional[datetime] = None) -> bool:
+    """Indica si estamos en horario de mercado (lunes a viernes, 13:30-20:00 UTC)."""
+    now = now or datetime.now(timezone.utc)
+    if now.weekday() >= 5:
+        return False
+    minutes = now.hour * 60 + now.minute
+    return 13 * 60 + 30 <= minutes < 20 * 60
+
+
+def _compute_risk_kernel(values: List[float], vols_per_item: List[float]) -> Tuple[float, float]:
+    """
+    Núcleo numérico de volatilidad/VaR sobre listas paralelas.
+    
+    Returns:
+        Tupla (valor total, volatilidad anual ponderada en %)
+    """
+    total = sum(values)
+    if total == 0:
+        return 0.0, 0.0
+    
+    weighted = 0.0
+    for value, vol in zip(values, vols_per_item):
+        if value > 0:
+            weighted += value * vol
+    return total, weighted / total
+
 
 def parse_value(value_str: str) -> float:
     """Parsea un valor numérico desde string, manejando comas y espacios."""
@@ -46,52 +85,78 @@ class RiskService:
     
     def calculate_exposure_by_asset(self, portfolio_items: List[PortfolioItemResponse]) -> List[Dict]:
         """Calcula exposición por activo individual."""
-        total_value = self.calculate_portfolio_value(portfolio_items)
+        values, _ = self._vectorize(portfolio_items)
+        total_value = sum(values)
         if total_value == 0:
             return []
         
-        exposures = []
-        for item in portfolio_items:
-            asset_value = parse_value(item.total_value) if item.total_value else 0.0
-            if asset_value > 0:
-                percentage = (asset_value / total_value) * 100
-                exposures.append({
-                    "id": item.id,
-                    "name": item.name,
-                    "symbol": item.symbol,
-                    "asset_type": item.asset_type,
-                    "value": asset_value,
-                    "percentage": round(percentage, 2),
-                    "currency": item.currency or "USD"
-                })
-        
-        # Ordenar por porcentaje descendente
-        exposures.sort(key=lambda x: x["percentage"], reverse=True)
-        return exposures
+        # Calcular porcentajes y ordenar índices (descendente) antes de construir los dicts,
+        # omitiendo los activos sin valor
+        percentages = [round((value / total_value) * 100, 2) for value in values]
+        order = sorted(
+            (i for i, value in enumerate(values) if value > 0),
+            key=percentages.__getitem__,
+            reverse=True
+        )
+        
+        return [
+            {
+                "id": portfolio_items[i].id,
+                "name": portfolio_items[i].name,
+                "symbol": portfolio_items[i].symbol,
+                "asset_type": portfolio_items[i].asset_type,
+                "value": values[i],
+                "percentage": percentages[i],
+                "currency": portfolio_items[i].currency or "USD"
+            }
+            for i in order
+        ]
+    
+    def _vectorize(self, portfolio_items: List[PortfolioItemResponse]) -> Tuple[List[float], List[str]]:
+        """
+        Parsea valores y tipos de activo una sola vez en listas paralelas.
+        
+        Los tipos de activo se internan: son pocos valores repetidos y así las
+        búsquedas en ASSET_VOLATILITY y la agrupación por sector comparan por identidad.
+        """
+        values = [parse_value(item.total_value) if item.total_value else 0.0 for item in portfolio_items]
+        asset_types = [sys.intern(item.asset_type) for item in portfolio_items]
+        return values, asset_types
     
     def calculate_exposure_by_sector(self, portfolio_items: List[PortfolioItemResponse]) -> List[Dict]:
         """Calcula exposición por sector (tipo de activo)."""
-        total_value = self.calculate_portfolio_value(portfolio_items)
+        values, asset_types = self._vectorize(portfolio_items)
+        total_value = sum(values)
         if total_value == 0:
             return []
         
-        sector_values = defaultdict(float)
-        sector_counts = defaultdict(int)
+        # Factorizar tipos de activo en códigos enteros y acumular por código
+        codes: Dict[str, int] = {}
+        sectors: List[str] = []
+        sums: List[float] = []
+        counts: List[int] = []
         
-        for item in portfolio_items:
-            asset_value = parse_value(item.total_value) if item.total_value else 0.0
-            if asset_value > 0:
-                sector_values[item.asset_type] += asset_value
-                sector_counts[item.asset_type] += 1
+        for asset_type, asset_value in zip(asset_types, values):
+            if asset_value <= 0:
+                continue
+            code = codes.get(asset_type)
+            if code is None:
+                code = codes[asset_type] = len(sectors)
+                sectors.append(asset_type)
+                sums.append(0.0)
+                counts.append(0)
+            sums[code] += asset_value
+            counts[code] += 1
         
         exposures = []
-        for sector, value in sorted(sector_values.items(), key=lambda x: x[1], reverse=True):
+        for code in sorted(range(len(sectors)), key=sums.__getitem__, reverse=True):
+            value = sums[code]
             percentage = (value / total_value) * 100
             exposures.append({
-                "sector": sector,
+                "sector": sectors[code],
                 "value": value,
                 "percentage": round(percentage, 2),
-                "asset_count": sector_counts[sector]
+                "asset_count": counts[code]
             })
         
         return exposures
@@ -106,7 +171,7 @@ class RiskService:
         Calcula volatilidad estimada del portafolio para N días.
         Usa volatilidades estimadas por tipo de activo.
         """
-        total_value = self.calculate_portfolio_value(portfolio_items)
+        total_value, annual_volatility = self._risk_kernel(portfolio_items)
         if total_value == 0:
             return {
                 "volatility_30d": 0.0,
@@ -114,23 +179,10 @@ class RiskService:
                 "annual_volatility": 0.0
             }
         
-        # Calcular volatilidad ponderada del portafolio
-        weighted_vol = 0.0
-        
-        for item in portfolio_items:
-            asset_value = parse_value(item.total_value) if item.total_value else 0.0
-            if asset_value > 0:
-                weight = asset_value / total_value
-                asset_vol = ASSET_VOLATILITY.get(item.asset_type, 15.0)
-                weighted_vol += weight * asset_vol
-        
-        annual_volatility = weighted_vol
-        
         # Convertir a volatilidad para N días usando square root of time rule
         # Vol_Ndías = Vol_anual * sqrt(N_días / 365)
-        import math
-        volatility_30d = annual_volatility * math.sqrt(30 / 365)
-        volatility_90d = annual_volatility * math.sqrt(90 / 365)
+        volatility_30d = annual_volatility * SQRT_30D
+        volatility_90d = annual_volatility * SQRT_90D
         
         return {
             "volatility_30d": round(volatility_30d, 2),
@@ -144,7 +196,7 @@ class RiskService:
         
         VaR = Portfolio_Value * Volatility * sqrt(days/365) * Z_score
         """
-        total_value = self.calculate_portfolio_value(portfolio_items)
+        total_value, annual_volatility = self._risk_kernel(portfolio_items)
         if total_value == 0:
             return {
                 "var_30d_95": 0.0,
@@ -153,33 +205,65 @@ class RiskService:
                 "var_90d_99": 0.0
             }
         
-        vol_metrics = self.calculate_volatility(portfolio_items)
-        annual_vol = vol_metrics["annual_volatility"] / 100  # Convertir a decimal
-        
-        import math
-        z_score_95 = VAR_Z_SCORE_95
-        z_score_99 = VAR_Z_SCORE_99
-        
-        # VaR para 30 días
-        var_30d_95 = total_value * annual_vol * math.sqrt(30 / 365) * z_score_95
-        var_30d_99 = total_value * annual_vol * math.sqrt(30 / 365) * z_score_99
-        
-        # VaR para 90 días
-        var_90d_95 = total_value * annual_vol * math.sqrt(90 / 365) * z_score_95
-        var_90d_99 = total_value * annual_vol * math.sqrt(90 / 365) * z_score_99
+        # Se usa la volatilidad anual redondeada, igual que la reportada en el dashboard
+        annual_vol = round(annual_volatility, 2) / 100  # Convertir a decimal
+        base_30d = total_value * annual_vol * SQRT_30D
+        base_90d = total_value * annual_vol * SQRT_90D
         
         return {
-            "var_30d_95": round(var_30d_95, 2),
-            "var_90d_95": round(var_90d_95, 2),
-            "var_30d_99": round(var_30d_99, 2),
-            "var_90d_99": round(var_90d_99, 2),
+            "var_30d_95": round(base_30d * VAR_Z_SCORE_95, 2),
+            "var_90d_95": round(base_90d * VAR_Z_SCORE_95, 2),
+            "var_30d_99": round(base_30d * VAR_Z_SCORE_99, 2),
+            "var_90d_99": round(base_90d * VAR_Z_SCORE_99, 2),
             "portfolio_value": round(total_value, 2)
         }
     
-    def calculate_risk_dashboard(self, portfolio_items: List[PortfolioItemResponse], top_n: int = 5) -> Dict:
+    def _risk_kernel(self, portfolio_items: List[PortfolioItemResponse]) -> Tuple[float, float]:
+        """Prepara las listas de valores/volatilidades y ejecuta el núcleo numérico."""
+        values, asset_types = self._vectorize(portfolio_items)
+        vols_per_item = [ASSET_VOLATILITY.get(asset_type, 15.0) for asset_type in asset_types]
+        return _compute_risk_kernel(values, vols_per_item)
+    
+    def calculate_risk_dashboard(
+        self,
+        portfolio_items: List[PortfolioItemResponse],
+        top_n: int = 5,
+        use_cache: bool = True
+    ) -> Dict:
         """
         Calcula todas las métricas del dashboard de riesgo.
+        
+        El resultado es determinístico para una misma foto de la cartera, por lo que
+        se cachea con clave (id, total_value, asset_type, updated_at) de cada item:
+        5 minutos en horario de mercado y 24 horas fuera de él.
         """
+        if not use_cache or not portfolio_items:
+            return self._compute_risk_dashboard(portfolio_items, top_n)
+        
+        static_data = {
+            "top_n": top_n,
+            "items": sorted(
+                (
+                    (item.id, item.total_value, item.asset_type, str(item.updated_at))
+                    for item in portfolio_items
+                ),
+                key=lambda entry: entry[0]
+            )
+        }
+        # Se cachea el JSON serializado: cada hit devuelve un dict nuevo que el caller puede modificar
+        cached = _dashboard_cache.get("risk_dashboard", static_data)
+        if cached is not None:
+            return json.loads(cached)
+        
+        dashboard = self._compute_risk_dashboard(portfolio_items, top_n)
+        cache_ttl = CACHE_TTL["dynamic"] if _is_market_hours() else CACHE_TTL["static"]
+        # Cada foto de la cartera es una entrada distinta: se purgan las vencidas para no acumularlas
+        _dashboard_cache.clear_expired()
+        _dashboard_cache.set("risk_dashboard", static_data, json.dumps(dashboard), cache_ttl=cache_ttl)
+        return dashboard
+    
+    def _compute_risk_dashboard(self, portfolio_items: List[PortfolioItemResponse], top_n: int) -> Dict:
+        """Calcula el dashboard de riesgo sin pasar por el caché."""
         if not portfolio_items:
             return {
                 "portfolio_value": 0.0,
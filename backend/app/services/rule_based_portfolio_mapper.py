@@ -6,6 +6,14 @@ from app.models import PortfolioAssetMapping
 
 logger = logging.getLogger(__name__)
 
+# Patrón combinado para recorrer el texto una sola vez:
+# - ticker: Ej: AAPL, AAPL.US, GGAL.BA
+# - org: nombres propios capitalizados (aproximación a entidades ORG)
+_MENTIONED_ASSETS_PATTERN = re.compile(
+    r'(?P<ticker>\b[A-Z]{1,5}(?:\.[A-Z]{1,3})?\b)'
+    r'|(?P<org>\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b)'
+)
+
 
 class RuleBasedPortfolioMapper:
     """Mapea escenarios a activos de la cartera usando reglas y coincidencias."""
@@ -89,25 +97,21 @@ class RuleBasedPortfolioMapper:
         tickers = set()
         names = set()
         
-        # Patrones para detectar tickers
-        ticker_pattern = r'\b([A-Z]{1,5}(?:\.[A-Z]{1,3})?)\b'  # Ej: AAPL, AAPL.US, GGAL.BA
-        
         for item in news_items:
             text = item.get("body") or item.get("text") or item.get("title", "")
             if not text:
                 continue
             
-            # Buscar tickers con patrón
-            found_tickers = re.findall(ticker_pattern, text)
-            tickers.update([t.upper() for t in found_tickers if len(t) >= 2])
-            
-            # Extraer nombres de empresas comunes (de entidades ORG)
-            # Esto se puede mejorar con un diccionario de aliases
-            # Por ahora, buscamos nombres comunes en mayúsculas
-            org_pattern = r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'
-            found_orgs = re.findall(org_pattern, text)
-            # Filtrar nombres muy cortos o muy largos
-            names.update([n for n in found_orgs if 3 <= len(n) <= 50])
+            # Una sola pasada: tickers por patrón y nombres de empresas comunes
+            # (esto se puede mejorar con un diccionario de aliases)
+            for match in _MENTIONED_ASSETS_PATTERN.finditer(text):
+                found = match.group()
+                if match.lastgroup == "ticker":
+                    if len(found) >= 2:
+                        tickers.add(found.upper())
+                elif 3 <= len(found) <= 50:
+                    # Filtrar nombres muy cortos o muy largos
+                    names.add(found)
         
         return list(tickers), list(names)
     
@@ -212,30 +216,18 @@ class RuleBasedPortfolioMapper:
         scenarios: Dict
     ) -> List[PortfolioAssetMapping]:
         """Mapea activos por sector del driver."""
-        mappings = []
         driver_sector = driver.get("sector")
-        
         if not driver_sector:
-            return mappings
-        
-        # Mapeo de sectores (simplificado, se puede expandir)
-        sector_mapping = {
-            "tecnología": ["TECH", "TECHNOLOGY", "SOFTWARE", "HARDWARE"],
-            "finanzas": ["FINANCE", "BANKING", "FINANCIAL"],
-            "energía": ["ENERGY", "OIL", "GAS"],
-            "salud": ["HEALTH", "PHARMA", "BIOTECH"],
-            "consumo": ["CONSUMER", "RETAIL"],
-            "industria": ["INDUSTRIAL", "MANUFACTURING"],
-            "telecomunicaciones": ["TELECOM", "TELECOMMUNICATIONS"],
-            "bienes raíces": ["REAL_ESTATE", "REALTY"]
-        }
+            return []
         
         # Buscar items de cartera que coincidan con el sector
         # (esto requeriría que los items tengan campo de sector, por ahora es simplificado)
         # Por ahora, mapeamos todos los items con sensibilidad menor
+        mappings = []
         
         driver_sentiment = driver.get("sentiment", "neutral")
         sensitivity = self._calculate_sensitivity(driver_sentiment, scenarios) * 0.5  # Menor sensibilidad para sector
+        impact_description = f"Impacto indirecto a través del sector {driver_sector}"
         
         for item in portfolio_items:
             # Evitar duplicados (ya mapeado por ticker o nombre)
@@ -248,8 +240,6 @@ class RuleBasedPortfolioMapper:
             
             confidence = 0.4  # Baja confianza para mapeo por sector genérico
             
-            impact_description = f"Impacto indirecto a través del sector {driver_sector}"
-            
             mappings.append(PortfolioAssetMapping(
                 asset_type="sector",
                 identifier=driver_sector,
@@ -258,8 +248,12 @@ class RuleBasedPortfolioMapper:
                 confidence=confidence,
                 impact_description=impact_description
             ))
+            
+            # Limitar a 5 mapeos por sector para evitar sobrecarga
+            if len(mappings) >= 5:
+                break
         
-        return mappings[:5]  # Limitar a 5 mapeos por sector para evitar sobrecarga
+        return mappings
     
     def _calculate_sensitivity(self, sentiment: str, scenarios: Dict) -> float:
         """Calcula sensibilidad basada en sentimiento y escenarios."""
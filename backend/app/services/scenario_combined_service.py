@@ -0,0 +1,242 @@
+"""Servicio que genera escenarios y su mapeo a cartera en una sola llamada a OpenAI por driver."""
+import asyncio
+import logging
+import json
+from typing import List, Dict, Optional, Tuple
+from openai import AsyncOpenAI
+from app.models import PortfolioAssetMapping, Scenario
+from app.services.openai_client import create_chat_completion, openai_error_message, run_sync
+from app.services.prompt_template_service import SCENARIO_TASK_INSTRUCTIONS
+from app.services.response_schemas import (
+    SCENARIOS_WITH_MAPPINGS_RESPONSE_FORMAT,
+    parse_json_response
+)
+from app.services.scenario_generation_service import (
+    SCENARIOS_TEMPLATE_VERSION,
+    ScenarioGenerationService,
+    _select_top_news
+)
+from app.services.scenario_portfolio_mapping_service import (
+    MAPPING_SYSTEM_PROMPT,
+    MAPPING_TASK_INSTRUCTIONS,
+    PortfolioContext,
+    ScenarioPortfolioMappingService
+)
+from app.services.token_logger import token_logger
+
+logger = logging.getLogger(__name__)
+
+# Tarea de mapeo que se agrega a las instrucciones de escenarios; los escenarios ya están en
+# contexto, así que no hace falta resumirlos y re-serializarlos como en el mapeo por separado
+COMBINED_MAPPING_HEADER = (
+    "MAPEO A CARTERA:\n"
+    "Además, mapea los tres escenarios que generes a los activos de la cartera listada más abajo.\n\n"
+)
+
+COMBINED_RESPONSE_INSTRUCTIONS = (
+    'Responde ÚNICAMENTE con un objeto JSON con dos claves: "scenarios" (un objeto con las claves '
+    'base, risk y opportunity, cada una con los campos de escenario indicados) y "mappings" (la '
+    'lista de mapeos a la cartera con los campos indicados).\n'
+)
+
+# Parte fija del prompt combinado: una sola instrucción de formato (la del objeto combinado),
+# sin el formato propio del prompt de escenarios
+COMBINED_PROMPT_HEAD = "".join((
+    SCENARIO_TASK_INSTRUCTIONS,
+    COMBINED_MAPPING_HEADER,
+    MAPPING_TASK_INSTRUCTIONS, "\n",
+    COMBINED_RESPONSE_INSTRUCTIONS, "\n"
+))
+
+
+class CombinedScenarioService:
+    """
+    Genera escenarios y mapeo a cartera de un driver con una única llamada al modelo.
+
+    Reutiliza la construcción de prompts, el caché y la validación de ScenarioGenerationService
+    y ScenarioPortfolioMappingService; solo cambia la forma de la request y la respuesta.
+    """
+
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        generation_service: Optional[ScenarioGenerationService] = None,
+        mapping_service: Optional[ScenarioPortfolioMappingService] = None
+    ):
+        """
+        Inicializa el servicio.
+
+        Args:
+            client: Cliente AsyncOpenAI a usar. Por defecto se usa el compartido del event loop.
+            generation_service: Servicio de escenarios a reutilizar (se crea uno si no se pasa)
+            mapping_service: Servicio de mapeo a reutilizar (se crea uno si no se pasa)
+        """
+        self.generation_service = generation_service or ScenarioGenerationService(client)
+        self.mapping_service = mapping_service or ScenarioPortfolioMappingService(client)
+        self.model = self.generation_service.model
+        self.temperature = self.generation_service.temperature
+        self.response_cache = self.generation_service.response_cache
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Cliente asíncrono (el mismo que usa el servicio de escenarios)."""
+        return self.generation_service.client
+
+    def generate_scenarios_and_mappings(
+        self,
+        driver: Dict,
+        related_news_items: List[Dict],
+        portfolio_items: List[Dict],
+        portfolio_ctx: Optional[PortfolioContext] = None
+    ) -> Tuple[Dict[str, Scenario], List[PortfolioAssetMapping]]:
+        """Fachada síncrona de generate_scenarios_and_mappings_async."""
+        return run_sync(self.generate_scenarios_and_mappings_async(
+            driver, related_news_items, portfolio_items, portfolio_ctx
+        ))
+
+    async def generate_scenarios_and_mappings_async(
+        self,
+        driver: Dict,
+        related_news_items: List[Dict],
+        portfolio_items: List[Dict],
+        portfolio_ctx: Optional[PortfolioContext] = None
+    ) -> Tuple[Dict[str, Scenario], List[PortfolioAssetMapping]]:
+        """
+        Genera escenarios (base, riesgo, oportunidad) y su mapeo a cartera para un driver.
+
+        Args:
+            driver: Diccionario con información del driver (driver, description, related_news_ids)
+            related_news_items: Lista de noticias relacionadas al driver
+            portfolio_items: Lista de items de cartera
+            portfolio_ctx: Contexto de la cartera ya calculado (se construye si no se pasa)
+
+        Returns:
+            Tupla (escenarios por tipo, lista de PortfolioAssetMapping)
+        """
+        driver_name = driver.get("driver", "Unknown")
+        if not related_news_items:
+            logger.warning(f"No hay noticias relacionadas para el driver '{driver_name}'")
+            return {}, []
+        if not portfolio_items:
+            # Sin cartera no hay nada que mapear: alcanza con la generación de escenarios sola
+            scenarios = await self.generation_service.generate_scenarios_async(
+                driver, related_news_items
+            )
+            return scenarios, []
+
+        try:
+            related_news_items = _select_top_news(related_news_items)
+            portfolio_ctx = portfolio_ctx or PortfolioContext.from_items(portfolio_items)
+            prompt = self._build_prompt(driver, related_news_items, portfolio_ctx)
+            if prompt is None:
+                # La cartera no entra junto a los escenarios: escenarios y mapeo por separado
+                # (cada prompt con su propio presupuesto)
+                logger.info(
+                    f"Prompt combinado excede límites para driver '{driver_name}': "
+                    f"generando escenarios y mapeo por separado"
+                )
+                scenarios = await self.generation_service.generate_scenarios_async(
+                    driver, related_news_items
+                )
+                mappings = await self.mapping_service.map_scenarios_to_portfolio_async(
+                    driver, scenarios, portfolio_items, portfolio_ctx
+                ) if scenarios else []
+                return scenarios, mappings
+            system_content, user_content = prompt
+            cache_key = self.response_cache.make_key(
+                "scenarios_mappings", self.model, self.temperature,
+                system_content, user_content,
+                template_version=SCENARIOS_TEMPLATE_VERSION
+            )
+
+            response_text = self.response_cache.get("scenarios_mappings", cache_key)
+            from_cache = response_text is not None
+            usage = None
+
+            if not from_cache:
+                logger.info(
+                    f"Generando escenarios y mapeo a cartera para driver '{driver_name}': "
+                    f"{len(related_news_items)} noticias, {len(portfolio_items)} items de cartera"
+                )
+                response = await create_chat_completion(
+                    self.client,
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_content},
+                        {"role": "user", "content": user_content}
+                    ],
+                    temperature=self.temperature,
+                    response_format=SCENARIOS_WITH_MAPPINGS_RESPONSE_FORMAT,
+                    timeout=120.0
+                )
+                response_text = response.choices[0].message.content
+                usage = response.usage
+
+                if usage:
+                    token_logger.log_usage(
+                        prompt_tokens=usage.prompt_tokens,
+                        completion_tokens=usage.completion_tokens,
+                        step_name=f"scenario_generation_mapping_{driver_name}",
+                        prompt_type="scenario_generation_mapping",
+                        usage=usage
+                    )
+
+            result = parse_json_response(response_text)
+
+            if not from_cache:
+                # Solo cachear respuestas con JSON válido
+                self.response_cache.set(
+                    "scenarios_mappings", cache_key, response_text,
+                    token_count=usage.total_tokens if usage else None
+                )
+
+            scenarios = self.generation_service._validate_and_structure_scenarios(result.get("scenarios") or {})
+            mappings = self.mapping_service._validate_and_structure_mappings(
+                {"mappings": result.get("mappings") or []}, portfolio_ctx
+            ) if scenarios else []
+
+            logger.info(
+                f"Escenarios y mapeo generados para driver '{driver_name}': "
+                f"{len(scenarios)} escenarios, {len(mappings)} activos. "
+                f"Tokens usados: {usage.total_tokens if usage else 'N/A (caché)'}"
+            )
+            return scenarios, mappings
+
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parseando JSON de respuesta de OpenAI: {e}")
+            raise ValueError(f"Error procesando respuesta de OpenAI: formato JSON inválido")
+        except Exception as e:
+            logger.error(f"Error generando escenarios y mapeo: {e}", exc_info=True)
+            raise ValueError(openai_error_message(e, "Error al generar escenarios y mapeo"))
+
+    def _build_prompt(
+        self,
+        driver: Dict,
+        related_news_items: List[Dict],
+        portfolio_ctx: PortfolioContext
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Construye (system, user) del prompt combinado: instrucciones fijas de escenarios y mapeo
+        con una única instrucción de formato, después la cartera y al final los datos del driver.
+
+        El prompt completo (cartera incluida) se valida contra los límites de longitud, con el
+        mismo truncamiento de noticias que la plantilla de escenarios. Devuelve None si ni con
+        el truncamiento agresivo entra.
+        """
+        template_service = self.generation_service.template_service
+        system_content = (
+            f"{template_service.get_system_context('scenario_generation')}\n\n{MAPPING_SYSTEM_PROMPT}"
+        )
+        variable_data = {"driver": driver, "related_news_items": related_news_items}
+
+        for truncate in (template_service._truncate_variable_data, template_service._apply_aggressive_truncation):
+            data = truncate("scenario_generation", variable_data)
+            user_content = "".join((
+                COMBINED_PROMPT_HEAD,
+                portfolio_ctx.portfolio_section, "\n\n",
+                template_service.build_scenario_data_section(data)
+            ))
+            is_valid, _, _ = template_service.validate_prompt_length(f"{system_content}\n\n{user_content}")
+            if is_valid:
+                return system_content, user_content
+        return None
@@ -1,36 +1,170 @@
 """Servicio para agrupar noticias en drivers temáticos."""
+import asyncio
 import logging
 import json
-from typing import List, Dict, Set
-from openai import OpenAI
+import math
+from typing import Any, Callable, List, Dict, Optional, Set, Tuple
+from openai import AsyncOpenAI
 from app.config import (
     OPENAI_API_KEY,
     OPENAI_MODEL,
     OPENAI_TEMPERATURE
 )
+from app.models import NormalizedNewsItem
+from app.services.llm_response_cache import get_llm_response_cache
+from app.services.prompt_template_service import PROMPT_SUMMARY_MAX_CHARS, truncate_at_word
+from app.services.token_logger import token_logger
+from app.services.openai_client import (
+    get_async_client,
+    create_chat_completion,
+    create_embeddings,
+    openai_error_message,
+    run_sync
+)
+from app.services.response_schemas import (
+    CLUSTER_NAMES_RESPONSE_FORMAT,
+    DRIVERS_RESPONSE_FORMAT,
+    OPENAI_STRUCTURED_OUTPUTS,
+    TopLevelObjectScanner,
+    parse_json_response
+)
 
 logger = logging.getLogger(__name__)
 
+try:
+    from app.config import OPENAI_MODEL_DRIVERS
+except ImportError:
+    # Agrupar y etiquetar noticias no requiere el modelo grande: modelo más barato y rápido
+    OPENAI_MODEL_DRIVERS = "gpt-4o-mini"
+
+try:
+    from app.config import DRIVER_IDENTIFICATION_CHUNK_SIZE
+except ImportError:
+    # Máximo de noticias por request de identificación de drivers (corpus mayores se parten)
+    DRIVER_IDENTIFICATION_CHUNK_SIZE = 80
+
+try:
+    from app.config import DRIVER_CLUSTERING_MAX_NEWS, OPENAI_EMBEDDING_MODEL
+except ImportError:
+    # Hasta este número de noticias los drivers se agrupan localmente por embeddings y el LLM
+    # solo los nombra (0 desactiva el atajo)
+    DRIVER_CLUSTERING_MAX_NEWS = 20
+    OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+
+try:
+    from app.config import DRIVER_STREAMING
+except ImportError:
+    # Recibir los drivers en streaming para que el motor empiece sus escenarios antes
+    DRIVER_STREAMING = True
+
+# Versión de la plantilla de identificación de drivers (forma parte de la clave de caché)
+DRIVERS_TEMPLATE_VERSION = "4"
+
+# Con Structured Outputs la estructura la impone la API: el ejemplo solo se envía sin ella
+DRIVERS_RESPONSE_INSTRUCTIONS = (
+    "Responde con un objeto JSON con la lista de drivers.\n"
+    if OPENAI_STRUCTURED_OUTPUTS else
+    """Responde en formato JSON con esta estructura:
+{
+    "drivers": [
+        {
+            "driver": "Nombre del driver",
+            "description": "Descripción del driver",
+            "related_news_ids": [1, 2, 3]
+        }
+    ]
+}
+"""
+)
+
+DRIVER_SYSTEM_PROMPT = (
+    "Eres un analista financiero experto especializado en identificar drivers temáticos "
+    "que mueven los mercados. Agrupas noticias relacionadas en temas coherentes que "
+    "representan fuerzas fundamentales del mercado. "
+    "Cada driver debe ser específico, accionable y basado en las noticias proporcionadas. "
+    "Evitas drivers genéricos o demasiado amplios."
+)
+
+
+def _cluster_by_average_linkage(vectors: List[List[float]], n_clusters: int) -> List[List[int]]:
+    """
+    Clustering aglomerativo (enlace promedio, similitud coseno) de vectores.
+    
+    Pensado para pocas noticias (DRIVER_CLUSTERING_MAX_NEWS): O(N²·d) para la matriz de
+    similitud y O(N³) para las fusiones, sin dependencias numéricas.
+    
+    Returns:
+        Listas de índices de cada cluster, de mayor a menor tamaño
+    """
+    units = []
+    for vector in vectors:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        units.append([x / norm for x in vector])
+    size = len(units)
+    similarity = [[1.0] * size for _ in range(size)]
+    for i in range(size):
+        for j in range(i + 1, size):
+            similarity[i][j] = similarity[j][i] = sum(a * b for a, b in zip(units[i], units[j]))
+    
+    clusters = [[i] for i in range(size)]
+    while len(clusters) > max(1, n_clusters):
+        best = None
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                total = sum(similarity[i][j] for i in clusters[a] for j in clusters[b])
+                average = total / (len(clusters[a]) * len(clusters[b]))
+                if best is None or average > best[0]:
+                    best = (average, a, b)
+        _, a, b = best
+        clusters[a].extend(clusters.pop(b))
+    return sorted(clusters, key=len, reverse=True)
+
 
 class ScenarioDriverService:
     """Servicio para identificar y agrupar noticias en drivers temáticos."""
     
-    def __init__(self):
-        """Inicializa el cliente de OpenAI."""
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        """
+        Inicializa el servicio.
+        
+        Args:
+            client: Cliente AsyncOpenAI a usar. Por defecto se usa el compartido del event loop
+                (ver openai_client.get_async_client) para reutilizar conexiones entre servicios.
+        """
         if not OPENAI_API_KEY or OPENAI_API_KEY == "your_openai_api_key_here":
             raise ValueError("OPENAI_API_KEY no está configurada correctamente en app/config.py")
         
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.model = OPENAI_MODEL
+        self._client = client
+        self.model = OPENAI_MODEL_DRIVERS
+        # Modelo al que se escala si la respuesta del modelo de drivers no es utilizable
+        self.fallback_model = OPENAI_MODEL
         self.temperature = OPENAI_TEMPERATURE
+        self.response_cache = get_llm_response_cache()
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Cliente asíncrono (inyectado o el compartido del event loop actual)."""
+        return self._client or get_async_client()
+    
+    def identify_drivers(self, standardized_news_items: List[NormalizedNewsItem], max_drivers: int = 5) -> List[Dict]:
+        """Fachada síncrona de identify_drivers_async para callers que no usan asyncio."""
+        return run_sync(self.identify_drivers_async(standardized_news_items, max_drivers))
     
-    def identify_drivers(self, standardized_news_items: List[Dict], max_drivers: int = 5) -> List[Dict]:
+    async def identify_drivers_async(
+        self,
+        standardized_news_items: List[NormalizedNewsItem],
+        max_drivers: int = 5,
+        on_driver: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict]:
         """
         Identifica drivers temáticos a partir de noticias estandarizadas.
         
         Args:
-            standardized_news_items: Lista de diccionarios con datos estandarizados de noticias
+            standardized_news_items: Noticias normalizadas (ver ScenarioEngineService._normalize_news)
             max_drivers: Máximo número de drivers a identificar
+            on_driver: Callback opcional invocado con cada driver validado apenas se completa en
+                la respuesta en streaming (solo con un único request sin hit de caché). Si se
+                invocó al menos una vez, la lista devuelta son exactamente esos drivers.
             
         Returns:
             Lista de diccionarios con drivers identificados, cada uno con:
@@ -43,106 +177,376 @@ class ScenarioDriverService:
             return []
         
         try:
-            prompt = self._build_driver_identification_prompt(standardized_news_items, max_drivers)
+            if len(standardized_news_items) <= DRIVER_CLUSTERING_MAX_NEWS:
+                try:
+                    drivers = await self._identify_drivers_by_clustering(standardized_news_items, max_drivers)
+                except Exception as e:
+                    # El atajo es opcional (p.ej. modelo de embeddings no habilitado para la key):
+                    # cualquier fallo cae a la identificación con el LLM
+                    logger.warning(f"Clustering de drivers por embeddings falló ({e}); identificando con el LLM")
+                else:
+                    if drivers:
+                        return drivers
+                    logger.warning("El clustering no produjo drivers válidos; identificando con el LLM")
             
+            if len(standardized_news_items) <= DRIVER_IDENTIFICATION_CHUNK_SIZE:
+                return await self._identify_drivers_chunk(
+                    standardized_news_items, max_drivers, on_driver=on_driver
+                )
+            
+            # Corpus grande: partir en bloques con IDs globales (el fallback idx+1 del prompt
+            # sería local a cada bloque) e identificar drivers de cada bloque en paralelo
+            items_with_ids = [
+                {**news, "id": news.get("id", idx + 1)}
+                for idx, news in enumerate(standardized_news_items)
+            ]
+            chunks = [
+                items_with_ids[start:start + DRIVER_IDENTIFICATION_CHUNK_SIZE]
+                for start in range(0, len(items_with_ids), DRIVER_IDENTIFICATION_CHUNK_SIZE)
+            ]
             logger.info(
-                f"Identificando drivers temáticos: {len(standardized_news_items)} noticias, "
-                f"máximo {max_drivers} drivers"
+                f"Identificando drivers en {len(chunks)} bloques de hasta "
+                f"{DRIVER_IDENTIFICATION_CHUNK_SIZE} noticias"
+            )
+            chunk_drivers = await asyncio.gather(
+                *(self._identify_drivers_chunk(chunk, max_drivers) for chunk in chunks)
             )
+            return self._merge_chunk_drivers(chunk_drivers, max_drivers)
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parseando JSON de respuesta de OpenAI: {e}")
+            raise ValueError(f"Error procesando respuesta de OpenAI: formato JSON inválido")
+        except Exception as e:
+            logger.error(f"Error identificando drivers: {e}", exc_info=True)
+            raise ValueError(openai_error_message(e, "Error al identificar drivers"))
+    
+    async def _identify_drivers_chunk(
+        self,
+        standardized_news_items: List[Dict],
+        max_drivers: int,
+        model: Optional[str] = None,
+        on_driver: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict]:
+        """
+        Identifica drivers para un bloque de noticias con una única llamada (o hit de caché).
+        
+        Si la respuesta del modelo de drivers no es JSON válido o ninguno de sus drivers pasa
+        la validación, se reintenta una vez con el modelo de respaldo (OPENAI_MODEL). Con
+        on_driver la llamada se hace en streaming (ver identify_drivers_async); una vez emitido
+        algún driver ya no se escala.
+        """
+        model = model or self.model
+        prompt = self._build_driver_identification_prompt(standardized_news_items, max_drivers)
+        
+        logger.info(
+            f"Identificando drivers temáticos: {len(standardized_news_items)} noticias, "
+            f"máximo {max_drivers} drivers (modelo {model})"
+        )
+        
+        cache_key = self.response_cache.make_key(
+            "drivers", model, self.temperature, DRIVER_SYSTEM_PROMPT, prompt,
+            template_version=DRIVERS_TEMPLATE_VERSION
+        )
+        response_text = self.response_cache.get("drivers", cache_key)
+        fresh = response_text is None
+        usage = None
+        emitted = []
+        
+        if fresh:
+            request = {
+                "model": model,
+                "messages": [
                     {
                         "role": "system",
-                        "content": (
-                            "Eres un analista financiero experto especializado en identificar drivers temáticos "
-                            "que mueven los mercados. Agrupas noticias relacionadas en temas coherentes que "
-                            "representan fuerzas fundamentales del mercado. "
-                            "Cada driver debe ser específico, accionable y basado en las noticias proporcionadas. "
-                            "Evitas drivers genéricos o demasiado amplios."
-                        )
+                        "content": DRIVER_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
+                "temperature": self.temperature,
+                "response_format": DRIVERS_RESPONSE_FORMAT,
+                "timeout": 60.0
+            }
+            if on_driver is not None and DRIVER_STREAMING:
+                response_text, usage, emitted = await self._stream_drivers(
+                    request, standardized_news_items, on_driver
+                )
+            else:
+                response = await create_chat_completion(self.client, **request)
+                response_text = response.choices[0].message.content
+                usage = response.usage
+        
+        if usage:
+            token_logger.log_usage(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                step_name=f"driver_identification_{model}",
+                prompt_type="driver_identification",
+                usage=usage
+            )
+        # Log de respuesta para debugging (el recorte solo se hace con DEBUG activo)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Respuesta de OpenAI (primeros 500 chars): %s", response_text[:500])
+        
+        can_escalate = model != self.fallback_model and not emitted
+        try:
+            drivers_dict = parse_json_response(response_text)
+        except json.JSONDecodeError:
+            if emitted:
+                logger.warning(f"JSON final inválido de {model}; se conservan los {len(emitted)} drivers ya emitidos")
+                return emitted
+            if not can_escalate:
+                raise
+            logger.warning(f"JSON inválido de {model} al identificar drivers; reintentando con {self.fallback_model}")
+            return await self._identify_drivers_chunk(
+                standardized_news_items, max_drivers, self.fallback_model, on_driver
+            )
+        if fresh:
+            # Solo cachear respuestas con JSON válido
+            self.response_cache.set(
+                "drivers", cache_key, response_text,
+                token_count=usage.total_tokens if usage else None
+            )
+        logger.debug("Drivers parseados del JSON: %s", drivers_dict)
+        
+        if emitted:
+            logger.info(f"Identificados {len(emitted)} drivers temáticos (streaming)")
+            return emitted
+        
+        # Validar y estructurar la respuesta
+        drivers = self._validate_and_structure_drivers(drivers_dict, standardized_news_items)
+        
+        logger.info(f"Identificados {len(drivers)} drivers temáticos")
+        if len(drivers) == 0 and "drivers" in drivers_dict and len(drivers_dict["drivers"]) > 0:
+            logger.warning(f"Se recibieron {len(drivers_dict['drivers'])} drivers de OpenAI pero ninguno pasó la validación")
+            if can_escalate:
+                logger.warning(f"Reintentando identificación de drivers con {self.fallback_model}")
+                return await self._identify_drivers_chunk(
+                    standardized_news_items, max_drivers, self.fallback_model, on_driver
+                )
+        return drivers
+    
+    async def _stream_drivers(
+        self,
+        request: Dict,
+        standardized_news_items: List[Dict],
+        on_driver: Callable[[Dict], None]
+    ) -> Tuple[str, Any, List[Dict]]:
+        """
+        Ejecuta la identificación en streaming, validando cada driver apenas su objeto JSON se
+        completa y pasándolo a on_driver.
+        
+        Returns:
+            Tupla (texto completo de la respuesta, usage o None, drivers emitidos)
+        """
+        stream = await create_chat_completion(
+            self.client,
+            stream=True,
+            stream_options={"include_usage": True},
+            **request
+        )
+        scanner = TopLevelObjectScanner(depth=3)
+        parts = []
+        usage = None
+        emitted = []
+        
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            for key, driver_data in scanner.feed(delta):
+                if key != "drivers":
+                    continue
+                for driver in self._validate_and_structure_drivers({"drivers": [driver_data]}, standardized_news_items):
+                    emitted.append(driver)
+                    on_driver(driver)
+        
+        return "".join(parts), usage, emitted
+    
+    async def _identify_drivers_by_clustering(
+        self,
+        standardized_news_items: List[NormalizedNewsItem],
+        max_drivers: int
+    ) -> List[Dict]:
+        """
+        Atajo para pocas noticias: agrupa por embeddings y nombra los grupos con una sola llamada.
+        
+        Reemplaza la llamada generativa de agrupamiento por un request de embeddings y un
+        clustering local; el modelo de drivers solo pone nombre y descripción a cada grupo.
+        Devuelve [] si el atajo no aplica (pocas noticias, noticias sin texto o ningún grupo de
+        al menos dos noticias).
+        """
+        n_clusters = min(max_drivers, len(standardized_news_items) // 2)
+        items = [
+            {**news, "id": news.get("id", idx + 1)}
+            for idx, news in enumerate(standardized_news_items)
+        ]
+        texts = [
+            truncate_at_word(
+                (news.get("standardized_data") or {}).get("summary") or news.get("title") or "",
+                PROMPT_SUMMARY_MAX_CHARS
+            )
+            for news in items
+        ]
+        if n_clusters < 1 or not all(texts):
+            return []
+        
+        logger.info(
+            f"Identificando drivers por clustering de embeddings: {len(items)} noticias, "
+            f"{n_clusters} grupos"
+        )
+        embeddings = await create_embeddings(self.client, model=OPENAI_EMBEDDING_MODEL, input=texts)
+        vectors = [data.embedding for data in sorted(embeddings.data, key=lambda data: data.index)]
+        # Un driver agrupa al menos dos noticias (como exige el prompt de identificación): las
+        # noticias que quedan solas no forman driver
+        clusters = [
+            cluster for cluster in _cluster_by_average_linkage(vectors, n_clusters)
+            if len(cluster) >= 2
+        ]
+        if not clusters:
+            return []
+        
+        prompt = self._build_cluster_naming_prompt(
+            [[texts[i] for i in cluster] for cluster in clusters]
+        )
+        cache_key = self.response_cache.make_key(
+            "driver_names", self.model, self.temperature, DRIVER_SYSTEM_PROMPT, prompt,
+            template_version=DRIVERS_TEMPLATE_VERSION
+        )
+        response_text = self.response_cache.get("driver_names", cache_key)
+        response = None
+        if response_text is None:
+            response = await create_chat_completion(
+                self.client,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": DRIVER_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
                 temperature=self.temperature,
-                response_format={"type": "json_object"},
+                response_format=CLUSTER_NAMES_RESPONSE_FORMAT,
                 timeout=60.0
             )
-            
             response_text = response.choices[0].message.content
-            logger.info(f"Respuesta de OpenAI (primeros 500 chars): {response_text[:500]}")
-            
-            drivers_dict = json.loads(response_text)
-            logger.info(f"Drivers parseados del JSON: {drivers_dict}")
-            
-            # Validar y estructurar la respuesta
-            drivers = self._validate_and_structure_drivers(drivers_dict, standardized_news_items)
-            
-            logger.info(f"Identificados {len(drivers)} drivers temáticos")
-            if len(drivers) == 0 and "drivers" in drivers_dict and len(drivers_dict["drivers"]) > 0:
-                logger.warning(f"Se recibieron {len(drivers_dict['drivers'])} drivers de OpenAI pero ninguno pasó la validación")
-            return drivers
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parseando JSON de respuesta de OpenAI: {e}")
-            raise ValueError(f"Error procesando respuesta de OpenAI: formato JSON inválido")
-        except Exception as e:
-            error_str = str(e)
-            logger.error(f"Error identificando drivers: {e}", exc_info=True)
-            
-            if "401" in error_str or "invalid_api_key" in error_str:
-                raise ValueError(
-                    "Error de autenticación con OpenAI. Verifica tu API key en app/config.py"
+        
+        try:
+            names = parse_json_response(response_text)
+        except json.JSONDecodeError:
+            logger.warning("JSON inválido al nombrar clusters de drivers")
+            return []
+        if response is not None:
+            self.response_cache.set(
+                "driver_names", cache_key, response_text,
+                token_count=response.usage.total_tokens if response.usage else None
+            )
+        
+        drivers = []
+        for entry in names.get("clusters", []):
+            cluster_id = entry.get("cluster_id") if isinstance(entry, dict) else None
+            if not isinstance(cluster_id, int) or not 0 <= cluster_id < len(clusters):
+                continue
+            drivers.append({
+                "driver": entry.get("driver", ""),
+                "description": entry.get("description", ""),
+                "related_news_ids": [items[i]["id"] for i in clusters[cluster_id]]
+            })
+        return self._validate_and_structure_drivers({"drivers": drivers}, items)
+    
+    def _build_cluster_naming_prompt(self, cluster_summaries: List[List[str]]) -> str:
+        """Construye el prompt que pide nombre y descripción para cada grupo de noticias."""
+        clusters = [
+            {"cluster_id": cluster_id, "summaries": summaries}
+            for cluster_id, summaries in enumerate(cluster_summaries)
+        ]
+        return f"""Cada grupo listado al final reúne noticias financieras similares. Para cada grupo, nombra el driver temático que las une.
+
+Un driver temático es una fuerza fundamental del mercado (p.ej. "Política monetaria de la Fed", "Evolución de IA y chips").
+El nombre debe ser claro, específico y accionable; la descripción, de 1-2 frases.
+
+Responde en JSON: {{"clusters": [{{"cluster_id": 0, "driver": "Nombre del driver", "description": "Descripción del driver"}}]}}
+
+Grupos a nombrar:
+{json.dumps(clusters, ensure_ascii=False, separators=(",", ":"))}
+"""
+    
+    def _merge_chunk_drivers(self, chunk_drivers: List[List[Dict]], max_drivers: int) -> List[Dict]:
+        """
+        Fusiona los drivers de varios bloques.
+        
+        Drivers con el mismo nombre normalizado se unen (IDs sin duplicados, se conserva la
+        primera descripción) y el resultado se ordena por cantidad de noticias relacionadas.
+        """
+        merged: Dict[str, Dict] = {}
+        for drivers in chunk_drivers:
+            for driver in drivers:
+                key = " ".join(driver["driver"].lower().split())
+                existing = merged.get(key)
+                if existing is None:
+                    merged[key] = {
+                        "driver": driver["driver"],
+                        "description": driver["description"],
+                        "related_news_ids": list(driver["related_news_ids"])
+                    }
+                    continue
+                seen_ids = set(existing["related_news_ids"])
+                existing["related_news_ids"].extend(
+                    news_id for news_id in driver["related_news_ids"] if news_id not in seen_ids
                 )
-            elif "429" in error_str or "rate_limit" in error_str:
-                raise ValueError("Límite de tasa excedido. Por favor, intenta más tarde.")
-            elif "insufficient_quota" in error_str:
-                raise ValueError("Cuota de OpenAI agotada. Verifica tu cuenta.")
-            else:
-                raise ValueError(f"Error al identificar drivers: {error_str}")
+        
+        ranked = sorted(merged.values(), key=lambda d: len(d["related_news_ids"]), reverse=True)
+        logger.info(f"Fusionados {sum(len(d) for d in chunk_drivers)} drivers de bloques en {len(merged)}")
+        return ranked[:max_drivers]
     
-    def _build_driver_identification_prompt(self, standardized_news_items: List[Dict], max_drivers: int) -> str:
+    def _build_driver_identification_prompt(
+        self,
+        standardized_news_items: List[NormalizedNewsItem],
+        max_drivers: int
+    ) -> str:
         """Construye el prompt para identificación de drivers."""
         news_summaries = []
         for idx, news in enumerate(standardized_news_items):
             news_id = news.get("id", idx + 1)
-            standardized_data = news.get("standardized_data", {})
+            # standardized_data ya es dict plano (normalizado por el motor)
+            standardized_data = news.get("standardized_data") or {}
             
-            # Si standardized_data es un objeto Pydantic, convertirlo a dict
-            if hasattr(standardized_data, 'model_dump'):
-                standardized_data = standardized_data.model_dump()
-            elif hasattr(standardized_data, 'dict'):
-                standardized_data = standardized_data.dict()
-            
-            summary = standardized_data.get("summary", "")
+            summary = standardized_data.get("summary") or ""
             sentiment = standardized_data.get("sentiment", "neutral")
             tickers = standardized_data.get("tickers", [])
             categories = standardized_data.get("categories", [])
             
-            news_summaries.append({
-                "id": news_id,
-                "summary": summary,
-                "sentiment": sentiment,
-                "tickers": tickers,
-                "categories": categories
-            })
+            # Resumen truncado y sin campos vacíos: menos tokens de entrada por noticia
+            news_summary = {"id": news_id}
+            for key, value in (
+                ("summary", truncate_at_word(summary, PROMPT_SUMMARY_MAX_CHARS)),
+                ("sentiment", sentiment),
+                ("tickers", tickers),
+                ("categories", categories)
+            ):
+                if value:
+                    news_summary[key] = value
+            news_summaries.append(news_summary)
         
-        # Log de IDs que se están enviando
-        news_ids_sent = [ns["id"] for ns in news_summaries]
-        logger.info(f"IDs de noticias enviados a OpenAI para identificación de drivers: {news_ids_sent}")
+        # Log de IDs que se están enviando (la lista solo se arma con DEBUG activo)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "IDs de noticias enviados a OpenAI para identificación de drivers: %s",
+                [ns["id"] for ns in news_summaries]
+            )
         
-        prompt = f"""Analiza las siguientes noticias estandarizadas e identifica los drivers temáticos principales que las agrupan.
+        # Instrucciones y esquema invariantes primero, noticias al final: todas las llamadas
+        # comparten el prefijo y OpenAI reutiliza su caché de prefijos
+        prompt = f"""Analiza las noticias estandarizadas listadas al final e identifica los drivers temáticos principales que las agrupan.
 
 Un driver temático es una fuerza fundamental del mercado que agrupa múltiples noticias relacionadas. 
 Ejemplos: "Política monetaria de la Fed", "Tensiones geopolíticas en Oriente Medio", "Evolución de IA y chips", etc.
 
-Noticias a analizar:
-{json.dumps(news_summaries, indent=2, ensure_ascii=False)}
-
 Instrucciones:
 1. Identifica entre 1 y {max_drivers} drivers temáticos principales
 2. Cada driver debe agrupar al menos 2 noticias relacionadas
@@ -152,16 +556,9 @@ Instrucciones:
    - Una descripción breve (1-2 frases)
    - Los IDs de las noticias relacionadas
 
-Responde en formato JSON con esta estructura:
-{{
-    "drivers": [
-        {{
-            "driver": "Nombre del driver",
-            "description": "Descripción del driver",
-            "related_news_ids": [1, 2, 3]
-        }}
-    ]
-}}
+{DRIVERS_RESPONSE_INSTRUCTIONS}
+Noticias a analizar:
+{json.dumps(news_summaries, ensure_ascii=False, sort_keys=True, separators=(",", ":"))}
 """
         return prompt
     
@@ -171,7 +568,7 @@ Responde en formato JSON con esta estructura:
         
         if "drivers" not in drivers_dict:
             logger.warning("Respuesta de OpenAI no contiene campo 'drivers'")
-            logger.debug(f"Contenido recibido: {drivers_dict}")
+            logger.debug("Contenido recibido: %s", drivers_dict)
             return drivers
         
         # Crear mapa de IDs válidos (usar tanto el ID real como el índice+1 para mayor tolerancia)
@@ -183,7 +580,7 @@ Responde en formato JSON con esta estructura:
             # También agregar índice+1 como fallback
             valid_news_ids.add(idx + 1)
         
-        logger.info(f"IDs de noticias válidos (incluyendo índices): {valid_news_ids}")
+        logger.debug("IDs de noticias válidos (incluyendo índices): %s", valid_news_ids)
         
         for idx, driver_data in enumerate(drivers_dict["drivers"]):
             if not isinstance(driver_data, dict):
@@ -194,14 +591,14 @@ Responde en formato JSON con esta estructura:
             driver_description = driver_data.get("description", "").strip()
             related_ids = driver_data.get("related_news_ids", [])
             
-            logger.info(f"Procesando driver '{driver_name}': IDs relacionados={related_ids}")
+            logger.debug("Procesando driver '%s': IDs relacionados=%s", driver_name, related_ids)
             
             if not driver_name:
                 logger.warning(f"Driver en índice {idx} sin nombre, omitiendo")
                 continue
             
-            # Filtrar IDs inválidos
-            valid_ids = [news_id for news_id in related_ids if news_id in valid_news_ids]
+            # Filtrar IDs inválidos (y repetidos, conservando el orden)
+            valid_ids = [news_id for news_id in dict.fromkeys(related_ids) if news_id in valid_news_ids]
             
             # Si no hay IDs válidos pero hay IDs relacionados, intentar mapear por posición
             if not valid_ids and related_ids:
@@ -217,7 +614,7 @@ Responde en formato JSON con esta estructura:
                         real_id = mapped_news.get("id")
                         if real_id:
                             valid_ids.append(real_id)
-                            logger.info(f"Mapeado índice {news_id} a ID real {real_id}")
+                            logger.debug("Mapeado índice %s a ID real %s", news_id, real_id)
             
             if not valid_ids:
                 logger.warning(
@@ -232,7 +629,7 @@ Responde en formato JSON con esta estructura:
                 "description": driver_description,
                 "related_news_ids": valid_ids
             })
-            logger.info(f"Driver '{driver_name}' aceptado con {len(valid_ids)} noticias válidas")
+            logger.debug("Driver '%s' aceptado con %d noticias válidas", driver_name, len(valid_ids))
         
         return drivers
 
@@ -1,29 +1,51 @@
 """Servicio principal del motor de escenarios que orquesta todos los componentes."""
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import re
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from app.services.driver_detector import DriverDetector
 from app.services.template_scenario_generator import TemplateScenarioGenerator
 from app.services.rule_based_portfolio_mapper import RuleBasedPortfolioMapper
 from app.models import (
     DriverScenarioResponse,
+    NormalizedNewsItem,
     ScenarioEngineResponse
 )
 
+try:
+    from app.config import SCENARIO_MAX_CONCURRENCY
+except ImportError:
+    # Máximo de drivers procesados en paralelo (respetar límites RPM/TPM de OpenAI)
+    SCENARIO_MAX_CONCURRENCY = 4
+
+try:
+    from app.config import SCENARIO_COMBINED_MAPPING
+except ImportError:
+    # Modo OpenAI: escenarios y mapeo a cartera en una sola llamada por driver. Desactivado por
+    # defecto: esa llamada no usa streaming ni la clave por conjunto de noticias de los escenarios
+    SCENARIO_COMBINED_MAPPING = False
+
 logger = logging.getLogger(__name__)
 
+_WORD_PATTERN = re.compile(r"\w+")
+
 
 class ScenarioEngineService:
     """Servicio principal del motor de escenarios (usando reglas y plantillas, sin LLM)."""
     
-    def __init__(self, use_rule_based: bool = True):
+    def __init__(self, use_rule_based: bool = True, combined: bool = SCENARIO_COMBINED_MAPPING):
         """
         Inicializa los servicios del motor de escenarios.
         
         Args:
             use_rule_based: Si True, usa servicios basados en reglas (sin LLM). Si False, usa OpenAI (legacy).
+            combined: Solo modo OpenAI. Si True, escenarios y mapeo a cartera se piden en una sola
+                llamada por driver; si False, en dos llamadas sucesivas.
         """
         self.use_rule_based = use_rule_based
+        self.combined_service = None
         if use_rule_based:
             self.driver_service = DriverDetector()
             self.scenario_service = TemplateScenarioGenerator()
@@ -38,6 +60,13 @@ class ScenarioEngineService:
             self.driver_service = ScenarioDriverService()
             self.scenario_service = ScenarioGenerationService()
             self.mapping_service = ScenarioPortfolioMappingService()
+            if combined:
+                from app.services.scenario_combined_service import CombinedScenarioService
+                
+                self.combined_service = CombinedScenarioService(
+                    generation_service=self.scenario_service,
+                    mapping_service=self.mapping_service
+                )
             logger.info("ScenarioEngineService inicializado con OpenAI (legacy)")
     
     def generate_scenarios(
@@ -45,7 +74,30 @@ class ScenarioEngineService:
         standardized_news_items: List[Dict],
         portfolio_items: Optional[List[Dict]] = None,
         max_drivers: int = 5,
-        include_portfolio_mapping: bool = True
+        include_portfolio_mapping: bool = True,
+        use_batch_api: bool = False
+    ) -> ScenarioEngineResponse:
+        """Fachada síncrona de generate_scenarios_async para callers que no usan asyncio."""
+        coro = self.generate_scenarios_async(
+            standardized_news_items,
+            portfolio_items,
+            max_drivers,
+            include_portfolio_mapping,
+            use_batch_api
+        )
+        if self.use_rule_based:
+            return asyncio.run(coro)
+        # Con OpenAI: run_sync cierra el cliente y el limitador del loop al terminar
+        from app.services.openai_client import run_sync
+        return run_sync(coro)
+    
+    async def generate_scenarios_async(
+        self,
+        standardized_news_items: List[Dict],
+        portfolio_items: Optional[List[Dict]] = None,
+        max_drivers: int = 5,
+        include_portfolio_mapping: bool = True,
+        use_batch_api: bool = False
     ) -> ScenarioEngineResponse:
         """
         Genera escenarios completos: drivers → escenarios → mapeo a cartera.
@@ -55,6 +107,8 @@ class ScenarioEngineService:
             portfolio_items: Lista opcional de items de cartera
             max_drivers: Máximo número de drivers a generar
             include_portfolio_mapping: Si incluir mapeo a cartera
+            use_batch_api: Si True (solo modo OpenAI), genera todos los escenarios en un job de
+                la Batch API. Para corridas no interactivas: más barato pero con latencia alta.
             
         Returns:
             ScenarioEngineResponse con todos los drivers y escenarios generados
@@ -69,10 +123,65 @@ class ScenarioEngineService:
             method_label = "reglas locales (sin LLM)" if self.use_rule_based else "openai (legacy)"
             logger.info(f"[MOTOR LOCAL] Iniciando generación de escenarios: {len(standardized_news_items)} noticias (método: {method_label})")
             
+            # Normalizar una sola vez: los builders de prompts y servicios reciben dicts planos
+            normalized_news = self._normalize_news(standardized_news_items)
+            
+            # Noticias sindicadas/duplicadas: solo la primera aparición llega a los prompts
+            unique_news, duplicate_ids = self._dedupe_news(normalized_news)
+            
+            # Mapa de noticias por ID para acceso rápido. Los drivers se procesan en el mismo
+            # proceso (corutinas e hilos de asyncio.to_thread), así que todos comparten esta
+            # única instancia de solo lectura y cada tarea solo recibe sus ids
+            news_map = {news["id"]: news for news in normalized_news}
+            
+            # La cartera es la misma para todos los drivers: su sección del prompt y los tickers
+            # válidos se calculan una vez (solo modo OpenAI; el mapper por reglas no los usa)
+            portfolio_ctx = None
+            if not self.use_rule_based and include_portfolio_mapping and portfolio_items:
+                try:
+                    portfolio_ctx = self.mapping_service.build_portfolio_context(portfolio_items)
+                except Exception as e:
+                    # No abortar la corrida: cada driver vuelve a intentarlo en su propio mapeo
+                    logger.warning(f"No se pudo preparar el contexto de cartera compartido: {e}")
+            
+            # Paso 2 y 3: Generar escenarios y mapear a cartera para cada driver concurrentemente
+            # (cada driver es independiente y las llamadas son IO-bound)
+            semaphore = asyncio.Semaphore(max(1, SCENARIO_MAX_CONCURRENCY))
+            
+            async def process_bounded(driver: Dict, precomputed_scenarios: Optional[Dict]) -> Dict:
+                async with semaphore:
+                    return await self._process_driver(
+                        driver,
+                        news_map,
+                        portfolio_items,
+                        include_portfolio_mapping,
+                        precomputed_scenarios,
+                        duplicate_ids,
+                        portfolio_ctx
+                    )
+            
+            # Drivers recibidos en streaming: sus escenarios arrancan mientras se siguen
+            # identificando los demás (no aplica al modo batch, que necesita todos los drivers)
+            started: List[Tuple[Dict, asyncio.Task]] = []
+            
+            def start_driver(driver: Dict):
+                started.append((driver, asyncio.create_task(process_bounded(driver, None))))
+            
             if self.use_rule_based:
-                drivers = self.driver_service.detect_drivers(standardized_news_items, max_drivers)
+                drivers = await asyncio.to_thread(
+                    self.driver_service.detect_drivers, unique_news, max_drivers
+                )
             else:
-                drivers = self.driver_service.identify_drivers(standardized_news_items, max_drivers)
+                try:
+                    drivers = await self.driver_service.identify_drivers_async(
+                        unique_news,
+                        max_drivers,
+                        on_driver=None if use_batch_api else start_driver
+                    )
+                except BaseException:
+                    for _, task in started:
+                        task.cancel()
+                    raise
             
             if not drivers:
                 logger.warning("No se identificaron drivers temáticos")
@@ -87,83 +196,45 @@ class ScenarioEngineService:
                     warnings=warnings
                 )
             
-            # Crear mapa de noticias por ID para acceso rápido
-            news_map = {news.get("id", idx + 1): news for idx, news in enumerate(standardized_news_items)}
+            # Paso 2 (modo batch): generar los escenarios de todos los drivers en un único job
+            batch_scenarios = [None] * len(drivers)
+            if use_batch_api and not self.use_rule_based:
+                batch_scenarios = await self.scenario_service.generate_scenarios_batch([
+                    (driver, self._related_news_items(driver, news_map))
+                    for driver in drivers
+                ])
+            elif use_batch_api:
+                logger.info("use_batch_api ignorado: el motor basado en reglas no llama a OpenAI")
             
-            # Paso 2: Generar escenarios para cada driver
-            for driver in drivers:
-                try:
-                    # Obtener noticias relacionadas al driver
-                    related_news_ids = driver.get("related_news_ids", [])
-                    related_news_items = [
-                        news_map[news_id] 
-                        for news_id in related_news_ids 
-                        if news_id in news_map
-                    ]
-                    
-                    if not related_news_items:
-                        logger.warning(f"No se encontraron noticias relacionadas para driver '{driver.get('driver')}'")
-                        warnings.append(f"Driver '{driver.get('driver')}': noticias relacionadas no encontradas")
-                        continue
-                    
-                    # Generar escenarios
-                    scenarios = self.scenario_service.generate_scenarios(driver, related_news_items)
-                    
-                    if not scenarios:
-                        logger.warning(f"No se generaron escenarios para driver '{driver.get('driver')}'")
-                        warnings.append(f"Driver '{driver.get('driver')}': no se generaron escenarios")
-                        continue
-                    
-                    # Verificar que todos los tipos de escenario estén presentes
-                    scenario_types = ["base", "risk", "opportunity"]
-                    missing_scenario_types = [st for st in scenario_types if st not in scenarios]
-                    if missing_scenario_types:
-                        missing_fields.extend([
-                            f"Driver '{driver.get('driver')}': escenario '{st}' faltante"
-                            for st in missing_scenario_types
-                        ])
-                    
-                    # Paso 3: Mapear a cartera (si se solicita y hay cartera)
-                    portfolio_mappings = []
-                    if include_portfolio_mapping and portfolio_items:
-                        try:
-                            if self.use_rule_based:
-                                portfolio_mappings = self.mapping_service.map_scenarios_to_portfolio(
-                                    driver, scenarios, portfolio_items, related_news_items
-                                )
-                            else:
-                                portfolio_mappings = self.mapping_service.map_scenarios_to_portfolio(
-                                    driver, scenarios, portfolio_items
-                                )
-                        except Exception as e:
-                            logger.error(f"Error mapeando a cartera para driver '{driver.get('driver')}': {e}")
-                            warnings.append(f"Driver '{driver.get('driver')}': error en mapeo a cartera")
-                            missing_fields.append(f"Driver '{driver.get('driver')}': mapeo a cartera faltante")
-                    elif include_portfolio_mapping and not portfolio_items:
-                        warnings.append("Mapeo a cartera solicitado pero no hay items de cartera disponibles")
-                    
-                    # Construir respuesta del driver
-                    driver_response = DriverScenarioResponse(
-                        driver=driver.get("driver", "Unknown"),
-                        driver_description=driver.get("description", ""),
-                        related_news_ids=related_news_ids,
-                        scenarios=scenarios,
-                        portfolio_mappings=portfolio_mappings,
-                        generated_at=datetime.utcnow().isoformat(),
-                        metadata={
-                            "related_news_count": len(related_news_items),
-                            "scenarios_generated": len(scenarios),
-                            "mappings_count": len(portfolio_mappings)
-                        }
-                    )
-                    
-                    drivers_responses.append(driver_response)
-                    
-                except Exception as e:
-                    logger.error(f"Error procesando driver '{driver.get('driver')}': {e}", exc_info=True)
-                    warnings.append(f"Driver '{driver.get('driver')}': error en procesamiento - {str(e)}")
+            if started:
+                drivers = [driver for driver, _ in started]
+                pending = [task for _, task in started]
+            else:
+                pending = [
+                    process_bounded(driver, scenarios)
+                    for driver, scenarios in zip(drivers, batch_scenarios)
+                ]
+            gathered = await asyncio.gather(*pending, return_exceptions=True)
+            results = []
+            for driver, result in zip(drivers, gathered):
+                if isinstance(result, BaseException):
+                    logger.error(f"Error procesando driver '{driver.get('driver')}': {result}")
+                    result = {
+                        "driver_response": None,
+                        "warnings": [f"Driver '{driver.get('driver')}': error en procesamiento - {str(result)}"],
+                        "missing_fields": [],
+                        "failed": True
+                    }
+                results.append(result)
+            
+            # Consolidar en el orden original de los drivers
+            for result in results:
+                if result["driver_response"]:
+                    drivers_responses.append(result["driver_response"])
+                warnings.extend(result["warnings"])
+                missing_fields.extend(result["missing_fields"])
+                if result["failed"]:
                     partial_results = True
-                    continue
             
             # Si hay resultados parciales o campos faltantes, marcar como parcial
             if missing_fields or warnings:
@@ -195,4 +266,188 @@ class ScenarioEngineService:
                 missing_fields=missing_fields,
                 warnings=warnings
             )
-
+    
+    @staticmethod
+    def _normalize_news(standardized_news_items: List[Dict]) -> List[NormalizedNewsItem]:
+        """
+        Materializa cada noticia una vez por corrida: 'id' explícito (fallback índice+1, igual
+        que news_map) y standardized_data como dict plano en lugar de modelo Pydantic, para que
+        los builders de prompts no repitan model_dump() por cada driver.
+        """
+        normalized = []
+        for idx, news in enumerate(standardized_news_items):
+            news = {**news, "id": news.get("id", idx + 1)}
+            standardized_data = news.get("standardized_data")
+            if hasattr(standardized_data, "model_dump"):
+                news["standardized_data"] = standardized_data.model_dump()
+            normalized.append(news)
+        return normalized
+    
+    @staticmethod
+    def _dedupe_news(news_items: List[NormalizedNewsItem]) -> Tuple[List[NormalizedNewsItem], Dict]:
+        """
+        Descarta noticias duplicadas por contenido (resumen o texto normalizado: minúsculas,
+        sin puntuación ni espacios extra), conservando la primera aparición.
+        
+        Returns:
+            Tupla (noticias únicas, {id canónico: [IDs descartados]})
+        """
+        unique_news = []
+        duplicate_ids: Dict = {}
+        canonical_by_hash = {}
+        for news in news_items:
+            standardized_data = news.get("standardized_data")
+            summary = standardized_data.get("summary") if isinstance(standardized_data, dict) else None
+            text = summary or news.get("body") or news.get("text") or news.get("title") or ""
+            normalized_text = " ".join(_WORD_PATTERN.findall(text.lower()))
+            if not normalized_text:
+                unique_news.append(news)
+                continue
+            
+            content_hash = hashlib.md5(normalized_text.encode("utf-8")).digest()
+            canonical_id = canonical_by_hash.get(content_hash)
+            if canonical_id is None:
+                canonical_by_hash[content_hash] = news["id"]
+                unique_news.append(news)
+            else:
+                duplicate_ids.setdefault(canonical_id, []).append(news["id"])
+        
+        if duplicate_ids:
+            logger.info(
+                f"Descartadas {len(news_items) - len(unique_news)} noticias duplicadas "
+                f"antes de generar escenarios"
+            )
+        return unique_news, duplicate_ids
+    
+    @staticmethod
+    def _expand_duplicate_ids(related_news_ids: List, duplicate_ids: Optional[Dict]) -> List:
+        """Agrega a related_news_ids los IDs de los duplicados de cada noticia canónica."""
+        if not duplicate_ids:
+            return related_news_ids
+        expanded = []
+        for news_id in related_news_ids:
+            expanded.append(news_id)
+            expanded.extend(duplicate_ids.get(news_id, ()))
+        return expanded
+    
+    @staticmethod
+    def _related_news_items(driver: Dict, news_map: Dict) -> List[Dict]:
+        """Noticias del driver en el orden de related_news_ids (IDs desconocidos se ignoran)."""
+        return [
+            news
+            for news in map(news_map.get, driver.get("related_news_ids", []))
+            if news is not None
+        ]
+    
+    async def _process_driver(
+        self,
+        driver: Dict,
+        news_map: Dict,
+        portfolio_items: Optional[List[Dict]],
+        include_portfolio_mapping: bool,
+        precomputed_scenarios: Optional[Dict] = None,
+        duplicate_ids: Optional[Dict] = None,
+        portfolio_ctx=None
+    ) -> Dict:
+        """
+        Genera escenarios y mapeo a cartera para un driver.
+        
+        Si se pasan precomputed_scenarios (modo batch), no se vuelven a generar.
+        duplicate_ids (id canónico -> IDs descartados como duplicados) se usa para devolver
+        en related_news_ids también las noticias duplicadas de las relacionadas.
+        portfolio_ctx (modo OpenAI) es el PortfolioContext compartido por todos los drivers.
+        
+        Returns:
+            Dict con driver_response (o None), warnings, missing_fields y failed
+        """
+        result = {
+            "driver_response": None,
+            "warnings": [],
+            "missing_fields": [],
+            "failed": False
+        }
+        warnings = result["warnings"]
+        missing_fields = result["missing_fields"]
+        
+        try:
+            # Obtener noticias relacionadas al driver
+            related_news_ids = driver.get("related_news_ids", [])
+            related_news_items = self._related_news_items(driver, news_map)
+            
+            if not related_news_items:
+                logger.warning(f"No se encontraron noticias relacionadas para driver '{driver.get('driver')}'")
+                warnings.append(f"Driver '{driver.get('driver')}': noticias relacionadas no encontradas")
+                return result
+            
+            # Generar escenarios (en modo combinado, junto con el mapeo a cartera)
+            combined_mappings = None
+            if precomputed_scenarios is not None:
+                scenarios = precomputed_scenarios
+            elif self.use_rule_based:
+                scenarios = await asyncio.to_thread(
+                    self.scenario_service.generate_scenarios, driver, related_news_items
+                )
+            elif self.combined_service and include_portfolio_mapping and portfolio_items:
+                scenarios, combined_mappings = await self.combined_service.generate_scenarios_and_mappings_async(
+                    driver, related_news_items, portfolio_items, portfolio_ctx=portfolio_ctx
+                )
+            else:
+                scenarios = await self.scenario_service.generate_scenarios_async(driver, related_news_items)
+            
+            if not scenarios:
+                logger.warning(f"No se generaron escenarios para driver '{driver.get('driver')}'")
+                warnings.append(f"Driver '{driver.get('driver')}': no se generaron escenarios")
+                return result
+            
+            # Verificar que todos los tipos de escenario estén presentes
+            scenario_types = ["base", "risk", "opportunity"]
+            missing_scenario_types = [st for st in scenario_types if st not in scenarios]
+            if missing_scenario_types:
+                missing_fields.extend([
+                    f"Driver '{driver.get('driver')}': escenario '{st}' faltante"
+                    for st in missing_scenario_types
+                ])
+            
+            # Paso 3: Mapear a cartera (si se solicita y hay cartera)
+            portfolio_mappings = []
+            if combined_mappings is not None:
+                portfolio_mappings = combined_mappings
+            elif include_portfolio_mapping and portfolio_items:
+                try:
+                    if self.use_rule_based:
+                        portfolio_mappings = await asyncio.to_thread(
+                            self.mapping_service.map_scenarios_to_portfolio,
+                            driver, scenarios, portfolio_items, related_news_items
+                        )
+                    else:
+                        portfolio_mappings = await self.mapping_service.map_scenarios_to_portfolio_async(
+                            driver, scenarios, portfolio_items, portfolio_ctx
+                        )
+                except Exception as e:
+                    logger.error(f"Error mapeando a cartera para driver '{driver.get('driver')}': {e}")
+                    warnings.append(f"Driver '{driver.get('driver')}': error en mapeo a cartera")
+                    missing_fields.append(f"Driver '{driver.get('driver')}': mapeo a cartera faltante")
+            elif include_portfolio_mapping and not portfolio_items:
+                warnings.append("Mapeo a cartera solicitado pero no hay items de cartera disponibles")
+            
+            # Construir respuesta del driver
+            result["driver_response"] = DriverScenarioResponse(
+                driver=driver.get("driver", "Unknown"),
+                driver_description=driver.get("description", ""),
+                related_news_ids=self._expand_duplicate_ids(related_news_ids, duplicate_ids),
+                scenarios=scenarios,
+                portfolio_mappings=portfolio_mappings,
+                generated_at=datetime.utcnow().isoformat(),
+                metadata={
+                    "related_news_count": len(related_news_items),
+                    "scenarios_generated": len(scenarios),
+                    "mappings_count": len(portfolio_mappings)
+                }
+            )
+            
+        except Exception as e:
+            logger.error(f"Error procesando driver '{driver.get('driver')}': {e}", exc_info=True)
+            warnings.append(f"Driver '{driver.get('driver')}': error en procesamiento - {str(e)}")
+            result["failed"] = True
+        
+        return result
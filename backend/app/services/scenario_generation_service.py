@@ -1,8 +1,11 @@
 """Servicio para generar escenarios (base/riesgo/oportunidad) por driver usando GPT-4o."""
+import asyncio
 import logging
 import json
-from typing import List, Dict, Optional
-from openai import OpenAI
+from datetime import datetime
+from typing import Any, List, Dict, Optional, Tuple
+from openai import AsyncOpenAI
+from pydantic import TypeAdapter
 from app.config import (
     OPENAI_API_KEY,
     OPENAI_MODEL,
@@ -16,29 +19,140 @@ from app.models import (
 )
 from app.services.prompt_template_service import PromptTemplateService
 from app.services.prompt_cache_service import PromptCacheService, CACHE_TTL
+from app.services.llm_response_cache import get_llm_response_cache
+from app.services.openai_client import (
+    get_async_client,
+    create_chat_completion,
+    openai_error_message,
+    run_sync
+)
+from app.services.response_schemas import (
+    SCENARIOS_RESPONSE_FORMAT,
+    TopLevelObjectScanner,
+    parse_json_response
+)
 from app.services.token_logger import token_logger
 
 logger = logging.getLogger(__name__)
 
+try:
+    from app.config import OPENAI_MODEL_SCENARIOS
+except ImportError:
+    # La generación de escenarios sí se beneficia del modelo principal
+    OPENAI_MODEL_SCENARIOS = OPENAI_MODEL
+
+try:
+    from app.config import SCENARIO_STREAMING
+except ImportError:
+    # Recibir escenarios en streaming y validar cada uno apenas se completa
+    SCENARIO_STREAMING = True
+
+try:
+    from app.config import SCENARIO_MAX_NEWS_PER_DRIVER
+except ImportError:
+    # Noticias por driver que llegan al prompt (igual al tope de la plantilla, LENGTH_LIMITS["news_list"])
+    SCENARIO_MAX_NEWS_PER_DRIVER = 10
+
+SCENARIO_TYPES = ("base", "risk", "opportunity")
+
+# Vida media (días) del peso de recencia al rankear noticias de un driver
+NEWS_RECENCY_HALF_LIFE_DAYS = 3.0
+
+# Validadores de listas reutilizables: cada lista se valida en una sola pasada de pydantic-core
+_ASSUMPTIONS_ADAPTER = TypeAdapter(List[ScenarioAssumption])
+_RISKS_ADAPTER = TypeAdapter(List[ScenarioRisk])
+_INVALIDATORS_ADAPTER = TypeAdapter(List[ScenarioInvalidator])
+
+# Versión de la plantilla de generación de escenarios (forma parte de la clave de caché)
+SCENARIOS_TEMPLATE_VERSION = "4"
+
+# Polling de la Batch API (segundos): backoff exponencial acotado
+BATCH_POLL_INITIAL_INTERVAL = 10.0
+BATCH_POLL_MAX_INTERVAL = 300.0
+BATCH_MAX_WAIT = 24 * 3600
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _news_timestamp(news: Dict) -> Optional[float]:
+    """Fecha de la noticia (publicación o alta) como timestamp, o None si no es parseable."""
+    standardized = news.get("standardized_data")
+    value = (standardized.get("publication_date") if isinstance(standardized, dict) else None) or news.get("created_at")
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def _select_top_news(news_items: List[Dict], k: int = SCENARIO_MAX_NEWS_PER_DRIVER) -> List[Dict]:
+    """
+    Se queda con las k noticias más relevantes de un driver antes de armar el prompt.
+    
+    Puntaje = magnitud del sentimiento (1 si no es neutral) + peso de recencia (1 para la más
+    reciente del conjunto, mitad cada NEWS_RECENCY_HALF_LIFE_DAYS; 0 sin fecha). El orden es
+    estable, así que a igual puntaje se respeta el de related_news_ids. Si hay k o menos
+    noticias se devuelven tal cual, sin alterar el prompt ni su clave de caché.
+    """
+    if len(news_items) <= k:
+        return news_items
+    
+    timestamps = [_news_timestamp(news) for news in news_items]
+    newest = max((ts for ts in timestamps if ts is not None), default=None)
+    
+    def score(idx: int) -> float:
+        standardized = news_items[idx].get("standardized_data")
+        sentiment = standardized.get("sentiment") if isinstance(standardized, dict) else None
+        value = 0.0 if not sentiment or sentiment.lower() == "neutral" else 1.0
+        if timestamps[idx] is not None:
+            age_days = (newest - timestamps[idx]) / 86400
+            value += 0.5 ** (age_days / NEWS_RECENCY_HALF_LIFE_DAYS)
+        return value
+    
+    ranked = sorted(range(len(news_items)), key=score, reverse=True)[:k]
+    return [news_items[idx] for idx in ranked]
+
 
 class ScenarioGenerationService:
     """Servicio para generar escenarios por driver usando GPT-4o."""
     
-    def __init__(self):
-        """Inicializa el cliente de OpenAI."""
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        """
+        Inicializa el servicio.
+        
+        Args:
+            client: Cliente AsyncOpenAI a usar. Por defecto se usa el compartido del event loop
+                (ver openai_client.get_async_client) para reutilizar conexiones entre servicios.
+        """
         if not OPENAI_API_KEY or OPENAI_API_KEY == "your_openai_api_key_here":
             raise ValueError("OPENAI_API_KEY no está configurada correctamente en app/config.py")
         
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.model = OPENAI_MODEL
+        self._client = client
+        self.model = OPENAI_MODEL_SCENARIOS
         self.temperature = OPENAI_TEMPERATURE
         self.template_service = PromptTemplateService()
         self.cache_service = PromptCacheService()
+        self.response_cache = get_llm_response_cache()
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Cliente asíncrono (inyectado o el compartido del event loop actual)."""
+        return self._client or get_async_client()
     
     def generate_scenarios(
         self, 
         driver: Dict,
         related_news_items: List[Dict]
+    ) -> Dict[str, Scenario]:
+        """Fachada síncrona de generate_scenarios_async para callers que no usan asyncio."""
+        return run_sync(self.generate_scenarios_async(driver, related_news_items))
+    
+    async def generate_scenarios_async(
+        self, 
+        driver: Dict,
+        related_news_items: List[Dict]
     ) -> Dict[str, Scenario]:
         """
         Genera escenarios (base, riesgo, oportunidad) para un driver.
@@ -56,22 +170,10 @@ class ScenarioGenerationService:
         
         try:
             driver_name = driver.get('driver', 'Unknown')
+            related_news_items = _select_top_news(related_news_items)
             
             # Construir prompt optimizado usando plantillas
-            prompt_data = self.template_service.build_optimized_prompt(
-                template_type="scenario_generation",
-                variable_data={
-                    "driver": driver,
-                    "related_news_items": related_news_items
-                }
-            )
-            
-            # Verificar caché (solo para contexto estático del driver, no para noticias específicas)
-            static_data = {"driver_name": driver_name, "context": "scenario_generation"}
-            variable_data = {"news_count": len(related_news_items)}
-            
-            # Nota: No cacheamos escenarios completos porque las noticias cambian frecuentemente
-            # Pero podríamos cachear si las noticias no han cambiado (usando hash)
+            prompt_data, cache_keys = self._prepare_request(driver, related_news_items)
             
             logger.info(
                 f"Generando escenarios para driver '{driver_name}': "
@@ -97,54 +199,80 @@ class ScenarioGenerationService:
                 logger.warning(f"No hay noticias relacionadas para driver '{driver_name}'. Saltando generación.")
                 return {}
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": prompt_data["system_content"]
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt_data["user_content"]
-                    }
-                ],
-                temperature=self.temperature,
-                response_format={"type": "json_object"},
-                timeout=90.0
-            )
+            response_text = self._get_cached_response(cache_keys)
+            from_cache = response_text is not None
+            usage = None
+            streamed_scenarios = None
             
-            response_text = response.choices[0].message.content
+            if not from_cache:
+                request = {
+                    "model": self.model,
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": prompt_data["system_content"]
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt_data["user_content"]
+                        }
+                    ],
+                    "temperature": self.temperature,
+                    "response_format": SCENARIOS_RESPONSE_FORMAT,
+                    "timeout": 90.0
+                }
+                
+                if SCENARIO_STREAMING:
+                    response_text, usage, streamed_scenarios = await self._stream_scenarios(request)
+                else:
+                    response = await create_chat_completion(self.client, **request)
+                    response_text = response.choices[0].message.content
+                    usage = response.usage
+                
+                # Log de tokens
+                if usage:
+                    token_logger.log_usage(
+                        prompt_tokens=usage.prompt_tokens,
+                        completion_tokens=usage.completion_tokens,
+                        step_name=f"scenario_generation_{driver_name}",
+                        prompt_type="scenario_generation",
+                        usage=usage
+                    )
             
-            # Log de tokens
-            if response.usage:
-                token_logger.log_usage(
-                    prompt_tokens=response.usage.prompt_tokens,
-                    completion_tokens=response.usage.completion_tokens,
-                    step_name=f"scenario_generation_{driver_name}",
-                    prompt_type="scenario_generation",
-                    response=response
+            # Log de respuesta para debugging (el recorte solo se hace con DEBUG activo)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Respuesta de OpenAI para driver '%s' (primeros 500 chars): %s",
+                    driver_name, response_text[:500]
                 )
             
-            # Log de respuesta para debugging
-            logger.debug(f"Respuesta de OpenAI para driver '{driver_name}' (primeros 500 chars): {response_text[:500]}")
-            
             try:
-                scenarios_dict = json.loads(response_text)
+                scenarios_dict = parse_json_response(response_text)
             except json.JSONDecodeError as e:
                 logger.error(f"Error parseando JSON de respuesta de OpenAI: {e}")
                 logger.error(f"Respuesta completa: {response_text}")
                 raise ValueError(f"Error procesando respuesta de OpenAI: formato JSON inválido")
             
+            if not from_cache:
+                # Solo cachear respuestas con JSON válido
+                self._cache_response(
+                    cache_keys, response_text,
+                    token_count=usage.total_tokens if usage else None
+                )
+            
             # Log del diccionario parseado para debugging
-            logger.debug(f"Escenarios parseados (claves): {list(scenarios_dict.keys())}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Escenarios parseados (claves): %s", list(scenarios_dict))
             
-            # Validar y estructurar los escenarios
-            scenarios = self._validate_and_structure_scenarios(scenarios_dict)
+            # Validar y estructurar los escenarios (en streaming ya se validaron al llegar)
+            if streamed_scenarios:
+                scenarios = streamed_scenarios
+            else:
+                scenarios = self._validate_and_structure_scenarios(scenarios_dict)
             
             logger.info(
                 f"Escenarios generados exitosamente para driver '{driver_name}'. "
-                f"Tokens usados: {response.usage.total_tokens if response.usage else 'N/A'}"
+                f"Tokens usados: {usage.total_tokens if usage else 'N/A (caché)'}"
             )
             return scenarios
             
@@ -152,19 +280,266 @@ class ScenarioGenerationService:
             logger.error(f"Error parseando JSON de respuesta de OpenAI: {e}")
             raise ValueError(f"Error procesando respuesta de OpenAI: formato JSON inválido")
         except Exception as e:
-            error_str = str(e)
             logger.error(f"Error generando escenarios: {e}", exc_info=True)
+            raise ValueError(openai_error_message(e, "Error al generar escenarios"))
+    
+    async def _stream_scenarios(self, request: Dict) -> Tuple[str, Any, Dict[str, Scenario]]:
+        """
+        Ejecuta la generación en streaming y valida cada escenario (base/risk/opportunity)
+        apenas su objeto JSON se completa, solapando la validación con la generación restante.
+        
+        Returns:
+            Tupla (texto completo de la respuesta, usage o None, escenarios validados)
+        """
+        stream = await create_chat_completion(
+            self.client,
+            stream=True,
+            stream_options={"include_usage": True},
+            **request
+        )
+        scanner = TopLevelObjectScanner()
+        parts = []
+        usage = None
+        scenarios = {}
+        
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            for scenario_type, scenario_data in scanner.feed(delta):
+                if scenario_type in SCENARIO_TYPES and isinstance(scenario_data, dict):
+                    scenario = self._structure_scenario(scenario_type, scenario_data)
+                    if scenario:
+                        scenarios[scenario_type] = scenario
+        
+        return "".join(parts), usage, scenarios
+    
+    def _prepare_request(self, driver: Dict, related_news_items: List[Dict]) -> Tuple[Dict, Tuple[str, str]]:
+        """
+        Construye el prompt optimizado y sus claves de caché.
+        
+        - Exacta: mismo driver + mismas noticias => mismo prompt => misma clave.
+        - Por conjunto de noticias: nombre del driver + IDs de noticias ordenados. Acierta
+          aunque cambie el texto del prompt (p.ej. la descripción que el LLM redacta distinta
+          en cada identificación de drivers) si el driver agrupa las mismas noticias.
+        """
+        prompt_data = self.template_service.build_optimized_prompt(
+            template_type="scenario_generation",
+            variable_data={
+                "driver": driver,
+                "related_news_items": related_news_items
+            }
+        )
+        cache_key = self.response_cache.make_key(
+            "scenarios", self.model, self.temperature,
+            prompt_data["system_content"], prompt_data["user_content"],
+            template_version=SCENARIOS_TEMPLATE_VERSION
+        )
+        news_ids = sorted(str(news.get("id")) for news in related_news_items)
+        news_set_key = self.response_cache.make_key(
+            "scenario_set", self.model, self.temperature,
+            " ".join(driver.get("driver", "Unknown").lower().split()), ",".join(news_ids),
+            template_version=SCENARIOS_TEMPLATE_VERSION
+        )
+        return prompt_data, (cache_key, news_set_key)
+    
+    def _get_cached_response(self, cache_keys: Tuple[str, ...]) -> Optional[str]:
+        """Devuelve la primera respuesta cacheada bajo alguna de las claves, o None."""
+        for key in cache_keys:
+            response_text = self.response_cache.get("scenarios", key)
+            if response_text is not None:
+                return response_text
+        return None
+    
+    def _cache_response(self, cache_keys: Tuple[str, ...], response_text: str, token_count: Optional[int] = None):
+        """Cachea la respuesta bajo todas sus claves."""
+        for key in cache_keys:
+            self.response_cache.set("scenarios", key, response_text, token_count=token_count)
+    
+    async def generate_scenarios_batch(
+        self,
+        drivers_with_news: List[Tuple[Dict, List[Dict]]],
+        poll_interval: float = BATCH_POLL_INITIAL_INTERVAL,
+        max_wait: float = BATCH_MAX_WAIT
+    ) -> List[Dict[str, Scenario]]:
+        """
+        Genera escenarios para varios drivers en un único job de la Batch API de OpenAI.
+        
+        Pensado para corridas no interactivas (refresh nocturno de cartera): la Batch API
+        cuesta la mitad y usa un pool de rate limit separado, a cambio de latencia alta.
+        Espera el resultado en el mismo proceso; para enviar y recoger en momentos distintos
+        usar submit_scenarios_batch y collect_scenarios_batch.
+        
+        Args:
+            drivers_with_news: Lista de tuplas (driver, noticias relacionadas)
+            poll_interval: Intervalo inicial de polling en segundos (se duplica en cada intento)
+            max_wait: Tiempo máximo de espera en segundos
             
-            if "401" in error_str or "invalid_api_key" in error_str:
-                raise ValueError(
-                    "Error de autenticación con OpenAI. Verifica tu API key en app/config.py"
+        Returns:
+            Lista de diccionarios de escenarios en el mismo orden que drivers_with_news
+            ({} para drivers sin noticias o cuya respuesta no pudo procesarse)
+        """
+        batch_id, results = await self.submit_scenarios_batch(drivers_with_news)
+        if batch_id is None:
+            return results
+        
+        waited = 0.0
+        while True:
+            collected = await self.collect_scenarios_batch(batch_id, drivers_with_news)
+            if collected is not None:
+                return collected
+            if waited >= max_wait:
+                raise ValueError(f"El batch {batch_id} no completó en {max_wait:.0f}s")
+            await asyncio.sleep(poll_interval)
+            waited += poll_interval
+            poll_interval = min(poll_interval * 2, BATCH_POLL_MAX_INTERVAL)
+    
+    async def submit_scenarios_batch(
+        self,
+        drivers_with_news: List[Tuple[Dict, List[Dict]]]
+    ) -> Tuple[Optional[str], List[Dict[str, Scenario]]]:
+        """
+        Envía a la Batch API los drivers sin respuesta cacheada, sin esperar el resultado.
+        
+        Returns:
+            Tupla (ID del batch o None si no hubo nada que enviar, escenarios ya disponibles
+            desde el caché en el orden de drivers_with_news)
+        """
+        results, pending = self._prepare_batch(drivers_with_news)
+        if not pending:
+            return None, results
+        
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": prompt_data["system_content"]},
+                        {"role": "user", "content": prompt_data["user_content"]}
+                    ],
+                    "temperature": self.temperature,
+                    "response_format": SCENARIOS_RESPONSE_FORMAT
+                }
+            }, ensure_ascii=False)
+            for custom_id, (_, _, _, prompt_data) in pending.items()
+        ]
+        batch_file = await self.client.files.create(
+            file=("scenario_generation_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Batch de escenarios enviado: {batch.id} ({len(lines)} drivers)")
+        return batch.id, results
+    
+    async def collect_scenarios_batch(
+        self,
+        batch_id: str,
+        drivers_with_news: List[Tuple[Dict, List[Dict]]]
+    ) -> Optional[List[Dict[str, Scenario]]]:
+        """
+        Recoge el resultado de un batch enviado con submit_scenarios_batch y lo cachea.
+        
+        Args:
+            batch_id: ID devuelto por submit_scenarios_batch
+            drivers_with_news: Los mismos drivers y noticias que se enviaron (las claves de
+                caché y los custom_id se recalculan a partir de ellos)
+            
+        Returns:
+            Escenarios en el orden de drivers_with_news, o None si el batch sigue en curso
+        """
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status not in BATCH_TERMINAL_STATUSES:
+            return None
+        if batch.status != "completed" or not batch.output_file_id:
+            raise ValueError(f"El batch {batch.id} terminó con estado '{batch.status}'")
+        
+        results, pending = self._prepare_batch(drivers_with_news)
+        output = await self.client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            entry = pending.get(record.get("custom_id"))
+            if entry is None:
+                continue
+            idx, driver_name, cache_keys, _ = entry
+            
+            body = (record.get("response") or {}).get("body") or {}
+            if record.get("error") or not body.get("choices"):
+                logger.warning(f"Respuesta del batch sin resultado para driver '{driver_name}': {record.get('error')}")
+                continue
+            
+            response_text = body["choices"][0]["message"]["content"]
+            try:
+                scenarios_dict = parse_json_response(response_text)
+            except json.JSONDecodeError as e:
+                logger.warning(f"JSON inválido en respuesta del batch para driver '{driver_name}': {e}")
+                continue
+            
+            usage = body.get("usage") or {}
+            if usage:
+                token_logger.log_usage(
+                    prompt_tokens=usage.get("prompt_tokens", 0),
+                    completion_tokens=usage.get("completion_tokens", 0),
+                    step_name=f"scenario_generation_batch_{driver_name}",
+                    prompt_type="scenario_generation"
                 )
-            elif "429" in error_str or "rate_limit" in error_str:
-                raise ValueError("Límite de tasa excedido. Por favor, intenta más tarde.")
-            elif "insufficient_quota" in error_str:
-                raise ValueError("Cuota de OpenAI agotada. Verifica tu cuenta.")
-            else:
-                raise ValueError(f"Error al generar escenarios: {error_str}")
+            self._cache_response(cache_keys, response_text, token_count=usage.get("total_tokens"))
+            results[idx] = self._validate_and_structure_scenarios(scenarios_dict)
+        
+        logger.info(
+            f"Batch {batch.id} procesado: "
+            f"{sum(1 for scenarios in results if scenarios)}/{len(drivers_with_news)} drivers con escenarios"
+        )
+        return results
+    
+    def _prepare_batch(
+        self,
+        drivers_with_news: List[Tuple[Dict, List[Dict]]]
+    ) -> Tuple[List[Dict[str, Scenario]], Dict[str, Tuple[int, str, Tuple[str, str], Dict]]]:
+        """
+        Separa los drivers de un batch en resueltos desde el caché y pendientes.
+        
+        Returns:
+            Tupla (escenarios cacheados por posición, custom_id -> (índice, nombre del driver,
+            claves de caché, prompt) de los pendientes)
+        """
+        results: List[Dict[str, Scenario]] = [{} for _ in drivers_with_news]
+        pending = {}
+        
+        for idx, (driver, related_news_items) in enumerate(drivers_with_news):
+            driver_name = driver.get("driver", "Unknown")
+            if not related_news_items:
+                logger.warning(f"No hay noticias relacionadas para driver '{driver_name}'. Excluido del batch.")
+                continue
+            
+            related_news_items = _select_top_news(related_news_items)
+            prompt_data, cache_keys = self._prepare_request(driver, related_news_items)
+            if not prompt_data.get("is_valid", True):
+                logger.warning(f"Prompt inválido para driver '{driver_name}'. Excluido del batch.")
+                continue
+            
+            cached_text = self._get_cached_response(cache_keys)
+            if cached_text is not None:
+                results[idx] = self._validate_and_structure_scenarios(parse_json_response(cached_text))
+                continue
+            
+            # custom_id debe ser único dentro del batch; los nombres de driver pueden repetirse
+            pending[f"driver-{idx}"] = (idx, driver_name, cache_keys, prompt_data)
+        
+        return results, pending
     
     def _build_scenario_generation_prompt(self, driver: Dict, related_news_items: List[Dict]) -> str:
         """Construye el prompt para generación de escenarios."""
@@ -256,78 +631,66 @@ Responde en formato JSON con esta estructura:
         """Valida y estructura los escenarios generados."""
         scenarios = {}
         
-        scenario_types = ["base", "risk", "opportunity"]
-        
-        for scenario_type in scenario_types:
+        for scenario_type in SCENARIO_TYPES:
             if scenario_type not in scenarios_dict:
                 logger.warning(f"Escenario '{scenario_type}' no encontrado en respuesta")
                 continue
             
-            scenario_data = scenarios_dict[scenario_type]
-            
-            try:
-                # Validar campos requeridos
-                if not scenario_data.get("title") or not scenario_data.get("description"):
-                    logger.warning(f"Escenario '{scenario_type}' incompleto, omitiendo")
-                    continue
-                
-                # Procesar assumptions
-                assumptions = []
-                for assumption_data in scenario_data.get("assumptions", []):
-                    assumptions.append(ScenarioAssumption(
-                        description=assumption_data.get("description", ""),
-                        probability=assumption_data.get("probability"),
-                        timeframe=assumption_data.get("timeframe")
-                    ))
-                
-                # Procesar risks
-                risks = []
-                for risk_data in scenario_data.get("risks", []):
-                    risks.append(ScenarioRisk(
-                        description=risk_data.get("description", ""),
-                        severity=risk_data.get("severity", "medium").lower(),
-                        mitigation=risk_data.get("mitigation")
-                    ))
-                
-                # Procesar invalidators
-                invalidators = []
-                for inv_data in scenario_data.get("invalidators", []):
-                    invalidators.append(ScenarioInvalidator(
-                        condition=inv_data.get("condition", ""),
-                        description=inv_data.get("description", "")
-                    ))
-                
-                # Procesar market_impact, suggested_actions, triggers
-                market_impact = scenario_data.get("market_impact")
-                suggested_actions = scenario_data.get("suggested_actions", [])
-                triggers = scenario_data.get("triggers", [])
-                
-                # Validar que suggested_actions y triggers sean listas
-                if not isinstance(suggested_actions, list):
-                    suggested_actions = []
-                if not isinstance(triggers, list):
-                    triggers = []
-                
-                # Crear Scenario
-                scenario = Scenario(
-                    scenario_type=scenario_type,
-                    title=scenario_data.get("title", ""),
-                    description=scenario_data.get("description", ""),
-                    assumptions=assumptions,
-                    risks=risks,
-                    invalidators=invalidators,
-                    confidence=max(0.0, min(1.0, scenario_data.get("confidence", 0.5))),
-                    timeframe=scenario_data.get("timeframe"),
-                    market_impact=market_impact,
-                    suggested_actions=suggested_actions,
-                    triggers=triggers
-                )
-                
+            scenario = self._structure_scenario(scenario_type, scenarios_dict[scenario_type])
+            if scenario:
                 scenarios[scenario_type] = scenario
-                
-            except Exception as e:
-                logger.error(f"Error procesando escenario '{scenario_type}': {e}", exc_info=True)
-                continue
         
         return scenarios
-
+    
+    def _structure_scenario(self, scenario_type: str, scenario_data: Dict) -> Optional[Scenario]:
+        """Valida y construye un escenario individual; None si está incompleto o es inválido."""
+        try:
+            # Validar campos requeridos
+            if not scenario_data.get("title") or not scenario_data.get("description"):
+                logger.warning(f"Escenario '{scenario_type}' incompleto, omitiendo")
+                return None
+            
+            # Procesar assumptions, risks e invalidators (solo se completan los defaults que
+            # el modelo puede omitir; la construcción y validación la hace el adapter)
+            assumptions = _ASSUMPTIONS_ADAPTER.validate_python([
+                {"description": "", **assumption_data}
+                for assumption_data in scenario_data.get("assumptions", [])
+            ])
+            risks = _RISKS_ADAPTER.validate_python([
+                {"description": "", **risk_data, "severity": risk_data.get("severity", "medium").lower()}
+                for risk_data in scenario_data.get("risks", [])
+            ])
+            invalidators = _INVALIDATORS_ADAPTER.validate_python([
+                {"condition": "", "description": "", **inv_data}
+                for inv_data in scenario_data.get("invalidators", [])
+            ])
+            
+            # Procesar market_impact, suggested_actions, triggers
+            market_impact = scenario_data.get("market_impact")
+            suggested_actions = scenario_data.get("suggested_actions", [])
+            triggers = scenario_data.get("triggers", [])
+            
+            # Validar que suggested_actions y triggers sean listas
+            if not isinstance(suggested_actions, list):
+                suggested_actions = []
+            if not isinstance(triggers, list):
+                triggers = []
+            
+            # Crear Scenario
+            return Scenario(
+                scenario_type=scenario_type,
+                title=scenario_data.get("title", ""),
+                description=scenario_data.get("description", ""),
+                assumptions=assumptions,
+                risks=risks,
+                invalidators=invalidators,
+                confidence=max(0.0, min(1.0, scenario_data.get("confidence", 0.5))),
+                timeframe=scenario_data.get("timeframe"),
+                market_impact=market_impact,
+                suggested_actions=suggested_actions,
+                triggers=triggers
+            )
+            
+        except Exception as e:
+            logger.error(f"Error procesando escenario '{scenario_type}': {e}", exc_info=True)
+            return None
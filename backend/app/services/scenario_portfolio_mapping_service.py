@@ -1,35 +1,183 @@
 """Servicio para mapear escenarios a activos de la cartera (tickers/sectores/FX)."""
+import asyncio
 import logging
 import json
-from typing import List, Dict, Set
-from openai import OpenAI
+from dataclasses import dataclass
+from typing import Any, FrozenSet, List, Dict, Optional, Set, Tuple
+from openai import AsyncOpenAI
+from pydantic import TypeAdapter, ValidationError
 from app.config import (
     OPENAI_API_KEY,
     OPENAI_MODEL,
     OPENAI_TEMPERATURE
 )
 from app.models import PortfolioAssetMapping
+from app.services.openai_client import (
+    get_async_client,
+    create_chat_completion,
+    openai_error_message,
+    run_sync
+)
+from app.services.response_schemas import (
+    MAPPINGS_RESPONSE_FORMAT,
+    OPENAI_STRUCTURED_OUTPUTS,
+    TopLevelObjectScanner,
+    parse_json_response
+)
+from app.services.token_logger import token_logger
 
 logger = logging.getLogger(__name__)
 
+try:
+    from app.config import MAPPING_STREAMING
+except ImportError:
+    # Recibir el mapeo en streaming, validando cada activo a medida que llega
+    MAPPING_STREAMING = True
+
+MAPPING_ASSET_TYPES = frozenset({"ticker", "sector", "fx"})
+
+# Con Structured Outputs la estructura la impone la API: el ejemplo solo se envía sin ella
+MAPPINGS_RESPONSE_INSTRUCTIONS = (
+    "Responde con un objeto JSON con la lista de mappings.\n"
+    if OPENAI_STRUCTURED_OUTPUTS else
+    """Responde en formato JSON con esta estructura:
+{
+    "mappings": [
+        {
+            "asset_type": "ticker",
+            "identifier": "AAPL",
+            "name": "Apple Inc.",
+            "sensitivity": 0.7,
+            "confidence": 0.8,
+            "impact_description": "Impacto positivo por..."
+        },
+        {
+            "asset_type": "sector",
+            "identifier": "Technology",
+            "name": "Sector Tecnológico",
+            "sensitivity": 0.5,
+            "confidence": 0.6,
+            "impact_description": "Impacto moderado..."
+        }
+    ]
+}
+"""
+)
+
+# Instrucciones de la tarea de mapeo (también las usa el servicio combinado escenarios+mapeo)
+MAPPING_TASK_INSTRUCTIONS = """Instrucciones:
+1. Identifica qué activos de la cartera serían afectados por estos escenarios
+2. Para cada activo afectado, proporciona:
+   - asset_type: "ticker", "sector", o "fx"
+   - identifier: El ticker (ej: "AAPL"), sector (ej: "Technology"), o par FX (ej: "USD/EUR")
+   - name: Nombre descriptivo del activo
+   - sensitivity: Sensibilidad estimada (-1.0 a 1.0, negativo=bajista, positivo=alcista)
+   - confidence: Confianza en el mapeo (0.0-1.0)
+   - impact_description: Descripción breve del impacto esperado
+
+3. Incluye mapeos a:
+   - Tickers específicos mencionados en la cartera
+   - Sectores relevantes (si aplica)
+   - Pares FX si el driver afecta divisas
+
+4. Solo incluye mapeos con confianza >= 0.4
+"""
+
+# Construye todos los mapeos de una respuesta en una sola pasada de pydantic-core
+_MAPPINGS_ADAPTER = TypeAdapter(List[PortfolioAssetMapping])
+
+MAPPING_SYSTEM_PROMPT = (
+    "Eres un analista de cartera experto especializado en mapear escenarios de mercado "
+    "a activos específicos. Identificas qué tickers, sectores y pares FX serían afectados "
+    "por cada escenario y estimas la sensibilidad y confianza del impacto. "
+    "Eres preciso y basas tus mapeos en relaciones fundamentales claras."
+)
+
+
+@dataclass(frozen=True)
+class PortfolioContext:
+    """Datos de la cartera que no cambian entre drivers: se calculan una vez por corrida."""
+    portfolio_section: str  # Sección CARTERA / TICKERS EN CARTERA del prompt
+    valid_tickers: FrozenSet[str]  # Tickers de la cartera (mayúsculas) para validar mapeos
+    
+    @classmethod
+    def from_items(cls, portfolio_items: List[Dict]) -> "PortfolioContext":
+        """Construye el contexto a partir de los items de cartera."""
+        portfolio_summary = []
+        tickers = set()
+        
+        for item in portfolio_items:
+            # symbol/asset_type son nullables en la base: None cuenta como vacío
+            symbol = (item.get("symbol") or "").upper()
+            asset_type = (item.get("asset_type") or "").lower()
+            name = item.get("name") or ""
+            
+            portfolio_summary.append({
+                "symbol": symbol,
+                "name": name,
+                "asset_type": asset_type
+            })
+            
+            if symbol:
+                tickers.add(symbol)
+            
+            # Extraer sectores de categorías si existen
+            # (esto sería mejorado con un servicio de clasificación de sectores)
+        
+        portfolio_section = (
+            "CARTERA:\n"
+            f"{json.dumps(portfolio_summary, ensure_ascii=False, separators=(',', ':'))}\n\n"
+            f"TICKERS EN CARTERA: {', '.join(sorted(tickers)) if tickers else 'Ninguno identificado'}"
+        )
+        return cls(portfolio_section=portfolio_section, valid_tickers=frozenset(tickers))
+
 
 class ScenarioPortfolioMappingService:
     """Servicio para mapear escenarios a activos de la cartera."""
     
-    def __init__(self):
-        """Inicializa el cliente de OpenAI."""
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        """
+        Inicializa el servicio.
+        
+        Args:
+            client: Cliente AsyncOpenAI a usar. Por defecto se usa el compartido del event loop
+                (ver openai_client.get_async_client) para reutilizar conexiones entre servicios.
+        """
         if not OPENAI_API_KEY or OPENAI_API_KEY == "your_openai_api_key_here":
             raise ValueError("OPENAI_API_KEY no está configurada correctamente en app/config.py")
         
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self._client = client
         self.model = OPENAI_MODEL
         self.temperature = OPENAI_TEMPERATURE
     
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Cliente asíncrono (inyectado o el compartido del event loop actual)."""
+        return self._client or get_async_client()
+    
+    @staticmethod
+    def build_portfolio_context(portfolio_items: List[Dict]) -> PortfolioContext:
+        """Calcula una vez los datos de la cartera compartidos por los mapeos de todos los drivers."""
+        return PortfolioContext.from_items(portfolio_items)
+    
     def map_scenarios_to_portfolio(
         self,
         driver: Dict,
         scenarios: Dict,
-        portfolio_items: List[Dict]
+        portfolio_items: List[Dict],
+        portfolio_ctx: Optional[PortfolioContext] = None
+    ) -> List[PortfolioAssetMapping]:
+        """Fachada síncrona de map_scenarios_to_portfolio_async para callers que no usan asyncio."""
+        return run_sync(
+            self.map_scenarios_to_portfolio_async(driver, scenarios, portfolio_items, portfolio_ctx)
+        )
+    
+    async def map_scenarios_to_portfolio_async(
+        self,
+        driver: Dict,
+        scenarios: Dict,
+        portfolio_items: List[Dict],
+        portfolio_ctx: Optional[PortfolioContext] = None
     ) -> List[PortfolioAssetMapping]:
         """
         Mapea escenarios a activos de la cartera.
@@ -38,6 +186,8 @@ class ScenarioPortfolioMappingService:
             driver: Diccionario con información del driver
             scenarios: Diccionario con escenarios (base, risk, opportunity)
             portfolio_items: Lista de items de cartera
+            portfolio_ctx: Contexto de la cartera ya calculado (ver build_portfolio_context); al
+                mapear varios drivers contra la misma cartera conviene construirlo una sola vez
             
         Returns:
             Lista de PortfolioAssetMapping con mapeos a tickers, sectores y FX
@@ -51,40 +201,56 @@ class ScenarioPortfolioMappingService:
             return []
         
         try:
-            prompt = self._build_mapping_prompt(driver, scenarios, portfolio_items)
+            portfolio_ctx = portfolio_ctx or PortfolioContext.from_items(portfolio_items)
+            prompt = self._build_mapping_prompt(driver, scenarios, portfolio_ctx)
             
             logger.info(
                 f"Mapeando escenarios a cartera para driver '{driver.get('driver')}': "
                 f"{len(portfolio_items)} items de cartera"
             )
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            request = {
+                "model": self.model,
+                "messages": [
                     {
                         "role": "system",
-                        "content": (
-                            "Eres un analista de cartera experto especializado en mapear escenarios de mercado "
-                            "a activos específicos. Identificas qué tickers, sectores y pares FX serían afectados "
-                            "por cada escenario y estimas la sensibilidad y confianza del impacto. "
-                            "Eres preciso y basas tus mapeos en relaciones fundamentales claras."
-                        )
+                        "content": MAPPING_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
-                temperature=self.temperature,
-                response_format={"type": "json_object"},
-                timeout=60.0
-            )
+                "temperature": self.temperature,
+                "response_format": MAPPINGS_RESPONSE_FORMAT,
+                "timeout": 60.0
+            }
+            streamed_mappings = None
+            if MAPPING_STREAMING:
+                response_text, usage, streamed_mappings = await self._stream_mappings(request, portfolio_ctx)
+            else:
+                response = await create_chat_completion(self.client, **request)
+                response_text = response.choices[0].message.content
+                usage = response.usage
             
-            response_text = response.choices[0].message.content
-            mappings_dict = json.loads(response_text)
+            if usage:
+                token_logger.log_usage(
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens,
+                    step_name=f"scenario_mapping_{driver.get('driver')}",
+                    prompt_type="scenario_mapping",
+                    usage=usage
+                )
             
-            # Validar y estructurar los mapeos
-            mappings = self._validate_and_structure_mappings(mappings_dict, portfolio_items)
+            # El JSON completo se parsea igual para detectar respuestas truncadas o inválidas
+            mappings_dict = parse_json_response(response_text)
+            
+            # Validar y estructurar los mapeos (en streaming ya se validaron al llegar; si no
+            # llegó ninguno válido se valida la respuesta completa, como en escenarios)
+            if streamed_mappings:
+                mappings = streamed_mappings
+            else:
+                mappings = self._validate_and_structure_mappings(mappings_dict, portfolio_ctx)
             
             logger.info(f"Mapeo completado: {len(mappings)} activos identificados")
             return mappings
@@ -93,25 +259,54 @@ class ScenarioPortfolioMappingService:
             logger.error(f"Error parseando JSON de respuesta de OpenAI: {e}")
             raise ValueError(f"Error procesando respuesta de OpenAI: formato JSON inválido")
         except Exception as e:
-            error_str = str(e)
             logger.error(f"Error mapeando escenarios a cartera: {e}", exc_info=True)
-            
-            if "401" in error_str or "invalid_api_key" in error_str:
-                raise ValueError(
-                    "Error de autenticación con OpenAI. Verifica tu API key en app/config.py"
-                )
-            elif "429" in error_str or "rate_limit" in error_str:
-                raise ValueError("Límite de tasa excedido. Por favor, intenta más tarde.")
-            elif "insufficient_quota" in error_str:
-                raise ValueError("Cuota de OpenAI agotada. Verifica tu cuenta.")
-            else:
-                raise ValueError(f"Error al mapear escenarios a cartera: {error_str}")
+            raise ValueError(openai_error_message(e, "Error al mapear escenarios a cartera"))
+    
+    async def _stream_mappings(
+        self,
+        request: Dict,
+        portfolio_ctx: PortfolioContext
+    ) -> Tuple[str, Any, List[PortfolioAssetMapping]]:
+        """
+        Ejecuta el mapeo en streaming y valida cada activo apenas su objeto JSON se completa,
+        solapando la validación con la generación restante.
+        
+        Returns:
+            Tupla (texto completo de la respuesta, usage o None, mapeos validados)
+        """
+        stream = await create_chat_completion(
+            self.client,
+            stream=True,
+            stream_options={"include_usage": True},
+            **request
+        )
+        scanner = TopLevelObjectScanner(depth=3)
+        parts = []
+        usage = None
+        mappings = []
+        
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            for key, mapping_data in scanner.feed(delta):
+                if key == "mappings":
+                    mappings.extend(
+                        self._validate_and_structure_mappings({"mappings": [mapping_data]}, portfolio_ctx)
+                    )
+        
+        return "".join(parts), usage, mappings
     
     def _build_mapping_prompt(
         self, 
         driver: Dict, 
         scenarios: Dict, 
-        portfolio_items: List[Dict]
+        portfolio_ctx: PortfolioContext
     ) -> str:
         """Construye el prompt para mapeo a cartera."""
         driver_name = driver.get("driver", "Unknown")
@@ -124,138 +319,65 @@ class ScenarioPortfolioMappingService:
                 "description": scenario.description[:200] + "..." if len(scenario.description) > 200 else scenario.description
             }
         
-        # Preparar información de cartera
-        portfolio_summary = []
-        tickers = set()
-        sectors = set()
-        fx_pairs = set()
-        
-        for item in portfolio_items:
-            symbol = item.get("symbol", "").upper()
-            asset_type = item.get("asset_type", "").lower()
-            name = item.get("name", "")
-            
-            portfolio_summary.append({
-                "symbol": symbol,
-                "name": name,
-                "asset_type": asset_type
-            })
-            
-            if symbol:
-                tickers.add(symbol)
-            
-            # Extraer sectores de categorías si existen
-            # (esto sería mejorado con un servicio de clasificación de sectores)
-        
-        prompt = f"""Mapea los siguientes escenarios de mercado a los activos de la cartera proporcionada.
-
-DRIVER: {driver_name}
-
-ESCENARIOS:
-{json.dumps(scenarios_summary, indent=2, ensure_ascii=False)}
-
-CARTERA:
-{json.dumps(portfolio_summary, indent=2, ensure_ascii=False)}
-
-TICKERS EN CARTERA: {', '.join(sorted(tickers)) if tickers else 'Ninguno identificado'}
-
-Instrucciones:
-1. Identifica qué activos de la cartera serían afectados por estos escenarios
-2. Para cada activo afectado, proporciona:
-   - asset_type: "ticker", "sector", o "fx"
-   - identifier: El ticker (ej: "AAPL"), sector (ej: "Technology"), o par FX (ej: "USD/EUR")
-   - name: Nombre descriptivo del activo
-   - sensitivity: Sensibilidad estimada (-1.0 a 1.0, negativo=bajista, positivo=alcista)
-   - confidence: Confianza en el mapeo (0.0-1.0)
-   - impact_description: Descripción breve del impacto esperado
-
-3. Incluye mapeos a:
-   - Tickers específicos mencionados en la cartera
-   - Sectores relevantes (si aplica)
-   - Pares FX si el driver afecta divisas
-
-4. Solo incluye mapeos con confianza >= 0.4
-
-Responde en formato JSON con esta estructura:
-{{
-    "mappings": [
-        {{
-            "asset_type": "ticker",
-            "identifier": "AAPL",
-            "name": "Apple Inc.",
-            "sensitivity": 0.7,
-            "confidence": 0.8,
-            "impact_description": "Impacto positivo por..."
-        }},
-        {{
-            "asset_type": "sector",
-            "identifier": "Technology",
-            "name": "Sector Tecnológico",
-            "sensitivity": 0.5,
-            "confidence": 0.6,
-            "impact_description": "Impacto moderado..."
-        }}
-    ]
-}}
-"""
-        return prompt
+        # Instrucciones y esquema invariantes primero, datos del driver y la cartera al final:
+        # los mapeos de todos los drivers comparten el prefijo y OpenAI reutiliza su caché
+        return (
+            "Mapea los escenarios de mercado listados al final a los activos de la cartera proporcionada.\n\n"
+            f"{MAPPING_TASK_INSTRUCTIONS}\n"
+            f"{MAPPINGS_RESPONSE_INSTRUCTIONS}\n"
+            f"{portfolio_ctx.portfolio_section}\n\n"
+            f"DRIVER: {driver_name}\n\n"
+            "ESCENARIOS:\n"
+            f"{json.dumps(scenarios_summary, ensure_ascii=False, separators=(',', ':'))}\n"
+        )
     
     def _validate_and_structure_mappings(
         self, 
         mappings_dict: Dict, 
-        portfolio_items: List[Dict]
+        portfolio_ctx: PortfolioContext
     ) -> List[PortfolioAssetMapping]:
         """Valida y estructura los mapeos a cartera."""
-        mappings = []
-        
         if "mappings" not in mappings_dict:
             logger.warning("Respuesta de OpenAI no contiene campo 'mappings'")
-            return mappings
+            return []
         
-        # Crear sets de identificadores válidos para validación
-        valid_tickers = {item.get("symbol", "").upper() for item in portfolio_items if item.get("symbol")}
+        valid_tickers = portfolio_ctx.valid_tickers
+        raw_mappings = mappings_dict["mappings"]
         
-        for mapping_data in mappings_dict["mappings"]:
-            if not isinstance(mapping_data, dict):
-                continue
-            
-            asset_type = mapping_data.get("asset_type", "").lower()
-            identifier = mapping_data.get("identifier", "").strip()
-            sensitivity = mapping_data.get("sensitivity", 0.0)
-            confidence = mapping_data.get("confidence", 0.0)
-            
-            # Validar campos requeridos
-            if not identifier or asset_type not in ["ticker", "sector", "fx"]:
-                logger.warning(f"Mapeo inválido: {mapping_data}")
-                continue
-            
-            # Validar sensibilidad y confianza
-            sensitivity = max(-1.0, min(1.0, float(sensitivity)))
-            confidence = max(0.0, min(1.0, float(confidence)))
-            
-            # Filtrar mapeos con baja confianza
-            if confidence < 0.4:
-                logger.debug(f"Mapeo con baja confianza omitido: {identifier} (confianza: {confidence})")
-                continue
-            
-            # Validar que el ticker existe en la cartera (solo para tipo "ticker")
-            if asset_type == "ticker" and identifier.upper() not in valid_tickers:
-                logger.warning(f"Ticker '{identifier}' no encontrado en cartera, omitiendo")
-                continue
-            
-            try:
-                mapping = PortfolioAssetMapping(
-                    asset_type=asset_type,
-                    identifier=identifier,
-                    name=mapping_data.get("name"),
-                    sensitivity=sensitivity,
-                    confidence=confidence,
-                    impact_description=mapping_data.get("impact_description")
-                )
-                mappings.append(mapping)
-            except Exception as e:
-                logger.error(f"Error creando PortfolioAssetMapping: {e}", exc_info=True)
-                continue
+        # Un solo recorrido: campos requeridos, confianza >= 0.4 y, para tipo "ticker", que el
+        # ticker exista en la cartera; sensibilidad y confianza se acotan a sus rangos
+        candidates = [
+            {
+                "asset_type": asset_type,
+                "identifier": identifier,
+                "name": mapping_data.get("name"),
+                "sensitivity": max(-1.0, min(1.0, float(mapping_data.get("sensitivity", 0.0)))),
+                "confidence": confidence,
+                "impact_description": mapping_data.get("impact_description")
+            }
+            for mapping_data in raw_mappings
+            if isinstance(mapping_data, dict)
+            and (identifier := mapping_data.get("identifier", "").strip())
+            and (asset_type := mapping_data.get("asset_type", "").lower()) in MAPPING_ASSET_TYPES
+            and (confidence := max(0.0, min(1.0, float(mapping_data.get("confidence", 0.0))))) >= 0.4
+            and (asset_type != "ticker" or identifier.upper() in valid_tickers)
+        ]
+        if len(candidates) < len(raw_mappings):
+            logger.info(
+                f"Omitidos {len(raw_mappings) - len(candidates)} mapeos inválidos, con baja "
+                "confianza o con tickers fuera de la cartera"
+            )
         
-        return mappings
+        try:
+            return _MAPPINGS_ADAPTER.validate_python(candidates)
+        except ValidationError as e:
+            # Algún mapeo inválido: validar de a uno para conservar los demás
+            logger.error(f"Error creando PortfolioAssetMapping: {e}")
+            mappings = []
+            for candidate in candidates:
+                try:
+                    mappings.append(PortfolioAssetMapping.model_validate(candidate))
+                except ValidationError:
+                    continue
+            return mappings
 
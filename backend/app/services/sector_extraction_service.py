@@ -1,8 +1,11 @@
 """Servicio para extraer sectores y temas de noticias usando NER y keywords."""
+import hashlib
 import logging
 import json
 import re
-from typing import List, Dict, Set
+import threading
+from collections import Counter, OrderedDict
+from typing import FrozenSet, List, Dict, Set, Tuple
 from app.models import NewsItemResponse, StandardizedNewsData
 
 logger = logging.getLogger(__name__)
@@ -60,13 +63,95 @@ THEME_KEYWORDS = {
 }
 
 
+def _compile_keyword_matcher(*keywords_by_kind: Dict[str, List[str]]):
+    """
+    Compila una sola alternación con todas las keywords (en minúsculas, como palabra completa)
+    de sectores y temas, para recorrer el texto una única vez.
+    
+    El lookahead de ancho cero hace que finditer pruebe cada posición del texto, así que
+    también se encuentran keywords solapadas (p.ej. "consumo" dentro de "bienes de consumo").
+    En una misma posición gana la keyword más larga; las más cortas que empiezan igual se
+    acreditan vía el mapa de prefijos ("energía limpia" -> ("energía",)).
+    
+    Returns:
+        Tupla (patrón, keyword -> keywords implicadas, keyword -> [(índice de categoría, nombre)])
+    """
+    groups: Dict[str, List[Tuple[int, str]]] = {}
+    for kind, keywords_by_name in enumerate(keywords_by_kind):
+        for name, keywords in keywords_by_name.items():
+            keyword_counts = Counter(keyword.lower() for keyword in keywords)
+            duplicated = sorted(keyword for keyword, count in keyword_counts.items() if count > 1)
+            if duplicated:
+                # Una keyword repetida en la misma categoría no suma matches pero sí infla el
+                # normalizador del score del sector
+                logger.warning(f"Keywords duplicadas en '{name}': {duplicated}")
+            for keyword in keyword_counts:
+                groups.setdefault(keyword, []).append((kind, name))
+    
+    lowered = sorted(groups, key=len, reverse=True)
+    pattern = re.compile(r'(?=\b(' + '|'.join(map(re.escape, lowered)) + r')\b)')
+    implied = {
+        keyword: tuple(
+            other for other in lowered
+            if other != keyword and re.match(r'\b' + re.escape(other) + r'\b', keyword)
+        )
+        for keyword in lowered
+    }
+    return pattern, implied, groups
+
+
+_KEYWORD_PATTERN, _IMPLIED_KEYWORDS, _KEYWORD_GROUPS = _compile_keyword_matcher(SECTOR_KEYWORDS, THEME_KEYWORDS)
+
+try:
+    from app.config import SECTOR_EXTRACTION_CACHE_SIZE
+except ImportError:
+    # Textos recientes cuyas keywords encontradas se recuerdan (reintentos y reprocesos)
+    SECTOR_EXTRACTION_CACHE_SIZE = 4096
+
+# LRU digest del texto -> keywords encontradas; la clave es un hash de 16 bytes para no
+# retener los cuerpos completos de las noticias
+_found_keywords_cache: "OrderedDict[bytes, FrozenSet[str]]" = OrderedDict()
+_found_keywords_lock = threading.Lock()
+
+
+def _find_keywords(text: str) -> FrozenSet[str]:
+    """Keywords (en minúsculas) presentes como palabra completa en text, memoizadas por contenido."""
+    key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _found_keywords_lock:
+        found = _found_keywords_cache.get(key)
+        if found is not None:
+            _found_keywords_cache.move_to_end(key)
+            return found
+    
+    keywords = set()
+    for match in _KEYWORD_PATTERN.finditer(text):
+        keyword = match.group(1)
+        keywords.add(keyword)
+        keywords.update(_IMPLIED_KEYWORDS[keyword])
+    found = frozenset(keywords)
+    
+    with _found_keywords_lock:
+        _found_keywords_cache[key] = found
+        if len(_found_keywords_cache) > SECTOR_EXTRACTION_CACHE_SIZE:
+            _found_keywords_cache.popitem(last=False)
+    return found
+
+
 class SectorExtractionService:
     """Servicio para extraer sectores y temas de noticias."""
     
+    # Caracteres del cuerpo que se analizan: las señales de sector/tema se concentran en el
+    # título y el comienzo de la noticia
+    MAX_BODY_CHARS = 4096
+    
     def __init__(self):
         """Inicializa el servicio."""
         self.sector_keywords = SECTOR_KEYWORDS
         self.theme_keywords = THEME_KEYWORDS
+        # Normalizador del score de cada sector (un tercio de sus keywords, mínimo 1)
+        self._sector_norm = {
+            sector: max(1.0, len(keywords) / 3.0) for sector, keywords in SECTOR_KEYWORDS.items()
+        }
     
     def extract_sectors_and_themes(
         self,
@@ -83,7 +168,7 @@ class SectorExtractionService:
         text_parts = []
         if news_item.title:
             text_parts.append(news_item.title)
-        text_parts.append(news_item.body)
+        text_parts.append(news_item.body[:self.MAX_BODY_CHARS])
         
         # Si hay datos estandarizados, usar también
         if standardized_data:
@@ -92,17 +177,27 @@ class SectorExtractionService:
             if standardized_data.summary_bullets:
                 text_parts.extend(standardized_data.summary_bullets)
         
-        full_text = " ".join(text_parts).lower()
+        # Bajar a minúsculas cada parte al unirlas evita una segunda copia del texto completo
+        full_text = " ".join(part.lower() for part in text_parts if part)
         
-        # Detectar sectores
-        detected_sectors = self._detect_sectors(full_text)
+        # Una sola pasada por el texto: cantidad de keywords encontradas por sector y por tema;
+        # los detectados y sus scores se derivan de esos conteos
+        sector_counts, theme_counts = self._count_matches(full_text)
         
-        # Detectar temas
-        detected_themes = self._detect_themes(full_text)
+        detected_sectors = [sector for sector, matches in sector_counts.items() if matches > 0]
+        detected_themes = [theme for theme, matches in theme_counts.items() if matches > 0]
         
         # Calcular scores de confianza
-        sector_scores = self._calculate_sector_scores(full_text, detected_sectors)
-        theme_scores = self._calculate_theme_scores(full_text, detected_themes)
+        sector_scores = {
+            # Score basado en ratio de keywords encontradas
+            sector: round(min(1.0, sector_counts[sector] / self._sector_norm[sector]), 2)
+            for sector in detected_sectors
+        }
+        theme_scores = {
+            # Score más simple para temas
+            theme: round(min(1.0, theme_counts[theme] / 2.0), 2)
+            for theme in detected_themes
+        }
         
         return {
             "sectors": detected_sectors,
@@ -112,77 +207,10 @@ class SectorExtractionService:
             "extraction_method": "keyword_matching"
         }
     
-    def _detect_sectors(self, text: str) -> List[str]:
-        """Detecta sectores mencionados en el texto."""
-        detected = []
-        
-        for sector, keywords in self.sector_keywords.items():
-            matches = 0
-            for keyword in keywords:
-                # Buscar keyword como palabra completa
-                pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                if re.search(pattern, text):
-                    matches += 1
-            
-            if matches > 0:
-                detected.append(sector)
-        
-        return detected
-    
-    def _detect_themes(self, text: str) -> List[str]:
-        """Detecta temas/trends mencionados en el texto."""
-        detected = []
-        
-        for theme, keywords in self.theme_keywords.items():
-            matches = 0
-            for keyword in keywords:
-                pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                if re.search(pattern, text):
-                    matches += 1
-            
-            if matches > 0:
-                detected.append(theme)
-        
-        return detected
-    
-    def _calculate_sector_scores(self, text: str, sectors: List[str]) -> Dict[str, float]:
-        """Calcula scores de confianza para sectores detectados."""
-        scores = {}
-        
-        for sector in sectors:
-            keywords = self.sector_keywords.get(sector, [])
-            matches = 0
-            total_keywords = len(keywords)
-            
-            for keyword in keywords:
-                pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                if re.search(pattern, text):
-                    matches += 1
-            
-            # Score basado en ratio de keywords encontradas
-            score = min(1.0, matches / max(1, total_keywords / 3))  # Normalizar
-            scores[sector] = round(score, 2)
-        
-        return scores
-    
-    def _calculate_theme_scores(self, text: str, themes: List[str]) -> Dict[str, float]:
-        """Calcula scores de confianza para temas detectados."""
-        scores = {}
-        
-        for theme in themes:
-            keywords = self.theme_keywords.get(theme, [])
-            matches = 0
-            
-            for keyword in keywords:
-                pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                if re.search(pattern, text):
-                    matches += 1
-            
-            # Score más simple para temas
-            score = min(1.0, matches / 2.0)
-            scores[theme] = round(score, 2)
-        
-        return scores
-
-
-
+    def _count_matches(self, text: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Cantidad de keywords distintas encontradas (como palabra completa) por sector y por tema."""
+        counts = ({name: 0 for name in self.sector_keywords}, {name: 0 for name in self.theme_keywords})
+        for keyword in _find_keywords(text):
+            for kind, name in _KEYWORD_GROUPS[keyword]:
+                counts[kind][name] += 1
+        return counts
@@ -1,6 +1,6 @@
 """Servicio de clasificación de sectores sin LLM, basado en diccionarios."""
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from typing import Optional as Opt
 from app.services.local_nlp import get_local_nlp_service
 
@@ -49,20 +49,80 @@ class SectorService:
         
         if not full_text:
             logger.warning("Texto vacío para clasificación de sector, retornando sin sector")
-            return {
-                "primary_sector": None,
-                "sectors": [],
-                "confidence": 0.0,
-                "method": "dictionary_based",
-                "language": language or "es"
-            }
+            return self._empty_result(language)
         
         # Analizar usando NLP local
         analysis = self.nlp_service.analyze_news(full_text, language=language)
+        result = self._build_result(analysis, top_n)
+        
+        # Log trazable y determinista (motor local)
+        if logger.isEnabledFor(logging.DEBUG):
+            sectors = analysis["sectors"]
+            primary_score = sectors[0]['score'] if sectors and len(sectors) > 0 else 0.0
+            logger.debug(
+                "[MOTOR LOCAL] [SECTOR] Texto analizado (longitud=%d chars, idioma=%s) | "
+                "Resultado: %s | Score: %.6f | Confianza: %.6f | Sectores detectados: %d | "
+                "Método: dictionary_based (sin LLM)",
+                len(full_text), result['language'], result['primary_sector'],
+                primary_score, result['confidence'], len(sectors)
+            )
+        
+        return result
+    
+    def classify_batch(
+        self,
+        items: List[Tuple[str, Optional[str]]],
+        language: Optional[str] = None,
+        top_n: int = 1
+    ) -> List[Dict[str, Any]]:
+        """
+        Clasifica el sector de varios textos con una sola pasada del NLP local.
+        
+        Args:
+            items: Lista de tuplas (texto, título opcional)
+            language: Idioma de los textos. Si es None, se detecta por texto
+            top_n: Número de sectores principales a retornar por texto
+        
+        Returns:
+            Lista de resultados con el formato de classify_sector, en el mismo orden que items
+        """
+        full_texts = [f"{title} {text}" if title else text for text, title in items]
+        pending = [i for i, full_text in enumerate(full_texts) if full_text]
+        if len(pending) < len(items):
+            logger.warning(
+                f"{len(items) - len(pending)} textos vacíos para clasificación de sector, retornando sin sector"
+            )
+        
+        analyses = self.nlp_service.analyze_news_batch(
+            [(full_texts[i], None) for i in pending], language=language
+        )
+        results = [self._empty_result(language) for _ in items]
+        for i, analysis in zip(pending, analyses):
+            results[i] = self._build_result(analysis, top_n)
         
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[MOTOR LOCAL] [SECTOR] Lote analizado: %d textos | Con sector: %d | "
+                "Método: dictionary_based (sin LLM)",
+                len(pending), sum(1 for r in results if r['primary_sector'])
+            )
+        return results
+    
+    @staticmethod
+    def _empty_result(language: Optional[str]) -> Dict[str, Any]:
+        """Resultado para un texto vacío."""
+        return {
+            "primary_sector": None,
+            "sectors": [],
+            "confidence": 0.0,
+            "method": "dictionary_based",
+            "language": language or "es"
+        }
+    
+    @staticmethod
+    def _build_result(analysis: Dict, top_n: int) -> Dict[str, Any]:
+        """Arma el resultado de clasificación a partir del análisis del NLP local."""
         sectors = analysis["sectors"]
-        primary_sector = analysis["primary_sector"]
-        detected_language = analysis["language"]
         
         # Calcular confianza basada en el score del sector principal
         # Determinista: confianza = diferencia entre primer y segundo sector
@@ -76,23 +136,12 @@ class SectorService:
             else:
                 confidence = primary_score
         
-        # Log trazable y determinista (motor local)
-        primary_score = sectors[0]['score'] if sectors and len(sectors) > 0 else 0.0
-        logger.debug(
-            f"[MOTOR LOCAL] [SECTOR] Texto analizado (longitud={len(full_text)} chars, idioma={detected_language}) | "
-            f"Resultado: {primary_sector} | "
-            f"Score: {primary_score:.6f} | "
-            f"Confianza: {confidence:.6f} | "
-            f"Sectores detectados: {len(sectors)} | "
-            f"Método: dictionary_based (sin LLM)"
-        )
-        
         return {
-            "primary_sector": primary_sector,
+            "primary_sector": analysis["primary_sector"],
             "sectors": sectors[:top_n],
             "confidence": round(confidence, 3),
             "method": "dictionary_based",
-            "language": detected_language
+            "language": analysis["language"]
         }
     
     def get_primary_sector(
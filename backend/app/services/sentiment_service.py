@@ -1,6 +1,7 @@
 """Servicio de análisis de sentimiento sin LLM, basado en diccionarios."""
+import heapq
 import logging
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from typing import Optional as Opt
 from app.services.local_nlp import get_local_nlp_service
 
@@ -48,46 +49,95 @@ class SentimentService:
         
         if not full_text:
             logger.warning("Texto vacío para análisis de sentimiento, retornando neutral")
-            return {
-                "sentiment": "neutral",
-                "scores": {"positive": 0.0, "negative": 0.0, "neutral": 1.0},
-                "confidence": 0.0,
-                "method": "dictionary_based",
-                "language": language or "es"
-            }
+            return self._empty_result(language)
         
         # Analizar usando NLP local
         analysis = self.nlp_service.analyze_news(full_text, language=language)
+        result = self._build_result(analysis)
+        
+        # Log trazable y determinista (motor local)
+        if logger.isEnabledFor(logging.DEBUG):
+            scores = result["scores"]
+            logger.debug(
+                "[MOTOR LOCAL] [SENTIMENT] Texto analizado (longitud=%d chars, idioma=%s) | "
+                "Resultado: %s | Scores: positive=%.6f, negative=%.6f, neutral=%.6f | "
+                "Confianza: %.6f | Método: dictionary_based (sin LLM)",
+                len(full_text), result['language'], result['sentiment'],
+                scores['positive'], scores['negative'], scores['neutral'], result['confidence']
+            )
+        
+        return result
+    
+    def classify_batch(
+        self,
+        items: List[Tuple[str, Optional[str]]],
+        language: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analiza el sentimiento de varios textos con una sola pasada del NLP local.
+        
+        Args:
+            items: Lista de tuplas (texto, título opcional)
+            language: Idioma de los textos. Si es None, se detecta por texto
         
+        Returns:
+            Lista de resultados con el formato de analyze_sentiment, en el mismo orden que items
+        """
+        full_texts = [f"{title} {text}" if title else text for text, title in items]
+        pending = [i for i, full_text in enumerate(full_texts) if full_text]
+        if len(pending) < len(items):
+            logger.warning(
+                f"{len(items) - len(pending)} textos vacíos para análisis de sentimiento, retornando neutral"
+            )
+        
+        analyses = self.nlp_service.analyze_news_batch(
+            [(full_texts[i], None) for i in pending], language=language
+        )
+        results = [self._empty_result(language) for _ in items]
+        for i, analysis in zip(pending, analyses):
+            results[i] = self._build_result(analysis)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[MOTOR LOCAL] [SENTIMENT] Lote analizado: %d textos | Positivos: %d, negativos: %d | "
+                "Método: dictionary_based (sin LLM)",
+                len(pending),
+                sum(1 for r in results if r['sentiment'] == 'positive'),
+                sum(1 for r in results if r['sentiment'] == 'negative')
+            )
+        return results
+    
+    @staticmethod
+    def _empty_result(language: Optional[str]) -> Dict[str, Any]:
+        """Resultado neutral para un texto vacío."""
+        return {
+            "sentiment": "neutral",
+            "scores": {"positive": 0.0, "negative": 0.0, "neutral": 1.0},
+            "confidence": 0.0,
+            "method": "dictionary_based",
+            "language": language or "es"
+        }
+    
+    @staticmethod
+    def _build_result(analysis: Dict) -> Dict[str, Any]:
+        """Arma el resultado de sentimiento a partir del análisis del NLP local."""
         scores = analysis["sentiment"]
-        sentiment_label = analysis["sentiment_label"]
-        detected_language = analysis["language"]
         
         # Calcular confianza basada en la diferencia entre el score dominante y el segundo
-        # Orden determinista: primero por score descendente, luego por nombre de sentimiento ascendente
-        sorted_scores = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
-        if len(sorted_scores) >= 2:
-            dominant_score = sorted_scores[0][1]
-            second_score = sorted_scores[1][1]
+        # (solo importan los dos valores más altos, no hace falta ordenar todos los scores)
+        top_scores = heapq.nlargest(2, scores.values())
+        if len(top_scores) >= 2:
+            dominant_score, second_score = top_scores
             confidence = max(0.0, dominant_score - second_score)  # Asegurar no negativo
         else:
             confidence = 1.0
         
-        # Log trazable y determinista (motor local)
-        logger.debug(
-            f"[MOTOR LOCAL] [SENTIMENT] Texto analizado (longitud={len(full_text)} chars, idioma={detected_language}) | "
-            f"Resultado: {sentiment_label} | "
-            f"Scores: positive={scores['positive']:.6f}, negative={scores['negative']:.6f}, neutral={scores['neutral']:.6f} | "
-            f"Confianza: {confidence:.6f} | "
-            f"Método: dictionary_based (sin LLM)"
-        )
-        
         return {
-            "sentiment": sentiment_label,
+            "sentiment": analysis["sentiment_label"],
             "scores": scores,
             "confidence": round(confidence, 3),
             "method": "dictionary_based",
-            "language": detected_language
+            "language": analysis["language"]
         }
     
     def get_sentiment_label(
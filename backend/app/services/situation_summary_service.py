@@ -1,8 +1,12 @@
 """Servicio para generar resumen de situación actual basado en noticias."""
+import heapq
 import logging
 import json
-from typing import List, Dict, Optional
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timezone
+from operator import attrgetter
 from app.config import (
     EXTRACTIVE_SUMMARY_MAX_SENTENCES,
     EXTRACTIVE_SUMMARY_MAX_CHARS_PER_NEWS,
@@ -11,14 +15,128 @@ from app.config import (
     META_SUMMARY_MAX_CHARS
 )
 from app.models import NewsItemResponse
-from app.services.extractive_summarizer import ExtractiveSummarizer
-from app.services.meta_summary_service import MetaSummaryService
+from app.services.token_logger import token_logger
+
+try:
+    from app.config import SUMMARY_MAX_CONCURRENT_BATCHES
+except ImportError:
+    # Lotes resumidos en paralelo con OpenAI (modo legacy)
+    SUMMARY_MAX_CONCURRENT_BATCHES = 4
+
+try:
+    from app.config import OPENAI_MODEL_SUMMARY_BATCHES
+except ImportError:
+    # Los resúmenes parciales por lote no requieren el modelo grande: modelo más barato y rápido
+    # (el meta-resumen y el resumen en una sola llamada siguen usando el modelo principal)
+    OPENAI_MODEL_SUMMARY_BATCHES = "gpt-4o-mini"
+
+try:
+    from app.config import SUMMARY_DUPLICATE_SIMILARITY
+except ImportError:
+    # Similitud (Jaccard de palabras de título y comienzo del cuerpo) a partir de la cual dos
+    # noticias recientes se consideran la misma y solo se resume la más nueva
+    SUMMARY_DUPLICATE_SIMILARITY = 0.7
 
 logger = logging.getLogger(__name__)
 
 # Configuración de lotes
 DEFAULT_BATCH_SIZE = 5  # Noticias por lote
 MAX_NEWS_PER_BATCH = 10  # Máximo de noticias por lote
+MAX_RECENT_NEWS = 20  # Noticias más recientes que se consideran para el resumen
+DUPLICATE_FINGERPRINT_BODY_CHARS = 200  # Caracteres del cuerpo que entran en la huella de duplicados
+
+_created_at = attrgetter("created_at")
+_WORD_RE = re.compile(r"\w+")
+
+# Campos fijos del resultado cuando no hay noticias (generated_at, method y la lista de lotes
+# se agregan en cada llamada)
+_EMPTY_SUMMARY = {
+    "summary": "",
+    "meta_summary": "",
+    "news_count": 0,
+    "recent_news_count": 0,
+    "batches_processed": 0,
+    "total_prompt_tokens": 0,
+    "has_content": False,
+    "tokens_used": None,
+    "estimated_tokens": 0
+}
+
+
+# Partes fijas del prompt de meta-resumen con OpenAI. Van al comienzo de la request para que
+# todas compartan el mismo prefijo (OpenAI cachea prefijos idénticos); fecha y resúmenes
+# parciales se agregan al final
+_META_SUMMARY_SYSTEM_PROMPT = (
+    "Eres un analista financiero senior. Tu tarea es generar un meta-resumen ejecutivo "
+    "que consolide múltiples resúmenes parciales de noticias en una visión general coherente. "
+    "El meta-resumen debe ser conciso (2-4 párrafos), identificar tendencias principales, "
+    "y proporcionar una síntesis clara de la situación actual del mercado."
+)
+
+_META_SUMMARY_PROMPT_INSTRUCTIONS = "\n".join([
+    "Meta-Resumen de Situación del Mercado",
+    "=" * 60,
+    "INSTRUCCIONES:",
+    "Genera un resumen ejecutivo consolidado (2-4 párrafos) que sintetice la situación actual del mercado "
+    "basado en los siguientes resúmenes parciales de diferentes lotes de noticias.",
+    "",
+    "El meta-resumen debe:",
+    "- Integrar los puntos clave de todos los lotes",
+    "- Identificar tendencias y patrones comunes",
+    "- Proporcionar una visión general coherente y concisa",
+    "- Evitar redundancias entre lotes",
+    "",
+    "Sé objetivo, claro y directo.",
+    "",
+    "=" * 60
+])
+
+
+def _select_recent(news_items: List[NewsItemResponse], max_news: int = MAX_RECENT_NEWS) -> List[NewsItemResponse]:
+    """
+    Las max_news noticias más recientes, de la más nueva a la más vieja, sin ordenar todas.
+    
+    Descarta las casi duplicadas (la misma noticia de distintas fuentes): de cada grupo queda
+    solo la más nueva, así no ocupa lugar dos veces en el resumen.
+    """
+    recent = heapq.nlargest(max_news, news_items, key=_created_at)
+    kept = []
+    kept_fingerprints = []
+    for item in recent:
+        fingerprint = set(_WORD_RE.findall(
+            f"{item.title or ''} {item.body[:DUPLICATE_FINGERPRINT_BODY_CHARS]}".lower()
+        ))
+        if any(_jaccard(fingerprint, seen) >= SUMMARY_DUPLICATE_SIMILARITY for seen in kept_fingerprints):
+            continue
+        kept.append(item)
+        kept_fingerprints.append(fingerprint)
+    
+    if len(kept) < len(recent):
+        logger.info(f"Descartadas {len(recent) - len(kept)} noticias casi duplicadas de {len(recent)} recientes")
+    return kept
+
+
+def _jaccard(words1: set, words2: set) -> float:
+    """Similitud de Jaccard entre dos conjuntos de palabras."""
+    if not words1 or not words2:
+        return 0.0
+    return len(words1 & words2) / len(words1 | words2)
+
+
+def _news_summary_input(item: NewsItemResponse) -> Dict:
+    """Noticia en el formato de dict que espera ExtractiveSummarizer."""
+    body = item.body or ""
+    return {"id": item.id, "title": item.title, "body": body, "text": body}
+
+
+def _combine_summaries(summaries: List[Dict]) -> Tuple[str, int]:
+    """Une los resúmenes de un lote y suma sus caracteres en una sola pasada."""
+    parts = []
+    char_count = 0
+    for summary in summaries:
+        parts.append(summary["summary"])
+        char_count += summary["char_count"]
+    return " ".join(parts), char_count
 
 
 class SituationSummaryService:
@@ -33,6 +151,10 @@ class SituationSummaryService:
         """
         self.use_extractive = use_extractive
         if use_extractive:
+            # Importados solo en modo extractivo: cargan spaCy a través del NLP local
+            from app.services.extractive_summarizer import ExtractiveSummarizer
+            from app.services.meta_summary_service import MetaSummaryService
+            
             self.extractive_summarizer = ExtractiveSummarizer()
             self.meta_summary_service = MetaSummaryService()
             logger.info("SituationSummaryService inicializado con resumen extractivo (sin LLM)")
@@ -41,16 +163,19 @@ class SituationSummaryService:
             from openai import OpenAI
             from app.config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_TEMPERATURE
             from app.services.prompt_template_service import PromptTemplateService
-            from app.services.prompt_cache_service import PromptCacheService
+            from app.services.llm_response_cache import LLMResponseCache
+            from app.services.prompt_cache_service import CACHE_TTL
             
             if not OPENAI_API_KEY or OPENAI_API_KEY == "your_openai_api_key_here":
                 raise ValueError("OPENAI_API_KEY no está configurada correctamente en app/config.py")
             
             self.client = OpenAI(api_key=OPENAI_API_KEY)
             self.model = OPENAI_MODEL
+            self.batch_model = OPENAI_MODEL_SUMMARY_BATCHES
             self.temperature = OPENAI_TEMPERATURE
             self.template_service = PromptTemplateService()
-            self.cache_service = PromptCacheService()
+            # Caché propio con el TTL de resúmenes (el compartido usa el de escenarios)
+            self.response_cache = LLMResponseCache(ttl=CACHE_TTL["summary"])
             logger.info("SituationSummaryService inicializado con OpenAI (legacy)")
     
     def generate_summary(
@@ -71,19 +196,14 @@ class SituationSummaryService:
         Returns:
             Dict con summary (meta-resumen), batch_summaries (resúmenes parciales) y metadata
         """
+        # Marca de tiempo única para todos los caminos de retorno
+        generated_at = datetime.now(timezone.utc).isoformat()
+        
         if not news_items:
             empty_result = {
-                "summary": "",
-                "meta_summary": "",
+                **_EMPTY_SUMMARY,
                 "batch_summaries": [],
-                "news_count": 0,
-                "recent_news_count": 0,
-                "batches_processed": 0,
-                "total_prompt_tokens": 0,
-                "generated_at": datetime.now(timezone.utc).isoformat(),
-                "has_content": False,
-                "tokens_used": None,
-                "estimated_tokens": 0,
+                "generated_at": generated_at,
                 "method": "extractive" if self.use_extractive else "openai"
             }
             logger.info("No hay noticias para generar resumen")
@@ -91,28 +211,29 @@ class SituationSummaryService:
         
         # Usar resumen extractivo si está habilitado
         if self.use_extractive:
-            return self._generate_extractive_summary(news_items, batch_size, use_batching)
+            return self._generate_extractive_summary(news_items, batch_size, use_batching, generated_at)
         else:
             # Legacy: usar OpenAI
-            return self._generate_openai_summary(news_items, batch_size, use_batching)
+            return self._generate_openai_summary_cached(news_items, batch_size, use_batching, generated_at)
     
     def _generate_extractive_summary(
         self,
         news_items: List[NewsItemResponse],
         batch_size: int,
-        use_batching: bool
+        use_batching: bool,
+        generated_at: str
     ) -> Dict:
         """Genera resumen usando método extractivo (sin LLM)."""
-        # Ordenar noticias por fecha (más recientes primero)
-        sorted_news = sorted(
-            news_items,
-            key=lambda x: x.created_at,
-            reverse=True
-        )
+        # Limitar a las noticias más recientes (más recientes primero)
+        recent_news = _select_recent(news_items)
         
-        # Limitar a las noticias más recientes
-        max_news = 20
-        recent_news = sorted_news[:max_news]
+        # Analizar en una sola pasada de spaCy todas las noticias que no tengan ya su resumen
+        # cacheado, antes de resumir (por lotes o todas juntas)
+        self.extractive_summarizer.prepare_batch(
+            [_news_summary_input(item) for item in recent_news],
+            max_sentences=EXTRACTIVE_SUMMARY_MAX_SENTENCES,
+            max_chars=EXTRACTIVE_SUMMARY_MAX_CHARS_PER_NEWS
+        )
         
         batch_summaries = []
         total_chars = 0
@@ -131,14 +252,7 @@ class SituationSummaryService:
             
             for batch_idx, batch in enumerate(batches, 1):
                 # Convertir a formato dict para el summarizer
-                batch_dicts = []
-                for item in batch:
-                    batch_dicts.append({
-                        "id": item.id,
-                        "title": item.title,
-                        "body": item.body or "",
-                        "text": item.body or ""
-                    })
+                batch_dicts = [_news_summary_input(item) for item in batch]
                 
                 # Generar resúmenes extractivos para el lote
                 summaries = self.extractive_summarizer.summarize_batch(
@@ -149,16 +263,16 @@ class SituationSummaryService:
                 )
                 
                 # Combinar resúmenes del lote
-                batch_summary_text = " ".join([s["summary"] for s in summaries])
-                batch_char_count = sum([s["char_count"] for s in summaries])
+                batch_summary_text, batch_char_count = _combine_summaries(summaries)
                 
                 batch_summaries.append({
                     "batch_number": batch_idx,
                     "news_count": len(batch),
                     "summary": batch_summary_text,
+                    "is_error": False,
                     "tokens_used": None,  # Sin tokens (método local)
                     "char_count": batch_char_count,
-                    "estimated_tokens": int(batch_char_count / 4)  # Estimación: ~4 chars por token
+                    "estimated_tokens": batch_char_count // 4  # Estimación: ~4 chars por token
                 })
                 
                 total_chars += batch_char_count
@@ -176,14 +290,18 @@ class SituationSummaryService:
                 # Si el metarresumen está vacío, usar el primer resumen de lote como fallback
                 if not meta_summary or not meta_summary.strip():
                     logger.warning("[MOTOR LOCAL] Metarresumen vacío, usando primer resumen de lote como fallback")
-                    for batch in batch_summaries:
-                        batch_summary = batch.get("summary", "")
-                        if batch_summary and not batch_summary.startswith("[Error"):
-                            meta_summary = batch_summary[:META_SUMMARY_MAX_CHARS] if len(batch_summary) > META_SUMMARY_MAX_CHARS else batch_summary
-                            break
+                    fallback = next(
+                        (
+                            batch["summary"] for batch in batch_summaries
+                            if batch.get("summary") and not batch["is_error"]
+                        ),
+                        None
+                    )
+                    if fallback is not None:
+                        meta_summary = fallback[:META_SUMMARY_MAX_CHARS]
                 
                 # Calcular tokens estimados (sin costos de API)
-                estimated_tokens = int(total_chars / 4)  # Estimación conservadora
+                estimated_tokens = total_chars // 4  # Estimación conservadora
                 
                 logger.info(
                     f"[MOTOR LOCAL] Resumen extractivo completado: {len(batches)} lotes, "
@@ -200,7 +318,7 @@ class SituationSummaryService:
                     "batches_processed": len(batches),
                     "total_prompt_tokens": estimated_tokens,
                     "estimated_tokens": estimated_tokens,
-                    "generated_at": datetime.now(timezone.utc).isoformat(),
+                    "generated_at": generated_at,
                     "has_content": bool(meta_summary),
                     "tokens_used": None,  # Sin tokens reales (método local)
                     "method": "extractive"
@@ -211,14 +329,7 @@ class SituationSummaryService:
             # Procesar todas juntas (pocas noticias)
             logger.info(f"Procesando {len(recent_news)} noticias directamente (método extractivo)")
             
-            news_dicts = []
-            for item in recent_news:
-                news_dicts.append({
-                    "id": item.id,
-                    "title": item.title,
-                    "body": item.body or "",
-                    "text": item.body or ""
-                })
+            news_dicts = [_news_summary_input(item) for item in recent_news]
             
             summaries = self.extractive_summarizer.summarize_batch(
                 news_items=news_dicts,
@@ -227,9 +338,8 @@ class SituationSummaryService:
             )
             
             # Combinar resúmenes
-            combined_summary = " ".join([s["summary"] for s in summaries])
-            total_chars = sum([s["char_count"] for s in summaries])
-            estimated_tokens = int(total_chars / 4)
+            combined_summary, total_chars = _combine_summaries(summaries)
+            estimated_tokens = total_chars // 4
             
             return {
                 "summary": combined_summary,
@@ -247,27 +357,64 @@ class SituationSummaryService:
                 "batches_processed": 1,
                 "total_prompt_tokens": estimated_tokens,
                 "estimated_tokens": estimated_tokens,
-                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "generated_at": generated_at,
                 "has_content": bool(combined_summary),
                 "tokens_used": None,
                 "method": "extractive"
             }
     
+    def _generate_openai_summary_cached(
+        self,
+        news_items: List[NewsItemResponse],
+        batch_size: int,
+        use_batching: bool,
+        generated_at: str
+    ) -> Dict:
+        """
+        Resumen con OpenAI reutilizando el ya generado para el mismo conjunto de noticias.
+        
+        La clave cubre modelos, temperatura, parámetros de lotes y el contenido de las noticias
+        recientes, así que cualquier noticia nueva o editada produce un miss.
+        """
+        recent_news = _select_recent(news_items)
+        news_content = "\x1e".join(
+            f"{item.id}\x1f{item.title or ''}\x1f{item.body}" for item in recent_news
+        )
+        cache_key = self.response_cache.make_key(
+            "situation_summary", f"{self.model}|{self.batch_model}", self.temperature,
+            f"{batch_size}|{use_batching}|{len(news_items)}", news_content
+        )
+        
+        cached = self.response_cache.get("situation_summary", cache_key)
+        if cached is not None:
+            return json.loads(cached)
+        
+        result = self._generate_openai_summary(news_items, recent_news, batch_size, use_batching, generated_at)
+        # Un resumen al que le faltan lotes con error no se cachea: la próxima llamada los reintenta
+        if result.get("has_content") and not any(batch["is_error"] for batch in result["batch_summaries"]):
+            self.response_cache.set(
+                "situation_summary", cache_key, json.dumps(result, ensure_ascii=False),
+                token_count=result.get("tokens_used")
+            )
+        return result
+    
     def _generate_openai_summary(
         self,
         news_items: List[NewsItemResponse],
+        recent_news: List[NewsItemResponse],
         batch_size: int,
-        use_batching: bool
+        use_batching: bool,
+        generated_at: str
     ) -> Dict:
-        """Genera resumen usando OpenAI (método legacy)."""
+        """
+        Genera resumen usando OpenAI (método legacy).
+        
+        recent_news es la selección de _select_recent ya hecha para la clave de caché.
+        """
         # Mantener implementación original para compatibilidad
         # Este método contiene el código original que usa OpenAI
         # Se mantiene para compatibilidad hacia atrás si se necesita
         try:
-            sorted_news = sorted(news_items, key=lambda x: x.created_at, reverse=True)
-            max_news = 20
-            recent_news = sorted_news[:max_news]
-            
             total_prompt_tokens = 0
             batch_summaries = []
             should_use_batching = use_batching and (len(recent_news) > batch_size or len(recent_news) > 10)
@@ -275,35 +422,55 @@ class SituationSummaryService:
             if should_use_batching:
                 batches = [recent_news[i:i + batch_size] for i in range(0, len(recent_news), batch_size)]
                 
-                for batch_idx, batch in enumerate(batches, 1):
-                    batch_news_dicts = [self._news_item_to_dict(n) for n in batch]
-                    prompt_data = self.template_service.build_optimized_prompt(
-                        template_type="situation_summary",
-                        variable_data={"news_items": batch_news_dicts, "batch_number": batch_idx, "total_batches": len(batches)}
-                    )
+                # Cada lote se envía a OpenAI apenas está armado su prompt, así el armado de los
+                # siguientes se solapa con las requests en curso; los resultados se leen en orden
+                with ThreadPoolExecutor(max_workers=SUMMARY_MAX_CONCURRENT_BATCHES) as executor:
+                    pending_batches = []
+                    for batch_idx, batch in enumerate(batches, 1):
+                        batch_news_dicts = [self._news_item_to_dict(n) for n in batch]
+                        prompt_data = self.template_service.build_optimized_prompt(
+                            template_type="situation_summary",
+                            variable_data={"news_items": batch_news_dicts, "batch_number": batch_idx, "total_batches": len(batches)}
+                        )
+                        
+                        if not prompt_data.get("is_valid", True):
+                            pending_batches.append((batch_idx, batch, None))
+                            continue
+                        
+                        total_prompt_tokens += prompt_data["estimated_tokens"]
+                        future = executor.submit(
+                            self._generate_batch_summary_optimized, batch, prompt_data, f"summary_batch_{batch_idx}"
+                        )
+                        pending_batches.append((batch_idx, batch, future))
                     
-                    if not prompt_data.get("is_valid", True):
+                    for batch_idx, batch, future in pending_batches:
+                        if future is None:
+                            batch_summaries.append({
+                                "batch_number": batch_idx,
+                                "news_count": len(batch),
+                                "summary": "[Error: Prompt excede límites]",
+                                "tokens_used": 0,
+                                "is_error": True
+                            })
+                            continue
+                        
+                        batch_summary = future.result()
                         batch_summaries.append({
                             "batch_number": batch_idx,
                             "news_count": len(batch),
-                            "summary": "[Error: Prompt excede límites]",
-                            "tokens_used": 0
+                            "summary": batch_summary["summary"],
+                            "tokens_used": batch_summary.get("tokens_used"),
+                            "is_error": batch_summary.get("is_error", False)
                         })
-                        continue
-                    
-                    total_prompt_tokens += prompt_data["estimated_tokens"]
-                    batch_summary = self._generate_batch_summary_optimized(batch, prompt_data, f"summary_batch_{batch_idx}")
-                    batch_summaries.append({
-                        "batch_number": batch_idx,
-                        "news_count": len(batch),
-                        "summary": batch_summary["summary"],
-                        "tokens_used": batch_summary.get("tokens_used")
-                    })
                 
                 if batch_summaries:
-                    valid_batch_summaries = [b for b in batch_summaries if not b['summary'].startswith('[Error')]
+                    valid_batch_summaries = [b for b in batch_summaries if not b["is_error"]]
                     if valid_batch_summaries:
-                        meta_summary = self._generate_meta_summary(valid_batch_summaries)
+                        if len(valid_batch_summaries) == 1:
+                            # Un único lote válido: su resumen ya es el final, sin otra llamada a OpenAI
+                            meta_summary = {"summary": valid_batch_summaries[0]["summary"], "tokens_used": 0}
+                        else:
+                            meta_summary = self._generate_meta_summary(valid_batch_summaries)
                         total_tokens = sum(b.get("tokens_used", 0) for b in batch_summaries if b.get("tokens_used")) + meta_summary.get("tokens_used", 0)
                         return {
                             "summary": meta_summary["summary"],
@@ -314,7 +481,7 @@ class SituationSummaryService:
                             "batches_processed": len(batches),
                             "total_prompt_tokens": int(total_prompt_tokens),
                             "estimated_tokens": int(total_prompt_tokens),
-                            "generated_at": datetime.now(timezone.utc).isoformat(),
+                            "generated_at": generated_at,
                             "has_content": bool(meta_summary["summary"]),
                             "tokens_used": total_tokens if total_tokens > 0 else None,
                             "method": "openai"
@@ -337,7 +504,7 @@ class SituationSummaryService:
                     "batches_processed": 1,
                     "total_prompt_tokens": prompt_data["estimated_tokens"],
                     "estimated_tokens": prompt_data["estimated_tokens"],
-                    "generated_at": datetime.now(timezone.utc).isoformat(),
+                    "generated_at": generated_at,
                     "has_content": False,
                     "tokens_used": 0,
                     "method": "openai"
@@ -366,7 +533,7 @@ class SituationSummaryService:
                 "batches_processed": 1,
                 "total_prompt_tokens": prompt_data["estimated_tokens"],
                 "estimated_tokens": prompt_data["estimated_tokens"],
-                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "generated_at": generated_at,
                 "has_content": True,
                 "tokens_used": tokens_used,
                 "method": "openai"
@@ -374,293 +541,6 @@ class SituationSummaryService:
         except Exception as e:
             logger.error(f"Error en generación OpenAI (legacy): {e}", exc_info=True)
             raise
-        
-        try:
-            # Ordenar noticias por fecha (más recientes primero)
-            sorted_news = sorted(
-                news_items,
-                key=lambda x: x.created_at,
-                reverse=True
-            )
-            
-            # Limitar a las noticias más recientes para evitar procesar demasiadas
-            max_news = 20  # Máximo de noticias a considerar
-            recent_news = sorted_news[:max_news]
-            
-            total_prompt_tokens = 0
-            batch_summaries = []
-            
-            # Usar batching si está habilitado Y hay más noticias que el tamaño del lote
-            # O si hay muchas noticias (más de 10) para evitar exceder límites de tokens
-            should_use_batching = use_batching and (len(recent_news) > batch_size or len(recent_news) > 10)
-            
-            if should_use_batching:
-                # Procesar en lotes
-                logger.info(
-                    f"Procesando {len(recent_news)} noticias en lotes de {batch_size}. "
-                    f"Total de lotes estimados: {(len(recent_news) + batch_size - 1) // batch_size}"
-                )
-                
-                # Dividir en lotes
-                batches = [
-                    recent_news[i:i + batch_size] 
-                    for i in range(0, len(recent_news), batch_size)
-                ]
-                
-                # Procesar cada lote
-                for batch_idx, batch in enumerate(batches, 1):
-                    logger.info(f"Procesando lote {batch_idx}/{len(batches)} con {len(batch)} noticias")
-                    
-                    # Construir prompt optimizado usando plantillas
-                    batch_news_dicts = [self._news_item_to_dict(n) for n in batch]
-                    prompt_data = self.template_service.build_optimized_prompt(
-                        template_type="situation_summary",
-                        variable_data={
-                            "news_items": batch_news_dicts,
-                            "batch_number": batch_idx,
-                            "total_batches": len(batches)
-                        }
-                    )
-                    
-                    # Condición de salida explícita: verificar si el prompt es válido
-                    if not prompt_data.get("is_valid", True):
-                        logger.warning(
-                            f"Lote {batch_idx}: Prompt inválido ({prompt_data.get('char_count', 0)} chars, "
-                            f"{prompt_data.get('estimated_tokens', 0)} tokens). Saltando llamada a OpenAI."
-                        )
-                        batch_summaries.append({
-                            "batch_number": batch_idx,
-                            "news_count": len(batch),
-                            "summary": f"[Error: Prompt excede límites de tokens]",
-                            "tokens_used": 0
-                        })
-                        continue
-                    
-                    total_prompt_tokens += prompt_data["estimated_tokens"]
-                    
-                    try:
-                        batch_summary = self._generate_batch_summary_optimized(
-                            batch, 
-                            prompt_data,
-                            step_name=f"summary_batch_{batch_idx}"
-                        )
-                        batch_summaries.append({
-                            "batch_number": batch_idx,
-                            "news_count": len(batch),
-                            "summary": batch_summary["summary"],
-                            "tokens_used": batch_summary.get("tokens_used")
-                        })
-                        logger.info(f"Lote {batch_idx} procesado exitosamente. Tokens: {batch_summary.get('tokens_used', 'N/A')}")
-                    except Exception as e:
-                        logger.error(f"Error procesando lote {batch_idx}: {e}")
-                        # Continuar con el siguiente lote
-                        batch_summaries.append({
-                            "batch_number": batch_idx,
-                            "news_count": len(batch),
-                            "summary": f"[Error al procesar lote {batch_idx}]",
-                            "tokens_used": None
-                        })
-                
-                # Generar meta-resumen a partir de los resúmenes parciales
-                if batch_summaries:
-                    # Filtrar lotes con errores antes de generar meta-resumen
-                    valid_batch_summaries = [b for b in batch_summaries if not b['summary'].startswith('[Error')]
-                    
-                    if valid_batch_summaries:
-                        meta_summary = self._generate_meta_summary(valid_batch_summaries)
-                        meta_tokens = meta_summary.get("tokens_used", 0)
-                        total_tokens = sum(b.get("tokens_used", 0) for b in batch_summaries if b.get("tokens_used")) + meta_tokens
-                        
-                        # Agregar tokens del meta-resumen a la estimación total
-                        meta_prompt_estimate = len(valid_batch_summaries) * 200  # Estimación para prompt de meta-resumen
-                        total_prompt_tokens += meta_prompt_estimate
-                        
-                        logger.info(
-                            f"Resumen completado: {len(batches)} lotes procesados ({len(valid_batch_summaries)} válidos), "
-                            f"~{int(total_prompt_tokens)} tokens de prompt estimados, "
-                            f"{total_tokens} tokens totales usados"
-                        )
-                    else:
-                        # Si todos los lotes fallaron, usar el primer resumen disponible o error
-                        logger.warning("Todos los lotes fallaron, usando resumen de fallback")
-                        fallback_summary = batch_summaries[0]['summary'] if batch_summaries and batch_summaries[0].get('summary') else "Error al procesar noticias"
-                        meta_summary = {
-                            "summary": fallback_summary,
-                            "tokens_used": 0
-                        }
-                        total_tokens = sum(b.get("tokens_used", 0) for b in batch_summaries if b.get("tokens_used"))
-                    
-                    return {
-                        "summary": meta_summary["summary"],  # Mantener compatibilidad
-                        "meta_summary": meta_summary["summary"],
-                        "batch_summaries": batch_summaries,
-                        "news_count": len(news_items),
-                        "recent_news_count": len(recent_news),
-                        "batches_processed": len(batches),
-                        "total_prompt_tokens": int(total_prompt_tokens),
-                        "generated_at": datetime.now(timezone.utc).isoformat(),
-                        "has_content": bool(meta_summary["summary"] and meta_summary["summary"] != "Error al procesar noticias"),
-                        "tokens_used": total_tokens if total_tokens > 0 else None
-                    }
-                else:
-                    raise ValueError("No se pudieron procesar los lotes")
-            else:
-                # Procesamiento directo (legacy o pocas noticias)
-                logger.info(f"Procesando {len(recent_news)} noticias directamente (sin lotes)")
-                
-                # Construir prompt optimizado
-                news_dicts = [self._news_item_to_dict(n) for n in recent_news]
-                prompt_data = self.template_service.build_optimized_prompt(
-                    template_type="situation_summary",
-                    variable_data={"news_items": news_dicts}
-                )
-                
-                # Verificar caché (solo para contexto estático, no para datos dinámicos)
-                static_data = {"context": "situation_summary_direct"}
-                cached_response = self.cache_service.get(
-                    prompt_type="situation_summary",
-                    static_data=static_data,
-                    variable_data={"news_count": len(recent_news)},
-                    cache_ttl=CACHE_TTL["summary"]
-                )
-                
-                if cached_response:
-                    logger.info(f"Usando respuesta cacheada para resumen directo")
-                    return cached_response
-                
-                # Verificar condición de salida: si el prompt es inválido, no llamar a OpenAI
-                if not prompt_data.get("is_valid", True):
-                    logger.warning("Prompt inválido para resumen directo, saltando llamada a OpenAI")
-                    return {
-                        "summary": "[Error: Prompt excede límites de tokens]",
-                        "meta_summary": "[Error: Prompt excede límites de tokens]",
-                        "batch_summaries": [],
-                        "news_count": len(news_items),
-                        "recent_news_count": len(recent_news),
-                        "batches_processed": 1,
-                        "total_prompt_tokens": prompt_data["estimated_tokens"],
-                        "generated_at": datetime.now(timezone.utc).isoformat(),
-                        "has_content": False,
-                        "tokens_used": 0
-                    }
-                
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": prompt_data["system_content"]
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt_data["user_content"]
-                        }
-                    ],
-                    temperature=self.temperature,
-                    max_tokens=500,
-                    timeout=60.0
-                )
-                
-                summary_text = response.choices[0].message.content.strip()
-                tokens_used = response.usage.total_tokens if response.usage else None
-                
-                # Log de tokens
-                if response.usage:
-                    token_logger.log_usage(
-                        prompt_tokens=response.usage.prompt_tokens,
-                        completion_tokens=response.usage.completion_tokens,
-                        step_name="situation_summary_direct",
-                        prompt_type="situation_summary",
-                        response=response
-                    )
-                
-                result = {
-                    "summary": summary_text,
-                    "meta_summary": summary_text,
-                    "batch_summaries": [],
-                    "news_count": len(news_items),
-                    "recent_news_count": len(recent_news),
-                    "batches_processed": 1,
-                    "total_prompt_tokens": prompt_data["estimated_tokens"],
-                    "generated_at": datetime.now(timezone.utc).isoformat(),
-                    "has_content": True,
-                    "tokens_used": tokens_used
-                }
-                
-                # Cachear respuesta (solo si tiene contenido válido)
-                if result["has_content"]:
-                    self.cache_service.set(
-                        prompt_type="situation_summary",
-                        static_data=static_data,
-                        response=result,
-                        variable_data={"news_count": len(recent_news)},
-                        token_count=tokens_used,
-                        cache_ttl=CACHE_TTL["summary"]
-                    )
-                
-                logger.info(
-                    f"Resumen directo generado: {len(recent_news)} noticias, "
-                    f"{prompt_data['estimated_tokens']} tokens de prompt estimados, "
-                    f"{tokens_used or 'N/A'} tokens totales usados"
-                )
-                
-                return result
-            
-        except Exception as e:
-            logger.error(f"Error generando resumen de situación: {e}", exc_info=True)
-            raise ValueError(f"Error al generar resumen: {str(e)}")
-    
-    def _build_summary_prompt(
-        self, 
-        news_items: List[NewsItemResponse],
-        batch_number: Optional[int] = None,
-        total_batches: Optional[int] = None
-    ) -> str:
-        """Construye el prompt para generar el resumen."""
-        prompt_parts = [
-            "Resumen de Noticias del Mercado",
-            "=" * 60,
-            f"Fecha de análisis: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}",
-            f"Total de noticias en este lote: {len(news_items)}",
-        ]
-        
-        if batch_number and total_batches:
-            prompt_parts.append(f"Lote {batch_number} de {total_batches}")
-        
-        prompt_parts.extend([
-            "",
-            "INSTRUCCIONES:",
-            "Genera un resumen conciso (2-4 párrafos) de la situación actual del mercado basado en las siguientes noticias.",
-            "Enfócate en:",
-            "- Tendencias principales identificadas",
-            "- Eventos o desarrollos clave",
-            "- Contexto general del mercado",
-            "",
-            "Sé objetivo, claro y directo. Evita especulación sin respaldo.",
-            "",
-            "=" * 60,
-            "",
-            "NOTICIAS:",
-            ""
-        ])
-        
-        for idx, item in enumerate(news_items, 1):
-            prompt_parts.append(f"{idx}. {item.title or 'Sin título'}")
-            if item.source:
-                prompt_parts.append(f"   Fuente: {item.source}")
-            prompt_parts.append(f"   Fecha: {item.created_at}")
-            # Limitar caracteres para evitar exceder tokens
-            content_preview = item.body[:MAX_CHARS_PER_NEWS]
-            if len(item.body) > MAX_CHARS_PER_NEWS:
-                content_preview += "..."
-            prompt_parts.append(f"   Contenido: {content_preview}")
-            prompt_parts.append("")
-        
-        prompt_parts.append("=" * 60)
-        prompt_parts.append("")
-        prompt_parts.append("Genera el resumen de situación actual:")
-        
-        return "\n".join(prompt_parts)
     
     def _news_item_to_dict(self, news_item: NewsItemResponse) -> Dict:
         """Convierte NewsItemResponse a diccionario para plantillas."""
@@ -703,11 +583,12 @@ class SituationSummaryService:
             logger.warning(f"Prompt inválido para {step_name}, saltando llamada a OpenAI")
             return {
                 "summary": "[Error: Prompt excede límites de tokens]",
-                "tokens_used": 0
+                "tokens_used": 0,
+                "is_error": True
             }
         
         response = self.client.chat.completions.create(
-            model=self.model,
+            model=self.batch_model,
             messages=[
                 {
                     "role": "system",
@@ -741,38 +622,6 @@ class SituationSummaryService:
             "tokens_used": tokens_used
         }
     
-    def _generate_batch_summary(self, batch: List[NewsItemResponse], prompt: str) -> Dict:
-        """Genera un resumen para un lote específico de noticias (método legacy)."""
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "Eres un analista financiero experto. Tu tarea es generar un resumen conciso "
-                        "y claro de la situación actual del mercado basado en las noticias proporcionadas. "
-                        "El resumen debe ser breve (2-3 párrafos máximo), directo y enfocado en los puntos clave. "
-                        "Evita jerga técnica innecesaria. Sé objetivo y basado en hechos."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=self.temperature,
-            max_tokens=400,  # Resumen más corto para lotes
-            timeout=60.0
-        )
-        
-        summary_text = response.choices[0].message.content.strip()
-        tokens_used = response.usage.total_tokens if hasattr(response, 'usage') else None
-        
-        return {
-            "summary": summary_text,
-            "tokens_used": tokens_used
-        }
-    
     def _generate_meta_summary(self, batch_summaries: List[Dict]) -> Dict:
         """Genera un meta-resumen a partir de los resúmenes parciales de los lotes."""
         if not batch_summaries:
@@ -781,41 +630,21 @@ class SituationSummaryService:
                 "tokens_used": 0
             }
         
-        # Construir prompt con los resúmenes parciales
-        prompt_parts = [
-            "Meta-Resumen de Situación del Mercado",
-            "=" * 60,
-            f"Fecha de análisis: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}",
-            f"Total de lotes procesados: {len(batch_summaries)}",
-            "",
-            "INSTRUCCIONES:",
-            "Genera un resumen ejecutivo consolidado (2-4 párrafos) que sintetice la situación actual del mercado "
-            "basado en los siguientes resúmenes parciales de diferentes lotes de noticias.",
-            "",
-            "El meta-resumen debe:",
-            "- Integrar los puntos clave de todos los lotes",
-            "- Identificar tendencias y patrones comunes",
-            "- Proporcionar una visión general coherente y concisa",
-            "- Evitar redundancias entre lotes",
-            "",
-            "Sé objetivo, claro y directo.",
-            "",
-            "=" * 60,
-            "",
-            "RESÚMENES PARCIALES:",
-            ""
-        ]
-        
-        for batch_summary in batch_summaries:
-            prompt_parts.append(f"Lote {batch_summary['batch_number']} ({batch_summary['news_count']} noticias):")
-            prompt_parts.append(batch_summary['summary'])
-            prompt_parts.append("")
-        
-        prompt_parts.append("=" * 60)
-        prompt_parts.append("")
-        prompt_parts.append("Genera el meta-resumen ejecutivo consolidado:")
-        
-        prompt = "\n".join(prompt_parts)
+        # Construir prompt con los resúmenes parciales: primero las instrucciones fijas (prefijo
+        # cacheable por OpenAI) y después la fecha, la cantidad de lotes y los resúmenes
+        partials = "".join(
+            f"Lote {batch_summary['batch_number']} ({batch_summary['news_count']} noticias):\n"
+            f"{batch_summary['summary']}\n\n"
+            for batch_summary in batch_summaries
+        )
+        prompt = (
+            f"{_META_SUMMARY_PROMPT_INSTRUCTIONS}\n"
+            f"Fecha de análisis: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}\n"
+            f"Total de lotes procesados: {len(batch_summaries)}\n"
+            "\nRESÚMENES PARCIALES:\n\n"
+            f"{partials}"
+            f"{'=' * 60}\n\nGenera el meta-resumen ejecutivo consolidado:"
+        )
         
         logger.info(f"Generando meta-resumen desde {len(batch_summaries)} resúmenes parciales")
         
@@ -824,12 +653,7 @@ class SituationSummaryService:
             messages=[
                 {
                     "role": "system",
-                    "content": (
-                        "Eres un analista financiero senior. Tu tarea es generar un meta-resumen ejecutivo "
-                        "que consolide múltiples resúmenes parciales de noticias en una visión general coherente. "
-                        "El meta-resumen debe ser conciso (2-4 párrafos), identificar tendencias principales, "
-                        "y proporcionar una síntesis clara de la situación actual del mercado."
-                    )
+                    "content": _META_SUMMARY_SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -18,6 +18,7 @@ class TokenUsage:
     timestamp: str
     prompt_type: Optional[str] = None
     estimated_cost: Optional[float] = None  # En USD (aproximado)
+    cached_tokens: int = 0  # Tokens de entrada servidos desde el caché de prefijos de OpenAI
 
 
 class TokenLogger:
@@ -26,6 +27,7 @@ class TokenLogger:
     # Costos aproximados por 1K tokens (gpt-4o)
     COST_PER_1K_TOKENS = {
         "prompt": 0.0025,  # $2.50 por 1M tokens de entrada
+        "cached_prompt": 0.00125,  # $1.25 por 1M tokens de entrada cacheados
         "completion": 0.010  # $10.00 por 1M tokens de salida
     }
     
@@ -35,6 +37,7 @@ class TokenLogger:
             "prompt_tokens": 0,
             "completion_tokens": 0,
             "total_tokens": 0,
+            "cached_tokens": 0,
             "estimated_cost": 0.0
         }
     
@@ -44,7 +47,8 @@ class TokenLogger:
         completion_tokens: int,
         step_name: str,
         prompt_type: Optional[str] = None,
-        response: Optional[Any] = None
+        response: Optional[Any] = None,
+        usage: Optional[Any] = None
     ):
         """
         Registra el uso de tokens para un paso específico.
@@ -55,43 +59,52 @@ class TokenLogger:
             step_name: Nombre del paso (ej: "scenario_generation", "summary_batch_1")
             prompt_type: Tipo de prompt (opcional)
             response: Respuesta de OpenAI (opcional, para extraer tokens reales)
+            usage: Objeto usage de OpenAI (opcional, p.ej. el último chunk de un stream);
+                además de los tokens reales aporta los cacheados
         """
         # Si hay respuesta, intentar extraer tokens reales
-        if response and hasattr(response, 'usage'):
+        if usage is None and response and hasattr(response, 'usage'):
             usage = response.usage
+        cached_tokens = 0
+        if usage:
             prompt_tokens = usage.prompt_tokens
             completion_tokens = usage.completion_tokens
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
         
         total_tokens = prompt_tokens + completion_tokens
         
-        # Calcular costo estimado
+        # Calcular costo estimado (los tokens cacheados se cobran a tarifa reducida)
         cost = (
-            (prompt_tokens / 1000) * self.COST_PER_1K_TOKENS["prompt"] +
+            ((prompt_tokens - cached_tokens) / 1000) * self.COST_PER_1K_TOKENS["prompt"] +
+            (cached_tokens / 1000) * self.COST_PER_1K_TOKENS["cached_prompt"] +
             (completion_tokens / 1000) * self.COST_PER_1K_TOKENS["completion"]
         )
         
-        usage = TokenUsage(
+        token_usage = TokenUsage(
             prompt_tokens=prompt_tokens,
             completion_tokens=completion_tokens,
             total_tokens=total_tokens,
             step_name=step_name,
             timestamp=datetime.now(timezone.utc).isoformat(),
             prompt_type=prompt_type,
-            estimated_cost=cost
+            estimated_cost=cost,
+            cached_tokens=cached_tokens
         )
         
-        self._usage_history.append(usage)
+        self._usage_history.append(token_usage)
         
         # Actualizar totales de sesión
         self._session_total["prompt_tokens"] += prompt_tokens
         self._session_total["completion_tokens"] += completion_tokens
         self._session_total["total_tokens"] += total_tokens
+        self._session_total["cached_tokens"] += cached_tokens
         self._session_total["estimated_cost"] += cost
         
         # Log detallado
         logger.info(
             f"[TOKENS] {step_name} | "
-            f"Prompt: {prompt_tokens}, Completion: {completion_tokens}, "
+            f"Prompt: {prompt_tokens} (cacheados: {cached_tokens}), Completion: {completion_tokens}, "
             f"Total: {total_tokens} | Costo: ${cost:.4f}"
         )
     
@@ -115,6 +128,7 @@ class TokenLogger:
             "calls": len(step_usages),
             "prompt_tokens": sum(u.prompt_tokens for u in step_usages),
             "completion_tokens": sum(u.completion_tokens for u in step_usages),
+            "cached_tokens": sum(u.cached_tokens for u in step_usages),
             "total_tokens": total_tokens,
             "total_cost": total_cost
         }
@@ -137,7 +151,7 @@ class TokenLogger:
         logger.info("RESUMEN DE TOKENS - SESIÓN ACTUAL")
         logger.info("=" * 60)
         logger.info(f"Total de llamadas: {summary['total_calls']}")
-        logger.info(f"Tokens de entrada: {summary['prompt_tokens']:,}")
+        logger.info(f"Tokens de entrada: {summary['prompt_tokens']:,} (cacheados: {summary['cached_tokens']:,})")
         logger.info(f"Tokens de salida: {summary['completion_tokens']:,}")
         logger.info(f"Total de tokens: {summary['total_tokens']:,}")
         logger.info(f"Costo estimado: ${summary['estimated_cost']:.4f}")
@@ -157,6 +171,7 @@ class TokenLogger:
             "prompt_tokens": 0,
             "completion_tokens": 0,
             "total_tokens": 0,
+            "cached_tokens": 0,
             "estimated_cost": 0.0
         }
         logger.info("Estadísticas de tokens reiniciadas")
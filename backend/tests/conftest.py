@@ -0,0 +1,49 @@
+"""Utilidades compartidas por los tests: cliente de OpenAI falso."""
+import threading
+from types import SimpleNamespace
+
+
+def chat_completion(content: str, prompt_tokens: int = 10, completion_tokens: int = 5):
+    """Respuesta de chat completions con el contenido y el uso de tokens indicados."""
+    usage = SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=None
+    )
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+class FakeCompletions:
+    """
+    chat.completions falso (síncrono): registra las llamadas y responde con respond(kwargs).
+    Si respond devuelve una excepción, se lanza en lugar de devolverla.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _respond(self, kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+        result = self.respond(kwargs)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def create(self, **kwargs):
+        return self._respond(kwargs)
+
+
+class AsyncFakeCompletions(FakeCompletions):
+    """Versión asíncrona de FakeCompletions (para AsyncOpenAI)."""
+
+    async def create(self, **kwargs):
+        return self._respond(kwargs)
+
+
+def fake_client(completions: FakeCompletions):
+    """Cliente de OpenAI cuyo chat.completions es completions."""
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
@@ -0,0 +1,29 @@
+"""Tests para el servicio de NLP local."""
+from app.services.local_nlp.local_nlp_service import LocalNLPService
+
+NEWS = [
+    ("La Reserva Federal mantuvo las tasas y Apple (AAPL) subió 3%.", "Fed mantiene tasas"),
+    ("Oil prices jumped after OPEC announced new production cuts.", "Oil rallies"),
+    ("Los bancos europeos caen por temores de recesión.", None),
+    ("La Reserva Federal mantuvo las tasas y Apple (AAPL) subió 3%.", "Fed mantiene tasas"),
+    ("", None),
+]
+
+
+class TestAnalyzeNewsBatch:
+    """Tests del análisis en lote."""
+
+    def test_batch_matches_individual_analysis(self):
+        batch_results = LocalNLPService().analyze_news_batch(NEWS)
+
+        individual_service = LocalNLPService()
+        individual_results = [individual_service.analyze_news(text, title) for text, title in NEWS]
+
+        assert batch_results == individual_results
+
+    def test_batch_results_are_independent_copies(self):
+        results = LocalNLPService().analyze_news_batch(NEWS)
+
+        results[0]["keywords"].append("modificada")
+
+        assert "modificada" not in results[3]["keywords"]
@@ -0,0 +1,84 @@
+"""Tests para el cliente compartido de OpenAI (reintentos y concurrencia adaptativa)."""
+import asyncio
+import httpx
+import openai
+import pytest
+from app.services import openai_client
+from tests.conftest import AsyncFakeCompletions, fake_client
+
+
+def rate_limit_error(code: str = None) -> openai.RateLimitError:
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return openai.RateLimitError("rate limit", response=response, body={"code": code} if code else None)
+
+
+def completions_returning(*outcomes) -> AsyncFakeCompletions:
+    """Completions que devuelve (o lanza, si son excepciones) los resultados en orden."""
+    pending = iter(outcomes)
+    return AsyncFakeCompletions(lambda kwargs: next(pending))
+
+
+@pytest.fixture(autouse=True)
+def no_wait(monkeypatch):
+    monkeypatch.setattr(openai_client, "RETRY_INITIAL_WAIT", 0.0)
+
+
+class TestCreateWithRetries:
+    """Tests de reintentos ante rate limits."""
+
+    def test_rate_limit_is_retried_and_reduces_concurrency(self):
+        completions = completions_returning(rate_limit_error(), rate_limit_error(), "ok")
+
+        async def run():
+            response = await openai_client.create_chat_completion(fake_client(completions), model="m")
+            return response, openai_client._get_limiter().limit
+
+        response, limit = asyncio.run(run())
+
+        assert response == "ok"
+        assert len(completions.calls) == 3
+        assert limit < openai_client.OPENAI_MAX_CONCURRENT_REQUESTS
+
+    def test_insufficient_quota_is_not_retried(self):
+        completions = completions_returning(rate_limit_error("insufficient_quota"))
+
+        with pytest.raises(openai.RateLimitError):
+            asyncio.run(openai_client.create_chat_completion(fake_client(completions), model="m"))
+        assert len(completions.calls) == 1
+
+    def test_stream_holds_limiter_slot_until_consumed(self):
+        async def chunks():
+            yield "a"
+            yield "b"
+
+        completions = completions_returning(chunks())
+
+        async def run():
+            limiter = openai_client._get_limiter()
+            stream = await openai_client.create_chat_completion(fake_client(completions), model="m", stream=True)
+            in_flight_while_open = limiter._in_flight
+            received = [chunk async for chunk in stream]
+            return in_flight_while_open, received, limiter._in_flight
+
+        in_flight_while_open, received, in_flight_after = asyncio.run(run())
+
+        assert received == ["a", "b"]
+        assert in_flight_while_open == 1
+        assert in_flight_after == 0
+
+
+class TestRunSync:
+    """Tests de las fachadas síncronas."""
+
+    def test_loop_resources_are_released(self):
+        async def work():
+            client = openai_client.get_async_client()
+            async with openai_client._get_limiter():
+                await asyncio.sleep(0)
+            return client, asyncio.get_running_loop()
+
+        client, loop = openai_client.run_sync(work())
+
+        assert client.is_closed()
+        assert loop not in openai_client._limiters
+        assert loop not in openai_client._async_clients
@@ -0,0 +1,87 @@
+"""Tests para el servicio de plantillas de prompts."""
+from types import SimpleNamespace
+from app.services import prompt_template_service
+from app.services.prompt_template_service import MIN_NEWS_ITEM_CHARS, PromptTemplateService
+
+
+def make_news_dicts(count: int, body_chars: int = 1000):
+    return [
+        {
+            "id": idx + 1,
+            "title": f"Noticia {idx}",
+            "body": ("mercado acciones bonos tasas " * body_chars)[:body_chars],
+            "standardized_data": {"sentiment": "neutral"},
+        }
+        for idx in range(count)
+    ]
+
+
+class TestTokenBudget:
+    """Tests del presupuesto de tokens de entrada."""
+
+    def test_prompt_within_budget_is_not_truncated(self):
+        service = PromptTemplateService()
+
+        prompt_data = service.build_optimized_prompt(
+            template_type="situation_summary",
+            variable_data={"news_items": make_news_dicts(3, body_chars=100)}
+        )
+
+        assert prompt_data["is_valid"]
+        assert len(prompt_data["truncated_data"]["news_items"]) == 3
+
+    def test_over_budget_prompt_is_shrunk_until_it_fits(self):
+        service = PromptTemplateService()
+        news = make_news_dicts(10)
+        untruncated = service.build_optimized_prompt(
+            template_type="situation_summary",
+            variable_data={"news_items": news}
+        )
+        # Presupuesto que ni el truncamiento agresivo (5 noticias a 200 caracteres) cumple
+        budget = untruncated["estimated_tokens"] // 3
+
+        prompt_data = service.build_optimized_prompt(
+            template_type="situation_summary",
+            variable_data={"news_items": news},
+            max_input_tokens=budget
+        )
+
+        assert prompt_data["is_valid"]
+        assert prompt_data["estimated_tokens"] <= budget
+        bodies = [item["body"] for item in prompt_data["truncated_data"]["news_items"]]
+        assert len(bodies) == 5
+        assert all(len(body) < 200 for body in bodies)
+
+    def test_impossible_budget_is_reported_invalid(self):
+        service = PromptTemplateService()
+
+        prompt_data = service.build_optimized_prompt(
+            template_type="situation_summary",
+            variable_data={"news_items": make_news_dicts(10)},
+            max_input_tokens=10
+        )
+
+        assert not prompt_data["is_valid"]
+        bodies = [item["body"] for item in prompt_data["truncated_data"]["news_items"]]
+        assert all(len(body) <= 2 * MIN_NEWS_ITEM_CHARS + len("...") for body in bodies)
+
+
+class TestEstimateTokens:
+    """Tests del conteo de tokens."""
+
+    def test_encoding_load_failure_falls_back_to_chars(self, monkeypatch):
+        attempts = []
+
+        def encoding_for_model(model):
+            attempts.append(model)
+            raise OSError("sin red")
+
+        monkeypatch.setattr(prompt_template_service, "tiktoken", SimpleNamespace(encoding_for_model=encoding_for_model))
+        prompt_template_service._get_encoding.cache_clear()
+        try:
+            service = PromptTemplateService()
+            assert service.estimate_tokens("a" * 40) == 10
+            assert service.estimate_tokens("a" * 8) == 2
+            assert len(attempts) == 1
+        finally:
+            prompt_template_service._get_encoding.cache_clear()
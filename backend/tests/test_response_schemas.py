@@ -0,0 +1,43 @@
+"""Tests para el parseo incremental de respuestas JSON en streaming."""
+import json
+from app.services.response_schemas import TopLevelObjectScanner
+
+SCENARIOS = {
+    "base": {"title": "Base", "description": "Texto con {llaves} y \"comillas\""},
+    "risk": {"title": "Riesgo", "description": "Caída [fuerte]"},
+    "opportunity": {"title": "Oportunidad", "description": "Sube \\ baja"},
+}
+
+
+def feed_in_chunks(scanner: TopLevelObjectScanner, text: str, size: int):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(scanner.feed(text[start:start + size]))
+    return completed
+
+
+class TestTopLevelObjectScanner:
+    """Tests del escáner de objetos de primer nivel."""
+
+    def test_objects_split_across_chunks(self):
+        text = json.dumps(SCENARIOS, ensure_ascii=False)
+
+        for size in (1, 3, 7, len(text)):
+            completed = feed_in_chunks(TopLevelObjectScanner(), text, size)
+            assert completed == list(SCENARIOS.items())
+
+    def test_object_is_returned_as_soon_as_it_closes(self):
+        text = json.dumps(SCENARIOS, ensure_ascii=False)
+        end_of_base = text.index(', "risk"')
+        scanner = TopLevelObjectScanner()
+
+        assert scanner.feed(text[:end_of_base - 1]) == []
+        assert scanner.feed(text[end_of_base - 1:end_of_base]) == [("base", SCENARIOS["base"])]
+
+    def test_array_items_with_depth_three(self):
+        drivers = [{"driver": "Tasas", "related_news_ids": [1, 2]}, {"driver": "Petróleo", "related_news_ids": [3]}]
+        text = json.dumps({"drivers": drivers}, ensure_ascii=False)
+
+        completed = feed_in_chunks(TopLevelObjectScanner(depth=3), text, 4)
+
+        assert completed == [("drivers", drivers[0]), ("drivers", drivers[1])]
@@ -1,6 +1,7 @@
 """Tests para el servicio de cálculo de riesgo."""
 import pytest
-from app.services.risk_service import RiskService, parse_value
+from datetime import datetime, timezone
+from app.services.risk_service import RiskService, parse_value, _is_market_hours, _dashboard_cache
 from app.models import PortfolioItemResponse
 
 
@@ -192,6 +193,37 @@ class TestExposureBySector:
         assert exposures[1]["sector"] == "bonos"
         assert exposures[1]["percentage"] == pytest.approx(25.0, abs=0.01)
         assert exposures[1]["asset_count"] == 1
+    
+    def test_sector_grouping_skips_zero_values(self):
+        service = RiskService()
+        items = [
+            PortfolioItemResponse(
+                id=i,
+                asset_type=asset_type,
+                name=f"Asset {i}",
+                symbol=None,
+                quantity=None,
+                price=None,
+                total_value=total_value,
+                currency="USD",
+                notes=None,
+                created_at="2025-12-01T10:00:00",
+                updated_at="2025-12-01T10:00:00"
+            )
+            for i, (asset_type, total_value) in enumerate([
+                ("bonos", "500.00"),
+                ("etf", None),
+                ("acciones", "1,500.00"),
+                ("bonos", "500.00"),
+            ], 1)
+        ]
+        exposures = service.calculate_exposure_by_sector(items)
+        
+        assert [e["sector"] for e in exposures] == ["acciones", "bonos"]
+        assert exposures[0]["value"] == 1500.0
+        assert exposures[1]["value"] == 1000.0
+        assert exposures[1]["asset_count"] == 2
+        assert exposures[1]["percentage"] == pytest.approx(40.0, abs=0.01)
 
 
 class TestTopConcentrations:
@@ -401,3 +433,61 @@ class TestRiskDashboard:
 
 
 
+    
+    def test_dashboard_is_cached_per_portfolio_snapshot(self):
+        service = RiskService()
+        item = PortfolioItemResponse(
+            id=99,
+            asset_type="acciones",
+            name="Cached",
+            symbol="C1",
+            quantity=None,
+            price=None,
+            total_value="1234.00",
+            currency="USD",
+            notes=None,
+            created_at="2025-12-01T10:00:00",
+            updated_at="2025-12-01T10:00:00"
+        )
+        
+        first = service.calculate_risk_dashboard([item])
+        first["portfolio_value"] = -1.0
+        hits = _dashboard_cache.get_stats()["hits"]
+        second = RiskService().calculate_risk_dashboard([item])
+        assert _dashboard_cache.get_stats()["hits"] == hits + 1
+        assert second is not first
+        assert second["portfolio_value"] == 1234.0
+        first = second
+        
+        changed = item.model_copy(update={"total_value": "4321.00"})
+        third = service.calculate_risk_dashboard([changed])
+        assert third["portfolio_value"] == 4321.0
+        
+        uncached = service.calculate_risk_dashboard([item], use_cache=False)
+        assert uncached is not first
+        assert uncached == first
+    
+    def test_expired_dashboards_are_purged_on_set(self):
+        expired_key = _dashboard_cache.set("risk_dashboard", {"snapshot": "vencida"}, "{}", cache_ttl=-1)
+        item = PortfolioItemResponse(
+            id=98,
+            asset_type="bonos",
+            name="Nueva foto",
+            symbol="B1",
+            quantity=None,
+            price=None,
+            total_value="500.00",
+            currency="USD",
+            notes=None,
+            created_at="2025-12-01T10:00:00",
+            updated_at="2025-12-01T10:00:00"
+        )
+        
+        RiskService().calculate_risk_dashboard([item])
+        
+        assert expired_key not in _dashboard_cache._cache
+    
+    def test_market_hours(self):
+        assert _is_market_hours(datetime(2025, 12, 1, 15, 0, tzinfo=timezone.utc))
+        assert not _is_market_hours(datetime(2025, 12, 1, 21, 0, tzinfo=timezone.utc))
+        assert not _is_market_hours(datetime(2025, 12, 6, 15, 0, tzinfo=timezone.utc))
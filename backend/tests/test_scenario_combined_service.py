@@ -0,0 +1,78 @@
+"""Tests para la generación combinada de escenarios y mapeo a cartera."""
+import asyncio
+import json
+from app.services.scenario_combined_service import CombinedScenarioService
+from tests.conftest import AsyncFakeCompletions, chat_completion, fake_client
+
+SCENARIO_TYPES = ("base", "risk", "opportunity")
+
+PORTFOLIO = [
+    {"symbol": "AAPL", "name": "Apple", "asset_type": "acciones"},
+    {"symbol": "GLD", "name": "Oro", "asset_type": "etf"},
+]
+
+NEWS = [
+    {"id": 1, "title": "Fed mantiene tasas", "standardized_data": {"summary": "La Fed mantuvo las tasas"}},
+    {"id": 2, "title": "Oro sube", "standardized_data": {"summary": "El oro alcanzó un récord"}},
+]
+
+
+def make_scenario(scenario_type: str) -> dict:
+    return {
+        "title": f"Escenario {scenario_type}",
+        "description": "Descripción",
+        "assumptions": [{"description": "Supuesto"}],
+        "risks": [],
+        "invalidators": [],
+        "confidence": 0.6,
+        "timeframe": "1 mes",
+        "market_impact": None,
+        "suggested_actions": ["Revisar posiciones"],
+        "triggers": [],
+    }
+
+
+def make_mapping(identifier: str, name: str) -> dict:
+    return {
+        "asset_type": "ticker",
+        "identifier": identifier,
+        "name": name,
+        "sensitivity": 0.5,
+        "confidence": 0.8,
+        "impact_description": "Impacto",
+    }
+
+
+def make_service(body: dict):
+    completions = AsyncFakeCompletions(lambda kwargs: chat_completion(json.dumps(body, ensure_ascii=False)))
+    return CombinedScenarioService(client=fake_client(completions)), completions
+
+
+class TestCombinedScenarioService:
+    """Tests de la llamada combinada con un cliente falso."""
+
+    def test_parses_scenarios_and_mappings_from_one_call(self):
+        service, completions = make_service({
+            "scenarios": {scenario_type: make_scenario(scenario_type) for scenario_type in SCENARIO_TYPES},
+            "mappings": [make_mapping("AAPL", "Apple"), make_mapping("MSFT", "Microsoft")],
+        })
+        driver = {"driver": "Política monetaria", "description": "Tasas", "related_news_ids": [1, 2]}
+
+        scenarios, mappings = asyncio.run(
+            service.generate_scenarios_and_mappings_async(driver, NEWS, PORTFOLIO)
+        )
+
+        assert len(completions.calls) == 1
+        assert sorted(scenarios) == sorted(SCENARIO_TYPES)
+        assert scenarios["base"].title == "Escenario base"
+        # Solo se conservan activos que están en la cartera
+        assert [mapping.identifier for mapping in mappings] == ["AAPL"]
+
+    def test_prompt_has_portfolio_before_driver_data(self):
+        service, _ = make_service({})
+        driver = {"driver": "Política monetaria", "description": "Tasas"}
+        portfolio_ctx = service.mapping_service.build_portfolio_context(PORTFOLIO)
+
+        _, user_content = service._build_prompt(driver, NEWS, portfolio_ctx)
+
+        assert user_content.index("AAPL") < user_content.index("Política monetaria")
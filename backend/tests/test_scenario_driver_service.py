@@ -0,0 +1,30 @@
+"""Tests para el servicio de drivers de escenarios."""
+from app.services.scenario_driver_service import _cluster_by_average_linkage
+
+
+class TestClusterByAverageLinkage:
+    """Tests del clustering aglomerativo de embeddings."""
+
+    def test_groups_similar_vectors(self):
+        vectors = [
+            [1.0, 0.0, 0.0],
+            [0.0, 1.0, 0.0],
+            [0.9, 0.1, 0.0],
+            [0.1, 0.9, 0.0],
+            [0.95, 0.05, 0.1],
+        ]
+
+        clusters = _cluster_by_average_linkage(vectors, 2)
+
+        assert [sorted(cluster) for cluster in clusters] == [[0, 2, 4], [1, 3]]
+
+    def test_clusters_are_sorted_by_size(self):
+        vectors = [[1.0, 0.0], [0.0, 1.0], [0.99, 0.01], [0.98, 0.02]]
+
+        clusters = _cluster_by_average_linkage(vectors, 2)
+
+        assert [len(cluster) for cluster in clusters] == [3, 1]
+
+    def test_fewer_vectors_than_clusters(self):
+        assert _cluster_by_average_linkage([[1.0, 0.0]], 3) == [[0]]
+        assert _cluster_by_average_linkage([[1.0, 0.0], [0.0, 1.0]], 0) == [[0, 1]]
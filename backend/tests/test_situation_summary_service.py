@@ -0,0 +1,135 @@
+"""Tests para el servicio de resumen de situación."""
+import itertools
+import pytest
+from datetime import datetime, timedelta, timezone
+import app.config as app_config
+from app.models import NewsItemResponse
+from app.services.prompt_cache_service import CACHE_TTL
+from app.services.situation_summary_service import SituationSummaryService, _select_recent
+from tests.conftest import FakeCompletions, chat_completion, fake_client
+
+TOPICS = [
+    "Fed mantiene tasas de interés",
+    "Apple reporta ganancias récord",
+    "Petróleo sube por tensiones geopolíticas",
+    "Bitcoin supera máximo histórico",
+    "Euro cae frente al dólar",
+    "Nvidia lanza nuevos chips",
+    "Inflación de China se desacelera",
+    "Tesla recorta precios en Europa",
+    "Oro alcanza nuevo récord",
+    "Banco de Japón sube tasas",
+    "Amazon anuncia despidos masivos",
+    "Cobre se dispara por demanda",
+]
+
+
+def make_news(count: int):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        NewsItemResponse(
+            id=idx + 1,
+            title=TOPICS[idx],
+            body=f"{TOPICS[idx]} según fuentes del mercado número {idx}.",
+            source="Reuters",
+            created_at=base + timedelta(hours=idx)
+        )
+        for idx in range(count)
+    ]
+
+
+@pytest.fixture
+def legacy_service(monkeypatch):
+    monkeypatch.setattr(app_config, "OPENAI_API_KEY", "sk-test", raising=False)
+    service = SituationSummaryService(use_extractive=False)
+    service.model = "main-model"
+    service.batch_model = "batch-model"
+    call_numbers = itertools.count(1)
+    completions = FakeCompletions(
+        lambda kwargs: chat_completion(f"resumen {kwargs['model']} {next(call_numbers)}")
+    )
+    service.client = fake_client(completions)
+    return service, completions
+
+
+class TestLegacyOpenAISummary:
+    """Tests del modo legacy (OpenAI) con un cliente falso."""
+
+    def test_batched_summary_uses_batch_model_and_meta_summary(self, legacy_service):
+        service, completions = legacy_service
+
+        result = service.generate_summary(make_news(12), use_batching=True, batch_size=5)
+
+        assert result["method"] == "openai"
+        assert result["batches_processed"] == 3
+        assert [b["batch_number"] for b in result["batch_summaries"]] == [1, 2, 3]
+        assert not any(b["is_error"] for b in result["batch_summaries"])
+        models = [call["model"] for call in completions.calls]
+        assert models.count("batch-model") == 3
+        assert models[-1] == "main-model"
+        assert result["summary"].startswith("resumen main-model")
+        assert result["tokens_used"] == 60
+
+    def test_single_call_summary(self, legacy_service):
+        service, completions = legacy_service
+
+        result = service.generate_summary(make_news(3), use_batching=False)
+
+        assert result["has_content"]
+        assert result["batch_summaries"] == []
+        assert [call["model"] for call in completions.calls] == ["main-model"]
+
+    def test_summary_is_cached_per_news_set(self, legacy_service):
+        service, completions = legacy_service
+        news = make_news(12)
+
+        first = service.generate_summary(news, use_batching=True, batch_size=5)
+        calls = len(completions.calls)
+        second = service.generate_summary(news, use_batching=True, batch_size=5)
+
+        assert second["summary"] == first["summary"]
+        assert len(completions.calls) == calls
+        assert service.response_cache.ttl == CACHE_TTL["summary"]
+
+        news[0].body = "Texto editado de la noticia"
+        service.generate_summary(news, use_batching=True, batch_size=5)
+        assert len(completions.calls) > calls
+
+    def test_summary_with_failed_batches_is_not_cached(self, legacy_service):
+        service, completions = legacy_service
+        build_prompt = service.template_service.build_optimized_prompt
+
+        def build_with_invalid_second_batch(**kwargs):
+            prompt_data = build_prompt(**kwargs)
+            if kwargs["variable_data"].get("batch_number") == 2:
+                prompt_data["is_valid"] = False
+            return prompt_data
+
+        service.template_service.build_optimized_prompt = build_with_invalid_second_batch
+        news = make_news(12)
+
+        first = service.generate_summary(news, use_batching=True, batch_size=5)
+        calls = len(completions.calls)
+        service.generate_summary(news, use_batching=True, batch_size=5)
+
+        assert [b["is_error"] for b in first["batch_summaries"]] == [False, True, False]
+        assert first["has_content"]
+        assert len(completions.calls) > calls
+
+
+class TestSelectRecent:
+    """Tests de la selección de noticias recientes."""
+
+    def test_near_duplicates_keep_only_the_newest(self):
+        news = make_news(4)
+        news[3].title = news[1].title
+        news[3].body = news[1].body + " Actualizado"
+
+        selected = _select_recent(news)
+
+        assert [item.id for item in selected] == [4, 3, 1]
+
+    def test_selects_most_recent_first(self):
+        selected = _select_recent(make_news(12), max_news=5)
+
+        assert [item.id for item in selected] == [12, 11, 10, 9, 8]